@@ -0,0 +1,325 @@
+# encoding = "utf-8"
+
+'''
+Wave-synchronous evaluation through an OpenAI-style Batch API.
+
+Instead of one real-time request per turn, every wave evaluates the next turn
+of all dialogs that are still alive (patience not exhausted):
+1) collect the message lists of the next turn of every live dialog and submit
+   them as one batch JSONL job,
+2) run the rule-based checkers on the returned generations and submit all
+   LLM-judge prompts of the wave as a second batch job,
+3) aggregate verdicts exactly like eval.check_all_instructions, update
+   patience, append the records to eval_{id}.jsonl and move to the next wave.
+Outputs and resume behaviour are the same as eval.py, so both can be mixed.
+
+--batch_backend local runs the batch files against a real-time endpoint with
+a thread pool instead of the Batch API (useful for testing). Judge batches go
+to --judge_base_url / --judge_api_key when set, like eval.py's judge calls.
+'''
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from data_utils.utils import get_client
+from eval import (
+    _JUDGE_IDS,
+    _run_rule,
+    aggregate_verdicts,
+    build_instruction_instance,
+    build_messages,
+    build_record,
+    load_jsonl,
+    load_resume_state,
+    next_patience,
+)
+from instruction.combined_judge import build_combined_messages, parse_combined_response
+from instruction.instruction_utils import parse_judge_score
+
+JUDGE_MODEL = "gpt-4.1"
+_TERMINAL_BATCH_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+def _batch_request(custom_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    return {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}
+
+
+def _write_jsonl_file(path: str, records: List[Dict[str, Any]]):
+    with open(path, "w", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+def _parse_completion(result: Dict[str, Any]) -> Tuple[str, int, int]:
+    """Extract (content, prompt_tokens, completion_tokens) from one batch output line."""
+    if result is None:
+        raise RuntimeError("missing from batch output")
+    if result.get("error"):
+        raise RuntimeError(result["error"].get("message", result["error"]))
+    response = result.get("response") or {}
+    if response.get("status_code") != 200:
+        raise RuntimeError(f"status {response.get('status_code')}")
+    body = response["body"]
+    usage = body.get("usage") or {}
+    return (body["choices"][0]["message"]["content"],
+            usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+
+
+class OpenAIBatchBackend:
+    """Submit a batch JSONL file through the Batch API and wait for its results."""
+
+    def __init__(self, api_key: str, base_url: str, batch_dir: str, poll_interval: float = 30.0):
+        self.client = get_client(base_url, api_key)
+        self.batch_dir = batch_dir
+        self.poll_interval = poll_interval
+
+    def run(self, requests: List[Dict[str, Any]], name: str) -> Dict[str, Dict[str, Any]]:
+        input_path = os.path.join(self.batch_dir, f"{name}_input.jsonl")
+        _write_jsonl_file(input_path, requests)
+        with open(input_path, "rb") as f:
+            batch_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        while batch.status not in _TERMINAL_BATCH_STATES:
+            time.sleep(self.poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+
+        results: List[Dict[str, Any]] = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    results.append(json.loads(line))
+        _write_jsonl_file(os.path.join(
+            self.batch_dir, f"{name}_output.jsonl"), results)
+        return {r["custom_id"]: r for r in results}
+
+
+class LocalBatchBackend:
+    """Stand-in for the Batch API: serve a batch file with real-time calls."""
+
+    def __init__(self, api_key: str, base_url: str, batch_dir: str, num_workers: int = 16):
+        self.client = get_client(base_url, api_key)
+        self.batch_dir = batch_dir
+        self.num_workers = num_workers
+
+    def _serve(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            completion = self.client.chat.completions.create(
+                **request["body"])
+            return {"custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": completion.model_dump()},
+                    "error": None}
+        except Exception as e:
+            return {"custom_id": request["custom_id"], "response": None,
+                    "error": {"message": str(e)}}
+
+    def run(self, requests: List[Dict[str, Any]], name: str) -> Dict[str, Dict[str, Any]]:
+        _write_jsonl_file(os.path.join(
+            self.batch_dir, f"{name}_input.jsonl"), requests)
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            results = list(executor.map(self._serve, requests))
+        _write_jsonl_file(os.path.join(
+            self.batch_dir, f"{name}_output.jsonl"), results)
+        return {r["custom_id"]: r for r in results}
+
+
+def _judge_body(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    # Same request as LLM_backend(use_json_mode=True) sends in real time
+    return {"model": JUDGE_MODEL, "messages": messages, "temperature": 1.0,
+            "response_format": {"type": "json_object"}}
+
+
+def make_backend(args, api_key: str, base_url: str, batch_dir: str):
+    if args.batch_backend == "local":
+        return LocalBatchBackend(api_key, base_url, batch_dir, args.local_workers)
+    return OpenAIBatchBackend(api_key, base_url, batch_dir, args.poll_interval)
+
+
+def run(args):
+    out_dir = os.path.join(args.output_dir, args.model_name.split("/")[-1])
+    os.makedirs(out_dir, exist_ok=True)
+    batch_dir = args.batch_dir or os.path.join(out_dir, "batches")
+    os.makedirs(batch_dir, exist_ok=True)
+    backend = make_backend(args, args.api_key, args.base_url, batch_dir)
+    judge_api_key = args.judge_api_key or args.api_key
+    judge_base_url = args.judge_base_url or args.base_url
+    if (judge_api_key, judge_base_url) == (args.api_key, args.base_url):
+        judge_backend = backend
+    else:
+        judge_backend = make_backend(args, judge_api_key, judge_base_url, batch_dir)
+
+    # Per-dialog state: remaining turns, patience and conversation history
+    states: Dict[int, Dict[str, Any]] = {}
+    for file_id in range(args.start_id, args.end_id + 1):
+        dialog_path = os.path.join(args.dialogs_dir, f"dialog_{file_id}.jsonl")
+        if not os.path.exists(dialog_path):
+            continue
+        out_file = os.path.join(out_dir, f"eval_{file_id}.jsonl")
+        start_from_turn, current_remaining, history_msgs = load_resume_state(
+            out_file, args.patience)
+        states[file_id] = {
+            "turns": load_jsonl(dialog_path),
+            "next": start_from_turn,
+            "remaining": current_remaining,
+            "history": history_msgs,
+            "out_file": out_file,
+            "alive": True,
+        }
+
+    wave = 0
+    while True:
+        live = [fid for fid, st in states.items()
+                if st["alive"] and st["next"] < len(st["turns"])
+                and not (st["remaining"] is not None and st["remaining"] == 0)]
+        if not live:
+            break
+        print(f"Wave {wave}: {len(live)} live dialogs")
+
+        # 1) Generation batch: the next turn of every live dialog
+        gen_requests = []
+        for fid in live:
+            st = states[fid]
+            turn = st["turns"][st["next"]]
+            messages = build_messages(
+                st["history"], turn.get("user_query_verified"), args.system_prompt)
+            gen_requests.append(_batch_request(
+                f"gen-{fid}-{turn.get('turn')}",
+                {"model": args.model_name, "messages": messages, "temperature": args.temperature}))
+        gen_results = backend.run(gen_requests, f"wave{wave}_generation")
+
+        # 2) Judge batch: every LLM-judged constraint of the wave
+        pending = {}
+        judge_requests = []
+        for fid in live:
+            st = states[fid]
+            turn = st["turns"][st["next"]]
+            try:
+                generation, ptok, ctok = _parse_completion(
+                    gen_results.get(f"gen-{fid}-{turn.get('turn')}"))
+            except Exception as e:
+                # Same as a generation error in eval.py: stop this dialog
+                print(f"[dialog {fid}] {e}")
+                st["alive"] = False
+                continue
+
+            built = []
+            for it in turn.get("instructions") or []:
+                inst_id = it.get("id")
+                built.append(
+                    (inst_id, build_instruction_instance(inst_id, it.get("args"))))
+            judge_idx = [i for i, (inst_id, inst) in enumerate(built)
+                         if inst is not None and inst_id in _JUDGE_IDS]
+            judge_ids: Dict[int, str] = {}
+            prefix = f"judge-{fid}-{turn.get('turn')}"
+            if args.combined_judge and len(judge_idx) > 1:
+                custom_id = f"{prefix}-combined"
+                judge_requests.append(_batch_request(custom_id, _judge_body(
+                    build_combined_messages([built[i][1] for i in judge_idx], generation))))
+                judge_ids = {i: custom_id for i in judge_idx}
+            else:
+                for i in judge_idx:
+                    custom_id = f"{prefix}-{i}"
+                    judge_requests.append(_batch_request(
+                        custom_id, _judge_body(built[i][1].build_judge_messages(generation))))
+                    judge_ids[i] = custom_id
+            pending[fid] = (turn, generation, ptok, ctok, built, judge_ids)
+        judge_results = judge_backend.run(
+            judge_requests, f"wave{wave}_judge") if judge_requests else {}
+
+        # 3) Aggregate, update patience and append the records
+        for fid, (turn, generation, ptok, ctok, built, judge_ids) in pending.items():
+            st = states[fid]
+            verdicts = []
+            judge_usage: Dict[str, Dict[str, int]] = {}
+            for i, (inst_id, inst) in enumerate(built):
+                if inst is None:
+                    ok = False  # unknown instruction, skip
+                elif i in judge_ids:
+                    custom_id = judge_ids[i]
+                    try:
+                        content, jp, jc = _parse_completion(
+                            judge_results.get(custom_id))
+                        if custom_id.endswith("-combined"):
+                            key = "+".join(built[j][0] for j, c in judge_ids.items()
+                                           if c == custom_id)
+                            ok = parse_combined_response(
+                                [inst], content).get(inst_id, (0, ""))
+                        else:
+                            key = inst_id
+                            ok = parse_judge_score(content)
+                        judge_usage[key] = {
+                            "prompt_tokens": jp, "completion_tokens": jc}
+                    except Exception:
+                        ok = (0, "")
+                else:
+                    ok = _run_rule(inst, generation)
+                verdicts.append((inst_id, ok))
+            overall_ok, details, sub_details = aggregate_verdicts(verdicts)
+            st["remaining"] = next_patience(
+                st["remaining"], overall_ok, args.patience)
+
+            record = build_record(
+                turn, generation, overall_ok, details, sub_details, st["remaining"],
+                {"target": {"prompt_tokens": ptok, "completion_tokens": ctok},
+                 "judge": judge_usage},
+                None)
+            with open(st["out_file"], "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            st["history"].append(
+                {"role": "user", "content": turn.get("user_query_verified")})
+            st["history"].append({"role": "assistant", "content": generation})
+            st["next"] += 1
+        wave += 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Evaluate dialogs wave by wave through a batch API.")
+    parser.add_argument("--dialogs_dir", type=str, default="./dialog",
+                        help="Directory containing dialog_*.jsonl files")
+    parser.add_argument("--output_dir", type=str, default="./evaluation_wo_system",
+                        help="Output directory for eval_*.jsonl")
+    parser.add_argument("--start_id", type=int,
+                        default=0, help="Start dialog ID")
+    parser.add_argument("--end_id", type=int, default=205,
+                        help="End dialog ID (inclusive)")
+    parser.add_argument("--api_key", type=str, default="",
+                        help="API key for model access")
+    parser.add_argument("--base_url", type=str, default="", help="Base URL")
+    parser.add_argument("--model_name", type=str,
+                        default="llama-4-maverick", help="Model name")
+    parser.add_argument("--patience", type=int, default=3,
+                        help="Stop after this many consecutive failures")
+    parser.add_argument("--system_prompt", type=int, default=0, help="")
+    parser.add_argument("--temperature", type=float, default=1.0,
+                        help="Sampling temperature of the target model")
+    parser.add_argument("--judge_api_key", type=str, default="",
+                        help="API key for the LLM judge (default: --api_key)")
+    parser.add_argument("--judge_base_url", type=str, default="",
+                        help="Base URL of the LLM judge (default: --base_url)")
+    parser.add_argument("--combined_judge", type=int, default=0,
+                        help="1: score emotion/reader_age/style of a turn in one judge request")
+    parser.add_argument("--batch_backend", type=str, default="openai", choices=["openai", "local"],
+                        help="openai: Batch API; local: serve batch files with real-time calls")
+    parser.add_argument("--batch_dir", type=str, default="",
+                        help="Where batch input/output files are kept (default: <output>/batches)")
+    parser.add_argument("--poll_interval", type=float, default=30.0,
+                        help="Seconds between batch status polls")
+    parser.add_argument("--local_workers", type=int, default=16,
+                        help="Threads used by the local batch backend")
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+    run(args)
@@ -0,0 +1,377 @@
+# encoding = "utf-8"
+
+'''
+Microbenchmarks of the rule-based Instruction.check_following implementations.
+
+Every checker mode is timed on a deterministic synthetic corpus: small,
+medium, 100 KB and 1 MB prose plus markdown, JSON, HTML, CSV and code-heavy
+responses. Results are the best seconds per call over several rounds;
+the shared text profile cache is cleared before every call, so a result is
+the cost of one checker on a response no other checker has analysed yet.
+--save_baseline stores them and --baseline flags checker/corpus pairs that
+got slower than the stored baseline by more than --tolerance (exit status 1). A fixed calibration
+workload is timed with every run and the baseline is scaled by its speed
+ratio, which absorbs clock-speed drift of shared machines; baselines are
+still only comparable on the same kind of machine and Python version.
+
+python3 src/bench/bench_checkers.py --save_baseline src/bench/baselines/checkers.json
+python3 src/bench/bench_checkers.py --baseline src/bench/baselines/checkers.json --filter length
+python3 src/bench/bench_checkers.py --keywords 1,4,16,64,256
+'''
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+
+from eval import build_instruction_instance  # noqa: E402
+from instruction.text_profile import text_profile  # noqa: E402
+from instruction.keyword_matcher import AhoCorasick, KeywordMatcher, count_word  # noqa: E402
+from instruction.seed_data import get_keywords  # noqa: E402
+from instruction.instruction_utils import (  # noqa: E402
+    get_common_punctuations,
+    get_emojis,
+    get_letters,
+    get_quotation_pairs,
+    get_uncommon_punctuations,
+    keyword_counter,
+)
+
+_WORDS = ("the system data model user response value table network energy market policy "
+          "research result analysis process design student teacher climate health city "
+          "quickly carefully however because although therefore simple complex important "
+          "review report growth signal pattern memory language question answer").split()
+
+
+# -------------------- Synthetic corpus --------------------
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 18))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + rng.choice([".", ".", ".", "?", "!"])
+
+
+def _prose(rng: random.Random, size: int) -> str:
+    paragraphs = []
+    total = 0
+    while total < size:
+        paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(3, 7)))
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:size].rstrip() + "."
+
+
+def _markdown(rng: random.Random, size: int) -> str:
+    parts = []
+    while sum(len(p) for p in parts) < size:
+        parts.append(f"## {_sentence(rng)[:-1]}")
+        parts.append(_prose(rng, 400))
+        parts.append("\n".join(f"- {_sentence(rng)}" for _ in range(4)))
+        parts.append("\n".join(f"* **{rng.choice(_WORDS)}**: {_sentence(rng)}" for _ in range(3)))
+    return "\n\n".join(parts)
+
+
+def _json(rng: random.Random, size: int) -> str:
+    items = []
+    while sum(len(json.dumps(i)) for i in items) < size:
+        items.append({"id": len(items), "name": rng.choice(_WORDS), "score": rng.random(),
+                      "tags": [rng.choice(_WORDS) for _ in range(3)], "note": _sentence(rng)})
+    return json.dumps({"items": items}, indent=2)
+
+
+def _html(rng: random.Random, size: int) -> str:
+    body = []
+    while sum(len(b) for b in body) < size:
+        body.append(f"<h2>{_sentence(rng)[:-1]}</h2>")
+        body.append(f"<p>{_prose(rng, 300)}</p>")
+        body.append("<ul>" + "".join(f"<li>{_sentence(rng)}</li>" for _ in range(3)) + "</ul>")
+    return "<!DOCTYPE html>\n<html><head><title>Report</title></head><body>\n" + \
+        "\n".join(body) + "\n</body></html>"
+
+
+def _csv(rng: random.Random, size: int) -> str:
+    rows = ["id,name,score,comment"]
+    while sum(len(r) + 1 for r in rows) < size:
+        rows.append(
+            f'{len(rows)},{rng.choice(_WORDS)},{rng.randint(0, 100)},"{_sentence(rng)}"')
+    return "\n".join(rows)
+
+
+def _code(rng: random.Random, size: int) -> str:
+    parts = [_prose(rng, 300)]
+    while sum(len(p) for p in parts) < size:
+        name = rng.choice(_WORDS)
+        parts.append(
+            "```python\n"
+            f"def {name}_{len(parts)}(items):\n"
+            f"    # {_sentence(rng)}\n"
+            f"    total = 0\n"
+            f"    for item in items:\n"
+            f"        if item.{rng.choice(_WORDS)} > {rng.randint(0, 9)}:\n"
+            f"            total += item.value * {rng.randint(1, 9)}\n"
+            f"    return {{'{name}': total}}\n"
+            "```")
+        parts.append(_sentence(rng))
+    return "\n\n".join(parts)
+
+
+def build_corpus(seed: int = 0, include_huge: bool = True) -> Dict[str, str]:
+    rng = random.Random(seed)
+    corpus = {
+        "small": _prose(rng, 300),
+        "medium": _prose(rng, 5_000),
+        "large_100k": _prose(rng, 100_000),
+        "markdown": _markdown(rng, 8_000),
+        "json": _json(rng, 8_000),
+        "html": _html(rng, 8_000),
+        "csv": _csv(rng, 8_000),
+        "code": _code(rng, 8_000),
+    }
+    if include_huge:
+        corpus["huge_1m"] = _prose(rng, 1_000_000)
+    return corpus
+
+
+# -------------------- Checker cases --------------------
+def build_cases() -> List[Tuple[str, str, Any]]:
+    """(case name, instruction id, args) for every checker mode."""
+    left, right = get_quotation_pairs()[0]
+    return [
+        ("startwith/letter", "startwith", {"mode": "letter", "value": get_letters()[0]}),
+        ("startwith/emoji", "startwith", {"mode": "emoji", "value": get_emojis()[0]}),
+        ("startwith/keyword", "startwith", {"mode": "keyword", "value": "system"}),
+        ("startwith/quotation", "startwith", {"mode": "quotation", "left": left, "right": right}),
+        ("endwith/letter", "endwith", {"mode": "letter", "value": get_letters()[0]}),
+        ("endwith/emoji", "endwith", {"mode": "emoji", "value": get_emojis()[0]}),
+        ("endwith/keyword", "endwith", {"mode": "keyword", "value": "system"}),
+        ("endwith/quotation", "endwith", {"mode": "quotation", "left": left, "right": right}),
+        ("format/json", "format", {"mode": "json"}),
+        ("format/xml", "format", {"mode": "xml"}),
+        ("format/html", "format", {"mode": "html"}),
+        ("format/csv", "format", {"mode": "csv"}),
+        ("format/markdown", "format", {"mode": "markdown"}),
+        ("countableItems", "countableItems", {"num": 5}),
+        ("length/word", "length", {"mode": "word", "relation": "less_than", "number": 300}),
+        ("length/paragraph", "length", {"mode": "paragraph", "relation": "less_than", "number": 5}),
+        ("length/sentence", "length", {"mode": "sentence", "relation": "less_than", "number": 20}),
+        ("length/characters", "length", {"mode": "characters", "relation": "less_than", "number": 2000}),
+        ("existence", "existence", {"data": 2, "model": 1, "network": 3, "policy": 1}),
+        ("forbidden", "forbidden", ["energy", "market", "memory", "signal", "growth"]),
+        ("case/all_upper", "case", {"mode": "all_upper"}),
+        ("case/all_lower", "case", {"mode": "all_lower"}),
+        ("case/min_upper", "case", {"mode": "min_upper", "min": 3}),
+        ("punctuation/must_include", "punctuation",
+         {"mode": "must_include", "value": get_uncommon_punctuations()[0]}),
+        ("punctuation/must_not_include", "punctuation",
+         {"mode": "must_not_include", "value": get_common_punctuations()[0]}),
+    ]
+
+
+# -------------------- Timing --------------------
+def time_call(fn: Callable[[], Any], min_time: float, repeat: int) -> float:
+    """Best seconds per call over `repeat` rounds of at least min_time each.
+
+    Like timeit, the minimum is reported: slower rounds measure interference
+    from the rest of the machine, not the checker.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+    return min(rounds)
+
+
+def calibrate(min_time: float, repeat: int) -> float:
+    """Seconds per call of a fixed regex/str workload, to normalize machine speed.
+
+    Shared runners change clock speed between runs; every case moves by about
+    the same factor, which this reference workload measures.
+    """
+    text = _prose(random.Random(12345), 20_000)
+    pattern = re.compile(r"\b\w+\b")
+
+    def _workload():
+        len(pattern.findall(text))
+        text.lower().count("the")
+        sum(1 for c in text if c.isupper())
+    return time_call(_workload, min_time, repeat)
+
+
+def run_benchmarks(corpus: Dict[str, str], cases, pattern: str, min_time: float, repeat: int) -> Dict[str, float]:
+    results = {}
+    selector = re.compile(pattern) if pattern else None
+    for case_name, inst_id, args in cases:
+        inst = build_instruction_instance(inst_id, args)
+        for corpus_name, text in corpus.items():
+            key = f"{case_name}@{corpus_name}"
+            if selector is not None and not selector.search(key):
+                continue
+            results[key] = time_call(
+                lambda: (text_profile.cache_clear(), inst.check_following(text)), min_time, repeat)
+    return results
+
+
+# -------------------- Keyword sets --------------------
+def keyword_set(seed: int, size: int) -> List[str]:
+    """Seed keywords (words and phrases) mixed with corpus words, so both hits and misses occur."""
+    pool = sorted(kw for kw in get_keywords() if kw.isascii())
+    random.Random(seed).shuffle(pool)
+    words = list(_WORDS)
+    return [words[i // 2 % len(words)] if i % 2 else pool[i] for i in range(size)]
+
+
+def run_keyword_benchmarks(text: str, sizes: List[int], seed: int, min_time: float,
+                           repeat: int) -> Dict[int, Dict[str, float]]:
+    """Seconds to count keyword sets of each size: one regex per keyword, one
+    str scan per keyword, and the Aho-Corasick pass (lowercasing included)."""
+    results = {}
+    for size in sizes:
+        keywords = keyword_set(seed, size)
+        counters = [keyword_counter(kw) for kw in keywords]
+        needles = [(kw.lower(), re.fullmatch(r"\w+", kw) is not None) for kw in keywords]
+        automaton = AhoCorasick([n for n, _ in needles], [w for _, w in needles])
+
+        def _regex():
+            return [count(text) for count in counters]
+
+        def _scan():
+            lowered = text.lower()
+            return [count_word(lowered, n) if w else lowered.count(n) for n, w in needles]
+
+        def _automaton():
+            return automaton.counts(text.lower().encode("ascii"))
+
+        def _matcher():
+            text_profile.cache_clear()
+            return KeywordMatcher(keywords).counts(text)
+
+        assert _regex() == _scan() == _automaton() == _matcher(), size
+        results[size] = {name: time_call(fn, min_time, repeat) for name, fn in
+                         (("regex", _regex), ("scan", _scan), ("automaton", _automaton),
+                          ("matcher", _matcher))}
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float,
+            noise_floor: float, scale: float = 1.0) -> List[Tuple[str, float, float]]:
+    """Return (key, baseline, current) of every case slower than the baseline allows.
+
+    Baseline times are multiplied by `scale`, the current/baseline ratio of the
+    calibration workload.
+    """
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        base *= scale
+        if current > base * (1.0 + tolerance) and current - base > noise_floor:
+            regressions.append((key, base, current))
+    return regressions
+
+
+def _fmt(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.3f} ms"
+    return f"{seconds * 1e6:9.2f} us"
+
+
+def main(args):
+    if args.keywords:
+        text = build_corpus(args.seed, include_huge=False)["large_100k"]
+        sizes = [int(n) for n in args.keywords.split(",")]
+        print(f"Keyword sets on a {len(text)}B response (matcher includes building it)")
+        print(f"{'keywords':>8s} {'regex':>12s} {'scan':>12s} {'automaton':>12s} {'matcher':>12s}")
+        for size, row in run_keyword_benchmarks(text, sizes, args.seed, args.min_time, args.repeat).items():
+            print(f"{size:8d} " + " ".join(f"{_fmt(row[name]):>12s}"
+                                           for name in ("regex", "scan", "automaton", "matcher")))
+        return 0
+    corpus = build_corpus(args.seed, include_huge=not args.quick)
+    print("Corpus: " + ", ".join(f"{k}={len(v)}B" for k, v in corpus.items()))
+    calibration = calibrate(args.min_time, args.repeat)
+    results = run_benchmarks(corpus, build_cases(),
+                             args.filter, args.min_time, args.repeat)
+    # Calibrate on both sides of the run so a clock change mid-run is caught
+    calibration = min(calibration, calibrate(args.min_time, args.repeat))
+
+    baseline, scale = {}, 1.0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        baseline = stored["results"]
+        if args.calibrate and stored.get("calibration"):
+            scale = calibration / stored["calibration"]
+        print(f"Calibration: {_fmt(calibration)} (x{scale:.2f} vs baseline machine speed)")
+    for key, seconds in results.items():
+        line = f"{key:48s} {_fmt(seconds)}"
+        if key in baseline:
+            line += f"   x{seconds / (baseline[key] * scale):.2f} vs baseline"
+        print(line)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or ".", exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "seed": args.seed,
+                       "calibration": calibration, "results": results},
+                      f, indent=2, sort_keys=True)
+
+    if baseline:
+        regressions = compare(results, baseline,
+                              args.tolerance, args.noise_floor, scale)
+        for key, base, current in regressions:
+            print(f"REGRESSION {key}: {_fmt(base)} -> {_fmt(current)}")
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        return 1 if regressions else 0
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Time every rule-based checker mode on a synthetic response corpus.")
+    parser.add_argument("--filter", type=str, default="",
+                        help="Regex selecting '<case>@<corpus>' keys, e.g. 'length/sentence' or '@huge'")
+    parser.add_argument("--keywords", type=str, default="",
+                        help="Comma-separated keyword-set sizes, e.g. '1,4,16,64,256': time keyword "
+                             "counting on the 100 KB response instead of the checkers")
+    parser.add_argument("--quick", type=int, default=0,
+                        help="1: skip the 1 MB response")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed of the synthetic corpus")
+    parser.add_argument("--min_time", type=float, default=0.02,
+                        help="Minimum seconds per timing round")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Timing rounds per case (the best one is reported)")
+    parser.add_argument("--baseline", type=str, default="",
+                        help="Baseline JSON to compare against")
+    parser.add_argument("--save_baseline", type=str, default="",
+                        help="Write the results as a new baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Allowed slowdown relative to the baseline")
+    parser.add_argument("--calibrate", type=int, default=1,
+                        help="1: scale the baseline by the measured machine speed before comparing")
+    parser.add_argument("--noise_floor", type=float, default=5e-6,
+                        help="Ignore slowdowns smaller than this many seconds per call")
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+    sys.exit(main(args))
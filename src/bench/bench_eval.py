@@ -0,0 +1,141 @@
+# encoding = "utf-8"
+
+'''
+End-to-end throughput benchmark of the evaluation harness, fully offline.
+
+Starts bench/fake_server.py in a subprocess, runs eval.run() against it and
+reports turns/sec, API calls/sec and the harness CPU time per turn (CPU of
+this process only; the fake server runs in its own process). Options are
+split three ways: the ones below, fake_server.py options (latency, error
+injection, responses) and eval.py options, e.g.
+
+python3 src/bench/bench_eval.py --end_id 49 --latency lognormal:-3,0.5 --concurrency 32 --combined_judge 1
+'''
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+
+import eval as eval_module  # noqa: E402
+from bench import fake_server  # noqa: E402
+
+_SERVER = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "fake_server.py")
+
+
+def start_server(server_args: argparse.Namespace):
+    """Start the fake server on a free port; returns (process, base_url)."""
+    argv = [sys.executable, _SERVER]
+    for key, value in vars(server_args).items():
+        if key == "port":
+            value = 0
+        if isinstance(value, list):
+            if value:
+                argv += [f"--{key}", *value]
+        else:
+            argv += [f"--{key}", str(value)]
+    proc = subprocess.Popen(argv, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line:
+        proc.kill()
+        raise RuntimeError("Fake server did not start")
+    return proc, line.strip().split()[-1]
+
+
+def server_stats(base_url: str, reset: bool = False) -> Dict[str, int]:
+    url = base_url.rstrip("/") + ("/stats/reset" if reset else "/stats")
+    request = urllib.request.Request(
+        url, data=b"" if reset else None, method="POST" if reset else "GET")
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def count_turns(out_dir: str) -> int:
+    turns = 0
+    if not os.path.isdir(out_dir):
+        return turns
+    for name in os.listdir(out_dir):
+        if name.startswith("eval_") and name.endswith(".jsonl"):
+            with open(os.path.join(out_dir, name), "rb") as f:
+                turns += sum(1 for line in f if line.strip())
+    return turns
+
+
+def bench_once(eval_argv: List[str], base_url: str, keep_output: bool) -> Dict[str, Any]:
+    output_dir = tempfile.mkdtemp(prefix="bench_eval_")
+    args = eval_module.build_parser().parse_args(
+        ["--model_name", "bench", "--api_key", "bench", "--base_url", base_url,
+         *eval_argv, "--output_dir", output_dir])
+    server_stats(base_url, reset=True)
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    eval_module.run(args)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    stats = server_stats(base_url)
+    turns = count_turns(os.path.join(output_dir, args.model_name.split("/")[-1]))
+    if keep_output:
+        print(f"Outputs kept in {output_dir}")
+    else:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return {
+        "turns": turns,
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "turns_per_s": turns / wall if wall > 0 else None,
+        "calls_per_s": stats["requests"] / wall if wall > 0 else None,
+        "cpu_ms_per_turn": 1000.0 * cpu / turns if turns else None,
+        "server": stats,
+    }
+
+
+def _fmt(value, unit: str = "") -> str:
+    # None when the run finished no turns (empty range, dialogs already done)
+    return "n/a" if value is None else f"{value:.2f}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark eval.py against a local fake endpoint.", add_help=False)
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Number of measured runs")
+    parser.add_argument("--keep_output", type=int, default=0,
+                        help="1: keep the eval_*.jsonl outputs of every run")
+    parser.add_argument("--bench_report", type=str, default="",
+                        help="Optional JSON file with the results of every run")
+    bench_args, rest = parser.parse_known_args()
+    server_args, eval_argv = fake_server.build_parser().parse_known_args(rest)
+
+    proc, base_url = start_server(server_args)
+    try:
+        results = []
+        for i in range(bench_args.repeat):
+            result = bench_once(eval_argv, base_url,
+                                bool(bench_args.keep_output))
+            results.append(result)
+            print(f"[run {i}] turns={result['turns']} wall={result['wall_s']:.2f}s "
+                  f"turns/s={_fmt(result['turns_per_s'])} calls/s={_fmt(result['calls_per_s'])} "
+                  f"cpu/turn={_fmt(result['cpu_ms_per_turn'], 'ms')} server={result['server']}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    if bench_args.bench_report:
+        with open(bench_args.bench_report, "w", encoding="utf-8") as f:
+            json.dump({"eval_args": eval_argv, "server_args": vars(server_args), "runs": results},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
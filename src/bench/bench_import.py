@@ -0,0 +1,151 @@
+# encoding = "utf-8"
+
+'''
+Import-time benchmark of the entry modules, based on `python -X importtime`.
+
+Every target is imported in a fresh interpreter several times; the best
+cumulative import time of the module itself is reported, together with the
+packages it spent the most time on. Two guards exit with status 1:
+- a target imports a package listed as deferred for it (nltk, openai, ...
+  must only be imported when first needed), or
+- with --baseline, a target got slower than the stored time by more than
+  --tolerance (and more than --noise_floor).
+
+python3 src/bench/bench_import.py --baseline src/bench/baselines/imports.json
+python3 src/bench/bench_import.py --save_baseline src/bench/baselines/imports.json
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages no target may import at import time
+_DEFERRED = ("nltk", "openai", "httpx", "tqdm", "numpy")
+
+# target module -> packages it must not import at import time
+TARGETS: Dict[str, Tuple[str, ...]] = {
+    "instruction": _DEFERRED,
+    "instruction.registry": _DEFERRED,
+    "instruction.plan": _DEFERRED,
+    "eval": _DEFERRED,
+    "recheck": _DEFERRED,
+    "sweep": _DEFERRED,
+    "batch_eval": _DEFERRED,
+}
+
+
+def import_once(module: str) -> Tuple[float, Dict[str, float]]:
+    """Import module in a fresh interpreter; (its cumulative seconds, {top-level package: seconds})."""
+    code = f"import sys; sys.path.insert(0, {_SRC!r}); import {module}"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, cwd=_SRC)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    # Entries are printed children first; the target's imports are the
+    # lines since the previous top-level entry (interpreter startup, site, ...)
+    block: List[Tuple[str, float]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, raw_name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        name = raw_name.strip()
+        block.append((name, int(cumulative) * 1e-6))
+        if len(raw_name) - len(raw_name.lstrip()) > 1:
+            continue
+        if name == module:
+            packages: Dict[str, float] = {}
+            for child, seconds in block[:-1]:
+                top = child.split(".")[0]
+                packages[top] = max(packages.get(top, 0.0), seconds)
+            return block[-1][1], packages
+        block = []
+    raise RuntimeError(f"no importtime entry for {module}")
+
+
+def run_benchmarks(targets: List[str], repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for module in targets:
+        best, packages = None, {}
+        for _ in range(repeat):
+            seconds, found = import_once(module)
+            if best is None or seconds < best:
+                best, packages = seconds, found
+        results[module] = {"seconds": best, "packages": packages}
+    return results
+
+
+def _fmt(seconds: float) -> str:
+    return f"{seconds * 1e3:8.1f} ms"
+
+
+def main(args):
+    targets = [t for t in TARGETS if not args.filter or args.filter in t]
+    results = run_benchmarks(targets, args.repeat)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    failures = []
+    for module, result in results.items():
+        seconds = result["seconds"]
+        line = f"{module:24s} {_fmt(seconds)}"
+        if module in baseline:
+            line += f"   x{seconds / baseline[module]:.2f} vs baseline"
+            if seconds > baseline[module] * (1 + args.tolerance) and \
+                    seconds - baseline[module] > args.noise_floor:
+                failures.append(f"REGRESSION {module}: {_fmt(baseline[module])} -> {_fmt(seconds)}")
+        print(line)
+        heavy = sorted(result["packages"].items(), key=lambda kv: kv[1], reverse=True)
+        heavy = [(name, s) for name, s in heavy if s >= args.report_threshold]
+        if heavy:
+            print("    " + ", ".join(f"{name} {s * 1e3:.1f} ms" for name, s in heavy[:6]))
+        for name in TARGETS[module]:
+            if name in result["packages"]:
+                failures.append(f"DEFERRED IMPORT {module} imports {name} "
+                                f"({_fmt(result['packages'][name]).strip()})")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or ".", exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0],
+                       "results": {m: r["seconds"] for m, r in results.items()}},
+                      f, indent=2, sort_keys=True)
+
+    for failure in failures:
+        print(failure)
+    return 1 if failures else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Time the imports of the entry modules with python -X importtime.")
+    parser.add_argument("--filter", type=str, default="",
+                        help="Only targets containing this substring")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Fresh interpreters per target (the best one is reported)")
+    parser.add_argument("--baseline", type=str, default="",
+                        help="Baseline JSON to compare against")
+    parser.add_argument("--save_baseline", type=str, default="",
+                        help="Write the results as a new baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=1.0,
+                        help="Allowed slowdown relative to the baseline")
+    parser.add_argument("--noise_floor", type=float, default=0.02,
+                        help="Ignore slowdowns smaller than this many seconds")
+    parser.add_argument("--report_threshold", type=float, default=0.005,
+                        help="List imported packages taking at least this many seconds")
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+    sys.exit(main(args))
@@ -0,0 +1,129 @@
+# encoding = "utf-8"
+
+'''
+Equivalence check and timing of the sentence segmenter on the dialog corpus.
+
+Every string of the dialog files (queries, descriptions, personas, ...) and,
+with --eval_dirs, every stored response is counted as LengthInstruction
+counts it (stripped text) twice: with the Punkt tokenizer directly, as
+before the segmenter existed, and with SentenceSegmenter (fast path, memo,
+count_batch). Any difference is printed and makes the exit status 1.
+
+The English Punkt model comes from the nltk data path; where it is not
+installed, --untrained 1 (or the automatic fallback) uses an untrained
+PunktSentenceTokenizer, which exercises the same break rules.
+
+python3 src/bench/bench_sentences.py --dialogs_dir dialog
+python3 src/bench/bench_sentences.py --dialogs_dir dialog --eval_dirs output/gpt-4o
+'''
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from typing import Any, Iterable, List
+
+sys.path.insert(0, os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+
+from instruction.sentence_segmenter import SentenceSegmenter, fast_count, load_punkt  # noqa: E402
+
+
+def _strings(value: Any) -> Iterable[str]:
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _strings(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _strings(v)
+
+
+def load_texts(dialogs_dir: str, eval_dirs: List[str]) -> List[str]:
+    """Stripped non-empty strings of the dialog files and stored responses."""
+    texts = []
+    paths = sorted(glob.glob(os.path.join(dialogs_dir, "*.jsonl")))
+    for eval_dir in eval_dirs:
+        paths += sorted(glob.glob(os.path.join(eval_dir, "eval_*.jsonl")))
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    texts.extend(s.strip() for s in _strings(json.loads(line)) if s.strip())
+    return texts
+
+
+def reference_tokenizer(untrained: bool):
+    if not untrained:
+        try:
+            return load_punkt(), "punkt english"
+        except Exception as e:
+            print(f"Punkt model unavailable ({type(e).__name__}); using an untrained tokenizer")
+    from nltk.tokenize.punkt import PunktSentenceTokenizer
+    return PunktSentenceTokenizer(), "untrained punkt"
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(args):
+    texts = load_texts(args.dialogs_dir, args.eval_dirs)
+    if not texts:
+        print(f"No texts found in {args.dialogs_dir}")
+        return 1
+    tokenizer, name = reference_tokenizer(bool(args.untrained))
+    print(f"{len(texts)} texts ({len(set(texts))} distinct), reference: {name}")
+
+    expected, t_ref = _timed(lambda: [len(tokenizer.tokenize(t)) for t in texts])
+
+    segmenter = SentenceSegmenter(loader=lambda: tokenizer, fast_path=not args.no_fast_path)
+    counted, t_cold = _timed(lambda: [segmenter.count(t) for t in texts])
+    counted_again, t_memo = _timed(lambda: [segmenter.count(t) for t in texts])
+    stats = dict(segmenter.stats)
+    batch_segmenter = SentenceSegmenter(loader=lambda: tokenizer, fast_path=not args.no_fast_path)
+    batched, t_batch = _timed(lambda: batch_segmenter.count_batch(texts))
+
+    mismatches = 0
+    for label, got in (("count", counted), ("memo", counted_again), ("batch", batched)):
+        for text, want, have in zip(texts, expected, got):
+            if want != have:
+                mismatches += 1
+                if mismatches <= args.show:
+                    print(f"MISMATCH {label}: punkt {want} vs {have}: {text[:120]!r}")
+
+    fast = sum(1 for t in texts if segmenter.fast_path and fast_count(t) is not None)
+    print(f"fast path: {fast}/{len(texts)} texts ({fast / len(texts):.1%}); "
+          f"first pass {stats['punkt']} segmented, second pass {stats['memo']} memo hits")
+    for label, seconds in (("punkt", t_ref), ("segmenter cold", t_cold),
+                           ("segmenter memo", t_memo), ("count_batch", t_batch)):
+        print(f"{label:16s} {seconds * 1e3:9.2f} ms")
+    print(f"mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Compare SentenceSegmenter counts with Punkt on the dialog corpus.")
+    parser.add_argument("--dialogs_dir", type=str, default="dialog",
+                        help="Directory of dialog_*.jsonl files")
+    parser.add_argument("--eval_dirs", type=str, nargs="*", default=[],
+                        help="Evaluation output directories whose responses are checked too")
+    parser.add_argument("--untrained", type=int, default=0,
+                        help="1 to compare against an untrained Punkt tokenizer")
+    parser.add_argument("--no_fast_path", action="store_true",
+                        help="Disable the segmenter's fast path")
+    parser.add_argument("--show", type=int, default=20,
+                        help="Print at most this many mismatches")
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+    sys.exit(main(args))
@@ -0,0 +1,286 @@
+# encoding = "utf-8"
+
+'''
+Local stand-in for an OpenAI-compatible chat-completions endpoint.
+
+Serves POST /v1/chat/completions (plain and streamed) without any model, so
+the evaluation harness can be exercised and benchmarked offline:
+- latency: per-request delay drawn from a distribution, separately for
+  target generations and JSON-mode judge calls,
+- errors: a share of requests fails with 429 (with Retry-After) or 500,
+- responses: a canned text of --response_words words, or, with
+  --responses_from, a response that satisfied every rule-based constraint of
+  the same user query in earlier eval_*.jsonl outputs (falls back to canned),
+- judge calls (response_format json_object) get {"rationale", "score"}
+  replies, one per aspect for combined judge prompts.
+GET /stats returns request counters; POST /stats/reset clears them.
+
+python3 src/bench/fake_server.py --port 8000 --latency lognormal:-2.5,0.5 --p429 0.05
+'''
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+# Aspect ids listed in the output format of a combined judge prompt
+_COMBINED_FIELD = re.compile(r'^\s*"(\w+)": \{"rationale"', re.M)
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """fixed:S | uniform:LO,HI | lognormal:MU,SIGMA | exp:MEAN (seconds)."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1.0 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def load_satisfying_responses(dirs: List[str]) -> Dict[str, str]:
+    """Map user query -> a stored response that passed all rule-based constraints."""
+    responses: Dict[str, str] = {}
+    for input_dir in dirs:
+        for name in sorted(os.listdir(input_dir)):
+            if not (name.startswith("eval_") and name.endswith(".jsonl")):
+                continue
+            with open(os.path.join(input_dir, name), "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    eval_result = record.get("eval") or {}
+                    judged = set((eval_result.get("sub_details") or {}))
+                    details = eval_result.get("details") or {}
+                    if all(ok for k, ok in details.items() if k not in judged):
+                        responses.setdefault(
+                            record.get("user_query_verified"), record.get("response"))
+    return responses
+
+
+class FakeBackend:
+
+    def __init__(self, args):
+        self.generation_latency = parse_latency(args.latency)
+        self.judge_latency = parse_latency(args.judge_latency or args.latency)
+        self.p429 = args.p429
+        self.p500 = args.p500
+        self.retry_after = args.retry_after
+        self.judge_score = args.judge_score
+        self.chunk_words = args.chunk_words
+        self.chunk_delay = args.chunk_delay
+        self.canned = " ".join(
+            ["The quick brown fox jumps over the lazy dog."] * max(1, args.response_words // 9))
+        self.satisfying = load_satisfying_responses(
+            args.responses_from) if args.responses_from else {}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {"requests": 0, "generation": 0, "judge": 0,
+                             "throttled": 0, "errors": 0, "satisfying": 0}
+
+    def count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    def failure(self) -> Optional[int]:
+        r = random.random()
+        if r < self.p429:
+            return 429
+        if r < self.p429 + self.p500:
+            return 500
+        return None
+
+    def completion(self, body: Dict[str, Any]) -> str:
+        messages = body.get("messages") or []
+        prompt = messages[-1].get("content") if messages else ""
+        if body.get("response_format"):
+            self.count("judge")
+            time.sleep(self.judge_latency())
+            aspects = _COMBINED_FIELD.findall(prompt or "")
+            if aspects:
+                return json.dumps({a: {"rationale": "stand-in", "score": self.judge_score} for a in aspects})
+            return json.dumps({"rationale": "stand-in", "score": self.judge_score})
+        self.count("generation")
+        time.sleep(self.generation_latency())
+        response = self.satisfying.get(prompt)
+        if response is not None:
+            self.count("satisfying")
+            return response
+        return self.canned
+
+
+def make_handler(backend: FakeBackend):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, obj: Any, headers: Dict[str, str] = None):
+            out = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(out)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self._send_json(200, backend.stats())
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if self.path.rstrip("/").endswith("/stats/reset"):
+                backend.reset()
+                self._send_json(200, backend.stats())
+                return
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            body = json.loads(raw or b"{}")
+            backend.count("requests")
+
+            status = backend.failure()
+            if status == 429:
+                backend.count("throttled")
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                                {"Retry-After": str(backend.retry_after)})
+                return
+            if status == 500:
+                backend.count("errors")
+                self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                return
+
+            content = backend.completion(body)
+            prompt_tokens = sum(len(m.get("content") or "")
+                                for m in body.get("messages") or []) // 4
+            completion_tokens = max(1, len(content) // 4)
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_tokens + completion_tokens}
+            if body.get("stream"):
+                self._stream(body, content, usage)
+                return
+            self._send_json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        def _stream(self, body: Dict[str, Any], content: str, usage: Dict[str, int]):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def _event(data: str):
+                payload = ("data: " + data + "\n\n").encode("utf-8")
+                self.wfile.write(b"%x\r\n" % len(payload) + payload + b"\r\n")
+
+            def _chunk(delta, finish_reason=None):
+                return json.dumps({
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }, ensure_ascii=False)
+
+            words = re.findall(r"\S+\s*", content) or [content]
+            try:
+                for i in range(0, len(words), backend.chunk_words):
+                    _event(_chunk({"content": "".join(
+                        words[i:i + backend.chunk_words])}))
+                    if backend.chunk_delay:
+                        time.sleep(backend.chunk_delay)
+                _event(_chunk({}, "stop"))
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    _event(json.dumps({"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                                       "created": int(time.time()), "model": body.get("model"),
+                                       "choices": [], "usage": usage}))
+                _event("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading (e.g. --max_response_bytes)
+                pass
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing idle keep-alive connections is not an error here
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def serve(args) -> ThreadingHTTPServer:
+    """Create the server (not yet serving); the bound port is server.server_address[1]."""
+    return _Server((args.host, args.port), make_handler(FakeBackend(args)))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Local OpenAI-compatible stand-in server for offline runs and benchmarks.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000,
+                        help="Port to listen on (0: any free port)")
+    parser.add_argument("--latency", type=str, default="fixed:0.05",
+                        help="Generation latency: fixed:S, uniform:LO,HI, lognormal:MU,SIGMA or exp:MEAN")
+    parser.add_argument("--judge_latency", type=str, default="",
+                        help="Judge latency distribution (default: --latency)")
+    parser.add_argument("--p429", type=float, default=0.0,
+                        help="Share of requests answered with 429")
+    parser.add_argument("--p500", type=float, default=0.0,
+                        help="Share of requests answered with 500")
+    parser.add_argument("--retry_after", type=float, default=1.0,
+                        help="Retry-After seconds sent with a 429")
+    parser.add_argument("--response_words", type=int, default=200,
+                        help="Length of the canned response")
+    parser.add_argument("--responses_from", type=str, nargs="*", default=[],
+                        help="eval_*.jsonl directories to serve rule-satisfying responses from")
+    parser.add_argument("--judge_score", type=int, default=8,
+                        help="Score returned by judge calls")
+    parser.add_argument("--chunk_words", type=int, default=4,
+                        help="Words per streamed chunk")
+    parser.add_argument("--chunk_delay", type=float, default=0.0,
+                        help="Delay between streamed chunks in seconds")
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+    server = serve(args)
+    print(f"Fake chat-completions server on http://{args.host}:{server.server_address[1]}/v1",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,127 @@
+# encoding = "utf-8"
+'''
+Per-checker timing and failure counters.
+
+check_all_instructions turns every checker exception into a failed
+constraint (rule-based) or a score of 0 (LLM judge), so a crashing checker,
+an unparsable judge reply or a slow regex only shows up as a lower score.
+CheckerMetrics aggregates, per instruction id and mode (e.g. "length/word",
+"emotion", "style[combined]"), the number of checks, the wall time as a
+log-scale histogram, and the exceptions by type with one example message.
+Judge times include the API round-trip. The snapshot is written as a JSON
+sidecar next to the eval_*.jsonl files (eval.py --checker_metrics).
+'''
+
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket is open
+BUCKETS = (1e-5, 3e-5, 1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2,
+           0.1, 0.3, 1.0, 3.0, 10.0, 30.0, 100.0)
+
+_EXAMPLE_CHARS = 300
+
+
+def checker_key(inst_id: str, args: Any, combined: bool = False) -> str:
+    """Histogram key of a constraint: the instruction id plus its mode, if any."""
+    key = inst_id
+    if isinstance(args, dict) and isinstance(args.get("mode"), str):
+        key = f"{inst_id}/{args['mode']}"
+    return key + "[combined]" if combined else key
+
+
+def _bucket_label(i: int) -> str:
+    return f"<={BUCKETS[i]:g}s" if i < len(BUCKETS) else f">{BUCKETS[-1]:g}s"
+
+
+class CheckerMetrics:
+    """Thread-safe aggregation of per-checker wall times and exceptions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checkers: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, key: str, seconds: float, error: Optional[BaseException] = None):
+        bucket = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                bucket = i
+                break
+        with self._lock:
+            entry = self._checkers.get(key)
+            if entry is None:
+                entry = self._checkers[key] = {
+                    "count": 0, "errors": 0, "total_s": 0.0, "max_s": 0.0,
+                    "buckets": [0] * (len(BUCKETS) + 1), "exceptions": {}}
+            entry["count"] += 1
+            entry["total_s"] += seconds
+            entry["max_s"] = max(entry["max_s"], seconds)
+            entry["buckets"][bucket] += 1
+            if error is not None:
+                entry["errors"] += 1
+                name = type(error).__name__
+                exc = entry["exceptions"].setdefault(
+                    name, {"count": 0, "example": str(error)[:_EXAMPLE_CHARS]})
+                exc["count"] += 1
+
+    @staticmethod
+    def _quantile(buckets, count: int, q: float) -> Optional[str]:
+        """Bucket label holding the q-quantile (histograms only bound percentiles)."""
+        if count == 0:
+            return None
+        target = q * count
+        seen = 0
+        for i, n in enumerate(buckets):
+            seen += n
+            if seen >= target:
+                return _bucket_label(i)
+        return _bucket_label(len(buckets) - 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            checkers = {k: {**v, "buckets": list(v["buckets"]),
+                            "exceptions": {n: dict(e) for n, e in v["exceptions"].items()}}
+                        for k, v in self._checkers.items()}
+        out = {}
+        for key in sorted(checkers):
+            entry = checkers[key]
+            count = entry["count"]
+            out[key] = {
+                "count": count,
+                "errors": entry["errors"],
+                "total_s": entry["total_s"],
+                "mean_s": entry["total_s"] / count if count else 0.0,
+                "max_s": entry["max_s"],
+                "p50": self._quantile(entry["buckets"], count, 0.5),
+                "p99": self._quantile(entry["buckets"], count, 0.99),
+                "histogram": {_bucket_label(i): n for i, n in enumerate(entry["buckets"]) if n},
+                "exceptions": entry["exceptions"],
+            }
+        return {"buckets_s": list(BUCKETS), "checkers": out}
+
+    def summary(self, top: int = 5) -> str:
+        """One line per checker that raised, plus the slowest checkers by total time."""
+        checkers = self.snapshot()["checkers"]
+        lines = []
+        for key, entry in checkers.items():
+            if entry["errors"]:
+                kinds = ", ".join(f"{n} x{e['count']}" for n,
+                                  e in entry["exceptions"].items())
+                lines.append(
+                    f"  {key}: {entry['errors']}/{entry['count']} raised ({kinds})")
+        slowest = sorted(checkers.items(),
+                         key=lambda kv: kv[1]["total_s"], reverse=True)[:top]
+        for key, entry in slowest:
+            lines.append(f"  {key}: {entry['count']} checks, {entry['total_s']:.3f}s total, "
+                         f"max {entry['max_s'] * 1e3:.2f}ms, p99 {entry['p99']}")
+        return "\n".join(lines)
+
+    def dump(self, path: str):
+        """Write the snapshot atomically, so a reader never sees a partial file."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
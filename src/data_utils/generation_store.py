@@ -0,0 +1,81 @@
+# encoding = "utf-8"
+'''
+Record-and-replay store for target-model generations.
+
+A completion is keyed by (model_name, system_prompt flag, hash of the full
+message list, temperature, max_tokens, response byte cap), so a capped run
+never replays uncapped generations or the reverse. Keys of uncapped
+completions are the same as before the caps existed. Streaming is not part
+of the key: a streamed completion is the same text as a non-streamed one,
+and the byte cap (which only applies to streamed responses) is keyed as the
+cap that was actually in effect.
+- record: every completion returned by the API is written to the store.
+- replay: completions are served from the store only; a missing entry is an
+  error and the network is never touched.
+Replaying lets the whole pipeline be rerun after checker or scoring changes
+with exact reproducibility (combine with --judge_cache for zero API calls).
+'''
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+GENERATION_STORE_MODES = ("record", "replay")
+
+
+class GenerationStore:
+    """SQLite-backed store of target-model completions."""
+
+    def __init__(self, path: str, mode: str = "record"):
+        if mode not in GENERATION_STORE_MODES:
+            raise ValueError(
+                f"Unknown generation store mode: {mode} (expected one of {GENERATION_STORE_MODES})")
+        self.path = path
+        self.mode = mode
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            "key TEXT PRIMARY KEY, model_name TEXT NOT NULL, generation TEXT NOT NULL, "
+            "prompt_tokens INTEGER, completion_tokens INTEGER)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(model_name: str, system_prompt: Any, messages: List[Dict[str, str]], temperature: float,
+                 max_tokens: Optional[int] = None, max_bytes: Optional[int] = None) -> str:
+        messages_hash = hashlib.sha256(json.dumps(
+            messages, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+        fields = [model_name, system_prompt, messages_hash, float(temperature)]
+        if max_tokens or max_bytes:
+            # Only capped completions get the extra fields (uncapped keys stay valid)
+            fields += [int(max_tokens or 0), int(max_bytes or 0)]
+        raw = json.dumps(fields)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, int, int]]:
+        row = self._conn().execute(
+            "SELECT generation, prompt_tokens, completion_tokens FROM generations WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], row[2]
+
+    def put(self, key: str, model_name: str, generation: str, prompt_tokens: int, completion_tokens: int):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO generations "
+            "(key, model_name, generation, prompt_tokens, completion_tokens) VALUES (?, ?, ?, ?, ?)",
+            (key, model_name, generation, prompt_tokens, completion_tokens))
+        conn.commit()
@@ -0,0 +1,284 @@
+# encoding = "utf-8"
+'''
+Crash-safe writer for the eval_{id}.jsonl files of one output directory.
+
+- Turn records are appended to eval_{id}.jsonl as before; a background thread
+  fsyncs the files written since the last round in one group commit.
+- After every group commit, the tail index (_journal_index.json) records for
+  each dialog the durable byte size/mtime of its file, the number of finished
+  turns and the remaining patience. The manifest (_manifest.json) lists the
+  dialog ids that are completed (all turns done or patience exhausted).
+- On resume, a completed dialog whose file still matches the index is skipped
+  with a single stat; any other file (written after the last commit, rewritten
+  by recheck.py, produced by an older run) is rescanned, after cutting off a
+  torn last line left by a crash.
+
+Several processes (e.g. work-queue workers) may share one output directory:
+every commit re-reads the index under a lock file and merges its own entries
+into it, and temporary files get unique names, so writers neither drop each
+other's entries nor publish a half-written index.
+'''
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, the merge still applies
+    fcntl = None
+
+INDEX_FILE = "_journal_index.json"
+MANIFEST_FILE = "_manifest.json"
+
+
+def _atomic_write_json(path: str, obj: Any):
+    # Unique name: concurrent writers must not share (and publish) one tmp file
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+
+def _read_json(path: str, default: Any) -> Any:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+@contextlib.contextmanager
+def _locked(path: str):
+    """Exclusive advisory lock on path (a no-op where fcntl is unavailable)."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a+") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def truncate_torn_tail(path: str):
+    """Drop a partially written last line (no trailing newline) from a JSONL file."""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Scan backwards for the last complete line
+        pos = size
+        while pos > 0:
+            step = min(65536, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            cut = chunk.rfind(b"\n")
+            if cut != -1:
+                f.truncate(pos - step + cut + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+class EvalJournal:
+
+    def __init__(self, out_dir: str, commit_interval: float = 1.0):
+        self.out_dir = out_dir
+        self.commit_interval = commit_interval
+        self.index_path = os.path.join(out_dir, INDEX_FILE)
+        self.manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+        self.lock_path = self.index_path + ".lock"
+
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        self._files: Dict[int, Any] = {}
+        self._live: Dict[int, Dict[str, Any]] = {}
+        self._dirty = set()
+        self._done_pending = set()
+
+        self._index: Dict[str, Dict[str, Any]] = _read_json(self.index_path, {})
+        if not isinstance(self._index, dict):
+            self._index = {}
+
+        self._committer = threading.Thread(
+            target=self._commit_loop, name="journal-commit", daemon=True)
+        self._committer.start()
+
+    # -------------------- resume --------------------
+    def _matches(self, entry: Optional[Dict[str, Any]], path: str) -> bool:
+        if entry is None:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]
+
+    def is_done(self, file_id: int, path: str) -> bool:
+        """True if the dialog was completed and its file is unchanged since."""
+        entry = self._index.get(str(file_id))
+        return bool(entry and entry.get("done")) and self._matches(entry, path)
+
+    def committed(self, file_id: int, path: str) -> Optional[Dict[str, Any]]:
+        """Return the committed tail of a dialog if it still describes its file."""
+        entry = self._index.get(str(file_id))
+        return entry if self._matches(entry, path) else None
+
+    def lookup(self, file_id: int, path: str) -> Optional[Dict[str, Any]]:
+        """Like committed(), but prepare a file that does not match for a rescan.
+
+        Returns None when the file has to be rescanned; a torn last line is
+        removed first so the next append starts on a fresh line.
+        """
+        entry = self.committed(file_id, path)
+        if entry is not None:
+            return entry
+        if os.path.exists(path):
+            truncate_torn_tail(path)
+        return None
+
+    def begin(self, file_id: int, turns: int, remaining_patience):
+        """Start tracking a dialog resumed after `turns` finished turns."""
+        with self._lock:
+            self._live[file_id] = {"turns": turns,
+                                   "remaining_patience": remaining_patience,
+                                   "done": False}
+
+    # -------------------- writes --------------------
+    def append(self, file_id: int, record: Dict[str, Any]):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            f = self._files.get(file_id)
+            if f is None:
+                f = open(os.path.join(
+                    self.out_dir, f"eval_{file_id}.jsonl"), "ab")
+                self._files[file_id] = f
+            f.write(line)
+            live = self._live.setdefault(
+                file_id, {"turns": 0, "remaining_patience": None, "done": False})
+            live["turns"] += 1
+            live["remaining_patience"] = record.get("remaining_patience")
+            self._dirty.add(file_id)
+
+    def mark_done(self, file_id: int):
+        with self._lock:
+            live = self._live.setdefault(
+                file_id, {"turns": 0, "remaining_patience": None, "done": False})
+            live["done"] = True
+            self._dirty.add(file_id)
+            self._done_pending.add(file_id)
+        self._wake.set()
+
+    # -------------------- group commit --------------------
+    def commit(self):
+        """fsync every file written since the last commit, then publish the index."""
+        with self._commit_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                done, self._done_pending = self._done_pending, set()
+                to_sync = []
+                snapshot = {}
+                for file_id in dirty:
+                    f = self._files.get(file_id)
+                    if f is not None:
+                        f.flush()
+                        to_sync.append(f)
+                    path = os.path.join(
+                        self.out_dir, f"eval_{file_id}.jsonl")
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    snapshot[file_id] = {**self._live[file_id],
+                                         "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            if not snapshot:
+                return
+            for f in to_sync:
+                os.fsync(f.fileno())
+
+            with _locked(self.lock_path):
+                # Other processes sharing the directory may have committed
+                # since: merge into the index on disk, not our older view
+                index = _read_json(self.index_path, None)
+                if not isinstance(index, dict):
+                    index = dict(self._index)
+                for file_id, entry in snapshot.items():
+                    index[str(file_id)] = entry
+                _atomic_write_json(self.index_path, index)
+                completed = sorted(int(k)
+                                   for k, v in index.items() if v.get("done"))
+                _atomic_write_json(self.manifest_path, {"completed": completed})
+                _fsync_dir(self.out_dir)
+            self._index = index
+
+            # Completed dialogs will not be appended to again
+            with self._lock:
+                for file_id in done:
+                    f = self._files.pop(file_id, None)
+                    if f is not None:
+                        f.close()
+                    self._live.pop(file_id, None)
+
+    def _commit_loop(self):
+        while not self._closed:
+            self._wake.wait(self.commit_interval)
+            self._wake.clear()
+            if self._closed:
+                break
+            self.commit()
+
+    # -------------------- shutdown --------------------
+    def request_stop(self):
+        """Ask workers to stop starting new turns (in-flight turns still finish)."""
+        self._stop.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def wait_for_stop(self, timeout: float) -> bool:
+        """Sleep up to `timeout` seconds, waking early when a stop is requested."""
+        return self._stop.wait(timeout)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._committer.join()
+        self.commit()
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
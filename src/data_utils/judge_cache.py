@@ -0,0 +1,103 @@
+# encoding = "utf-8"
+'''
+Persistent, content-addressed cache for LLM judge verdicts.
+
+A verdict is keyed by (judge model, hash of the prompt template, canonical
+constraint args, hash of the generation), so rerunning eval.py or rescoring
+after a crash never sends the same generation/constraint pair to the judge
+twice. Entries live in SQLite (WAL mode), which makes the cache safe to share
+between threads and between processes writing at the same time.
+'''
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class JudgeCache:
+    """SQLite-backed judge verdict cache with size-bounded LRU eviction."""
+
+    # How many writes happen between two eviction passes
+    _EVICT_EVERY = 256
+
+    def __init__(self, path: str, max_entries: int = 200000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL NOT NULL)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS verdicts_last_access ON verdicts(last_access)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(model_name: str, template: str, args: Any, generation: str) -> str:
+        """Content address of one judge request."""
+        canonical_args = json.dumps(args, sort_keys=True, ensure_ascii=False)
+        return _sha256(json.dumps(
+            [model_name, _sha256(template), canonical_args, _sha256(generation)]))
+
+    def get(self, key: str) -> Optional[Any]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value FROM verdicts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        conn.execute(
+            "UPDATE verdicts SET last_access = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        with self._lock:
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO verdicts (key, value, last_access) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), time.time()))
+        conn.commit()
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self._EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used entries beyond max_entries."""
+        conn = self._conn()
+        (count,) = conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM verdicts WHERE key IN ("
+                "SELECT key FROM verdicts ORDER BY last_access LIMIT ?)", (overflow,))
+            conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        (size,) = self._conn().execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "size": size}
@@ -0,0 +1,258 @@
+# encoding = "utf-8"
+'''
+Adaptive per-endpoint rate limiting for generation and judge calls.
+
+Every endpoint (base_url) gets one EndpointLimiter shared by all threads:
+- request-per-minute and token-per-minute budgets are enforced with token
+  buckets (a request reserves its estimated tokens up front; the estimate is
+  reconciled with the reported usage afterwards),
+- the number of in-flight requests follows AIMD: +1 per window of successful
+  requests, halved on a 429, gently reduced when the latency per unit of work
+  (e.g. per completion token) inflates well above the best seen so far,
+- retryable failures (429, 5xx, timeouts, connection errors) are retried with
+  full-jitter exponential backoff that honours Retry-After.
+'''
+
+import datetime
+import email.utils
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class TokenBucket:
+    """Per-minute budget that may go into debt; callers sleep off the debt."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` and return how long the caller has to wait for it."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens +
+                          (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Parse Retry-After / retry-after-ms from an API error response, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        # Raises on malformed dates on Python >= 3.10 (returned None before)
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed is None:
+        return None
+    if parsed.tzinfo is None:
+        # HTTP dates are GMT; "-0000" parses to a naive datetime
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def is_throttled(exc: Exception) -> bool:
+    return getattr(exc, "status_code", None) == 429
+
+
+class EndpointLimiter:
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 max_concurrency: int = 64, min_concurrency: int = 1,
+                 max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0,
+                 latency_tolerance: float = 3.0):
+        self.rpm_bucket = TokenBucket(rpm) if rpm else None
+        self.tpm_bucket = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.latency_tolerance = latency_tolerance
+
+        self._cond = threading.Condition()
+        self._bucket_lock = threading.Lock()
+        self._limit = float(self.max_concurrency)
+        self._inflight = 0
+        self._rtt_ewma = None
+        self._latency_ewma = None
+        self._latency_floor = None
+        self._last_decrease = 0.0
+        self.counters = {"requests": 0, "retries": 0,
+                         "throttled": 0, "failures": 0}
+
+    # -------------------- budgets --------------------
+    def _wait_for_budget(self, estimated_tokens: float):
+        with self._bucket_lock:
+            wait = 0.0
+            if self.rpm_bucket is not None:
+                wait = max(wait, self.rpm_bucket.reserve(1))
+            if self.tpm_bucket is not None:
+                wait = max(wait, self.tpm_bucket.reserve(estimated_tokens))
+        if wait > 0:
+            time.sleep(wait)
+
+    def reconcile_tokens(self, estimated_tokens: float, actual_tokens: float):
+        """Correct the TPM budget once the real token usage is known."""
+        if self.tpm_bucket is None:
+            return
+        with self._bucket_lock:
+            if actual_tokens > estimated_tokens:
+                self.tpm_bucket.tokens -= actual_tokens - estimated_tokens
+            else:
+                self.tpm_bucket.refund(estimated_tokens - actual_tokens)
+
+    # -------------------- AIMD concurrency --------------------
+    def _enter(self):
+        with self._cond:
+            while self._inflight >= int(self._limit):
+                self._cond.wait()
+            self._inflight += 1
+
+    def _exit(self, rtt: Optional[float], latency: Optional[float], throttled: bool):
+        with self._cond:
+            self._inflight -= 1
+            now = time.monotonic()
+            if rtt is not None:
+                self._rtt_ewma = rtt if self._rtt_ewma is None \
+                    else 0.8 * self._rtt_ewma + 0.2 * rtt
+            # Decrease at most once per observed round-trip so a burst of
+            # 429s from the same window only halves the limit once
+            window = self._rtt_ewma or 1.0
+            if throttled:
+                if now - self._last_decrease > window:
+                    self._limit = max(self.min_concurrency, self._limit / 2.0)
+                    self._last_decrease = now
+            elif latency is not None:
+                self._latency_ewma = latency if self._latency_ewma is None \
+                    else 0.8 * self._latency_ewma + 0.2 * latency
+                self._latency_floor = self._latency_ewma if self._latency_floor is None \
+                    else min(self._latency_floor, self._latency_ewma)
+                congested = self._latency_ewma > self.latency_tolerance * self._latency_floor
+                if congested and now - self._last_decrease > window:
+                    self._limit = max(self.min_concurrency, self._limit * 0.9)
+                    self._last_decrease = now
+                elif not congested:
+                    self._limit = min(self.max_concurrency,
+                                      self._limit + 1.0 / self._limit)
+            self._cond.notify_all()
+
+    # -------------------- calls --------------------
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        delay = random.uniform(
+            0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = retry_after_seconds(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def call(self, fn: Callable[[], Any], estimated_tokens: float = 0,
+             retryable: Callable[[Exception], bool] = is_throttled,
+             work_units: Optional[Callable[[Any], float]] = None) -> Any:
+        """Run fn() within the endpoint budgets, retrying retryable failures.
+
+        work_units(result) normalizes the observed latency (e.g. by completion
+        tokens) so long and short requests are comparable congestion signals.
+        """
+        attempt = 0
+        while True:
+            self._wait_for_budget(estimated_tokens)
+            self._enter()
+            start = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                throttled = is_throttled(e)
+                self._exit(None, None, throttled)
+                with self._cond:
+                    self.counters["requests"] += 1
+                    self.counters["throttled"] += int(throttled)
+                    if not retryable(e) or attempt >= self.max_retries:
+                        self.counters["failures"] += 1
+                        raise
+                    self.counters["retries"] += 1
+                time.sleep(self._backoff(attempt, e))
+                attempt += 1
+                continue
+            rtt = time.monotonic() - start
+            latency = rtt
+            if work_units is not None:
+                latency = rtt / max(1.0, float(work_units(result)))
+            self._exit(rtt, latency, False)
+            with self._cond:
+                self.counters["requests"] += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {**self.counters, "concurrency_limit": round(self._limit, 2)}
+
+
+# -------------------- Registry --------------------
+# Limiters are created lazily per endpoint once rate limiting is configured.
+_LIMITER_CONFIG: Optional[Dict[str, Any]] = None
+_LIMITER_OVERRIDES: Dict[str, Dict[str, Any]] = {}
+_LIMITERS: Dict[str, EndpointLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def configure_rate_limits(base_url: Optional[str] = None, **kwargs):
+    """Enable rate limiting with EndpointLimiter options.
+
+    Without base_url the options become the default for every endpoint;
+    with base_url they only apply to that endpoint.
+    """
+    global _LIMITER_CONFIG
+    with _LIMITERS_LOCK:
+        if base_url is None:
+            _LIMITER_CONFIG = dict(kwargs)
+            _LIMITERS.clear()
+        else:
+            _LIMITER_OVERRIDES[base_url] = dict(kwargs)
+            _LIMITERS.pop(base_url, None)
+
+
+def get_limiter(base_url: str) -> Optional[EndpointLimiter]:
+    """Return the limiter for base_url, or None when rate limiting is off."""
+    limiter = _LIMITERS.get(base_url)
+    if limiter is not None:
+        return limiter
+    with _LIMITERS_LOCK:
+        if _LIMITER_CONFIG is None and base_url not in _LIMITER_OVERRIDES:
+            return None
+        limiter = _LIMITERS.get(base_url)
+        if limiter is None:
+            options = {**(_LIMITER_CONFIG or {}), **
+                       _LIMITER_OVERRIDES.get(base_url, {})}
+            limiter = EndpointLimiter(**options)
+            _LIMITERS[base_url] = limiter
+    return limiter
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _LIMITERS_LOCK:
+        return {url: limiter.stats() for url, limiter in _LIMITERS.items()}
@@ -0,0 +1,92 @@
+# encoding = "utf-8"
+'''
+Makespan-aware ordering of dialogs.
+
+A concurrent run ends when its last dialog ends, so dialogs are started in
+this order:
+1) dialogs already in flight (partially evaluated by an earlier, interrupted
+   run), so their slots free up and their results are complete early,
+2) the remaining dialogs by descending expected number of remaining turns
+   (longest-expected-first), so no long dialog starts near the end and runs
+   alone.
+The expected remaining turns come from the dialog length and, when given,
+survival statistics of earlier runs (score.py --survival_stats): the mean
+number of turns that dialog survived before, or else the survival curve over
+all dialogs conditioned on the turns already done.
+'''
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class SurvivalStats:
+
+    def __init__(self, alive_counts: List[float], num_dialogs: int, per_dialog: Dict[int, List[float]]):
+        # alive_counts[t]: number of dialogs that reached turn t + 1
+        self.alive_counts = alive_counts
+        self.num_dialogs = num_dialogs
+        self.per_dialog = per_dialog
+
+    @classmethod
+    def load(cls, paths: Iterable[str]) -> Optional["SurvivalStats"]:
+        """Merge the survival statistics files of several earlier runs."""
+        alive_counts: List[float] = []
+        num_dialogs = 0
+        per_dialog: Dict[int, List[float]] = {}
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                stats = json.load(f)
+            counts = stats["alive_counts"]
+            if len(counts) > len(alive_counts):
+                alive_counts.extend([0.0] * (len(counts) - len(alive_counts)))
+            for t, count in enumerate(counts):
+                alive_counts[t] += count
+            num_dialogs += stats["num_dialogs"]
+            for file_id, survived in stats["per_dialog"].items():
+                per_dialog.setdefault(int(file_id), []).append(survived)
+        if num_dialogs == 0:
+            return None
+        return cls(alive_counts, num_dialogs, per_dialog)
+
+    def _alive(self, t: int) -> float:
+        return self.alive_counts[t] if t < len(self.alive_counts) else 0.0
+
+    def expected_remaining(self, file_id: int, total_turns: int, done_turns: int) -> float:
+        history = self.per_dialog.get(file_id)
+        if history:
+            expected = min(float(total_turns), sum(history) / len(history))
+            if expected > done_turns:
+                return expected - done_turns
+        # P(reach turn t + 1 | survived done_turns turns), summed over the turns left
+        base = self.num_dialogs if done_turns == 0 else self._alive(
+            done_turns - 1)
+        if base <= 0:
+            return float(total_turns - done_turns)
+        return sum(min(1.0, self._alive(t) / base) for t in range(done_turns, total_turns))
+
+
+def expected_remaining_turns(file_id: int, total_turns: int, done_turns: int, remaining_patience,
+                             stats: Optional[SurvivalStats] = None) -> float:
+    if done_turns >= total_turns or remaining_patience == 0:
+        return 0.0
+    if stats is None:
+        return float(total_turns - done_turns)
+    return stats.expected_remaining(file_id, total_turns, done_turns)
+
+
+def schedule_key(file_id: int, total_turns: int, done_turns: int, remaining_patience,
+                 stats: Optional[SurvivalStats] = None) -> Tuple[int, float, int]:
+    """Sort key: in-flight dialogs first, then longest expected remaining, finished ones last."""
+    expected = expected_remaining_turns(
+        file_id, total_turns, done_turns, remaining_patience, stats)
+    if done_turns >= total_turns or remaining_patience == 0:
+        group = 2
+    elif done_turns > 0:
+        group = 0
+    else:
+        group = 1
+    return group, -expected, file_id
+
+
+def schedule_order(keys: Dict[Any, Tuple[int, float, int]]) -> List[Any]:
+    return sorted(keys, key=lambda k: keys[k])
@@ -1,32 +1,219 @@
 # encoding = "utf-8"
-from openai import OpenAI
+import json
+import os
+import threading
+import time
 
+from .rate_limit import get_limiter
 
-def LLM_backend(api_key, messages, model_name, base_url, temperature=1.0, use_json_mode=True):
 
-    client = OpenAI(
-        base_url=base_url,
-        api_key=api_key
-    )
+# -------------------- Client pool --------------------
+# One OpenAI client (and therefore one keep-alive HTTP connection pool) per
+# (base_url, api_key). httpx clients are thread-safe, so the same client is
+# shared by every dialog worker and every judge call. openai/httpx are
+# imported with the first client: importing openai alone takes most of a
+# second, which processes that never call a model should not pay.
+_CLIENT_POOL_CONFIG = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+    "timeout": 600.0,
+    "connect_timeout": 10.0,
+    "max_retries": 2,
+}
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
 
-    if use_json_mode:
-        response = client.chat.completions.create(
+
+def configure_client_pool(**kwargs):
+    """Update the connection pool settings used by clients created afterwards.
+
+    Accepted keys: max_connections, max_keepalive_connections, keepalive_expiry,
+    timeout, connect_timeout, max_retries. Existing clients are closed so the
+    new settings take effect on the next call.
+    """
+    unknown = set(kwargs) - set(_CLIENT_POOL_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown client pool option(s): {sorted(unknown)}")
+    with _CLIENTS_LOCK:
+        _CLIENT_POOL_CONFIG.update(
+            {k: v for k, v in kwargs.items() if v is not None})
+        for client in _CLIENTS.values():
+            client.close()
+        _CLIENTS.clear()
+
+
+def get_client(base_url, api_key):
+    """Return the shared OpenAI client for (base_url, api_key), creating it once."""
+    key = (base_url, api_key)
+    client = _CLIENTS.get(key)
+    if client is not None:
+        return client
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            import httpx
+            from openai import OpenAI
+
+            cfg = _CLIENT_POOL_CONFIG
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=cfg["max_connections"],
+                    max_keepalive_connections=cfg["max_keepalive_connections"],
+                    keepalive_expiry=cfg["keepalive_expiry"],
+                ),
+                timeout=httpx.Timeout(
+                    cfg["timeout"], connect=cfg["connect_timeout"]),
+            )
+            client = OpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                http_client=http_client,
+                max_retries=cfg["max_retries"],
+            )
+            _CLIENTS[key] = client
+    return client
+
+
+def close_clients():
+    """Close every pooled client and drop it from the registry."""
+    with _CLIENTS_LOCK:
+        for client in _CLIENTS.values():
+            client.close()
+        _CLIENTS.clear()
+
+
+def _is_retryable(exc):
+    """Failures worth retrying under rate limiting: 429, 5xx, timeouts, dropped connections."""
+    import openai
+    return isinstance(exc, (openai.RateLimitError, openai.InternalServerError,
+                            openai.APIConnectionError))
+
+
+def estimate_tokens(messages):
+    """Cheap prompt-size estimate (~4 characters per token) used for TPM budgets."""
+    return sum(len(m.get("content") or "") for m in messages) / 4.0
+
+
+def LLM_backend(api_key, messages, model_name, base_url, temperature=1.0, use_json_mode=True, max_tokens=None):
+
+    client = get_client(base_url, api_key)
+    extra = {"max_tokens": max_tokens} if max_tokens else {}
+
+    def _create():
+        if use_json_mode:
+            return client.chat.completions.create(
+                model=model_name,
+                messages=messages,
+                temperature=temperature,
+                response_format={"type": "json_object"},
+                **extra
+                # "json_mode"= True
+            )
+        return client.chat.completions.create(
             model=model_name,
             messages=messages,
             temperature=temperature,
-            response_format={"type": "json_object"}
+            **extra
+            # response_format={"type": "json_object"}
             # "json_mode"= True
         )
+
+    limiter = get_limiter(base_url)
+    if limiter is None:
+        response = _create()
     else:
-        response = client.chat.completions.create(
+        estimated = estimate_tokens(messages)
+        response = limiter.call(
+            _create, estimated, retryable=_is_retryable,
+            work_units=lambda r: r.usage.completion_tokens)
+        limiter.reconcile_tokens(estimated, response.usage.total_tokens)
+
+    return response.choices[0].message.content, response.usage.prompt_tokens, response.usage.completion_tokens
+
+
+def LLM_backend_stream(api_key, messages, model_name, base_url, temperature=1.0, max_tokens=None, max_bytes=None):
+    """Streaming variant of LLM_backend for target generations.
+
+    Returns (content, prompt_tokens, completion_tokens, metrics) where metrics
+    holds time-to-first-token, total latency, output tokens/sec and whether the
+    response was truncated by max_tokens or by the max_bytes cap. When the
+    stream is cut before the provider reports usage, token counts are estimated
+    and metrics["usage_estimated"] is set.
+    """
+    client = get_client(base_url, api_key)
+    extra = {"max_tokens": max_tokens} if max_tokens else {}
+
+    def _stream():
+        start = time.perf_counter()
+        ttft = None
+        pieces = []
+        size = 0
+        chunks = 0
+        finish_reason = None
+        truncated = False
+        usage = None
+        stream = client.chat.completions.create(
             model=model_name,
             messages=messages,
             temperature=temperature,
-            # response_format={"type": "json_object"}
-            # "json_mode"= True
+            stream=True,
+            stream_options={"include_usage": True},
+            **extra
         )
+        try:
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                finish_reason = choice.finish_reason or finish_reason
+                delta = choice.delta.content if choice.delta is not None else None
+                if not delta:
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                chunks += 1
+                if max_bytes:
+                    encoded = delta.encode("utf-8")
+                    if size + len(encoded) > max_bytes:
+                        # Cut a runaway response at the byte cap (on a character boundary)
+                        pieces.append(encoded[:max_bytes - size].decode(
+                            "utf-8", errors="ignore"))
+                        truncated = True
+                        break
+                    size += len(encoded)
+                pieces.append(delta)
+        finally:
+            stream.close()
+        latency = time.perf_counter() - start
 
-    return response.choices[0].message.content, response.usage.prompt_tokens, response.usage.completion_tokens
+        content = "".join(pieces)
+        if usage is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        else:
+            # One streamed chunk carries roughly one token
+            prompt_tokens, completion_tokens = int(
+                estimate_tokens(messages)), chunks
+        decode_time = latency - (ttft or 0.0)
+        metrics = {
+            "ttft": ttft,
+            "latency": latency,
+            "output_tokens_per_sec": completion_tokens / decode_time if decode_time > 0 else None,
+            "truncated": truncated or finish_reason == "length",
+            "usage_estimated": usage is None,
+        }
+        return content, prompt_tokens, completion_tokens, metrics
+
+    limiter = get_limiter(base_url)
+    if limiter is None:
+        return _stream()
+    estimated = estimate_tokens(messages)
+    result = limiter.call(_stream, estimated, retryable=_is_retryable,
+                          work_units=lambda r: r[2])
+    limiter.reconcile_tokens(estimated, result[1] + result[2])
+    return result
 
 
 def load_jsonl(path: str):
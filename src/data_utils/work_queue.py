@@ -0,0 +1,142 @@
+# encoding = "utf-8"
+'''
+Lease-based work queue of dialog ids shared by evaluation workers.
+
+The queue is a SQLite file on storage every worker can reach. A worker claims
+one dialog at a time and holds a lease on it that it renews while the dialog
+is running. If a worker dies, its lease expires and the dialog is handed to
+the next worker that asks for work, so no range is lost and fast workers keep
+taking dialogs until the queue is drained. Dialogs are handed out by
+descending priority (e.g. number of turns) so the long ones do not form the
+tail of the run.
+
+Lease expiry is compared against each worker's wall clock; keep
+lease_seconds well above the clock skew between hosts.
+'''
+
+import contextlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+TASK_STATES = ("pending", "leased", "done", "failed")
+
+
+class LeaseQueue:
+
+    def __init__(self, path: str, model_name: str, lease_seconds: float = 600.0, max_attempts: int = 3):
+        self.path = path
+        self.model_name = model_name
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                "model TEXT NOT NULL, file_id INTEGER NOT NULL, priority REAL NOT NULL DEFAULT 0, "
+                "status TEXT NOT NULL, owner TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "updated REAL, PRIMARY KEY (model, file_id))")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (model, status, priority)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; writes go through explicit BEGIN IMMEDIATE
+            conn = sqlite3.connect(
+                self.path, timeout=60.0, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        # Take the write lock up front so two workers cannot claim the same row
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def seed(self, priorities: Dict[int, float]):
+        """Add dialog ids with their priority; ids already in the queue are kept as they are."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (model, file_id, priority, status, updated) "
+                "VALUES (?, ?, ?, 'pending', ?)",
+                [(self.model_name, file_id, float(p), now) for file_id, p in priorities.items()])
+
+    def claim(self, owner: str) -> Optional[int]:
+        """Lease the highest-priority pending (or expired) dialog, or return None."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT file_id FROM tasks WHERE model = ? AND "
+                "(status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                "ORDER BY priority DESC, file_id LIMIT 1",
+                (self.model_name, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE model = ? AND file_id = ?",
+                (owner, now + self.lease_seconds, now, self.model_name, row[0]))
+        return row[0]
+
+    def renew(self, file_ids: Iterable[int], owner: str) -> int:
+        """Extend the leases `owner` still holds; returns how many were renewed."""
+        now = time.time()
+        renewed = 0
+        with self._transaction() as conn:
+            for file_id in file_ids:
+                cur = conn.execute(
+                    "UPDATE tasks SET lease_expires = ?, updated = ? "
+                    "WHERE model = ? AND file_id = ? AND status = 'leased' AND owner = ?",
+                    (now + self.lease_seconds, now, self.model_name, file_id, owner))
+                renewed += cur.rowcount
+        return renewed
+
+    def complete(self, file_id: int, owner: str) -> bool:
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE tasks SET status = 'done', lease_expires = NULL, updated = ? "
+                "WHERE model = ? AND file_id = ? AND owner = ? AND status = 'leased'",
+                (time.time(), self.model_name, file_id, owner))
+        return cur.rowcount == 1
+
+    def release(self, file_id: int, owner: str, failed: bool = True):
+        """Give a dialog back.
+
+        After an error (failed=True) the attempt counts, and the dialog fails
+        for good after max_attempts; an interrupted dialog is simply requeued.
+        """
+        with self._transaction() as conn:
+            if not failed:
+                conn.execute(
+                    "UPDATE tasks SET attempts = attempts - 1 "
+                    "WHERE model = ? AND file_id = ? AND owner = ? AND status = 'leased'",
+                    (self.model_name, file_id, owner))
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, lease_expires = NULL, updated = ? "
+                "WHERE model = ? AND file_id = ? AND owner = ? AND status = 'leased'",
+                (self.max_attempts, time.time(), self.model_name, file_id, owner))
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn().execute(
+            "SELECT status, COUNT(*) FROM tasks WHERE model = ? GROUP BY status",
+            (self.model_name,)).fetchall()
+        counts = {state: 0 for state in TASK_STATES}
+        counts.update(dict(rows))
+        return counts
+
+    def next_expiry(self) -> Optional[Tuple[int, float]]:
+        """(file_id, lease_expires) of the lease that expires first, if any."""
+        return self._conn().execute(
+            "SELECT file_id, lease_expires FROM tasks WHERE model = ? AND status = 'leased' "
+            "ORDER BY lease_expires LIMIT 1", (self.model_name,)).fetchone()
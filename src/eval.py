@@ -10,88 +10,344 @@ Workflow:
 4) Save generated responses and evaluation results to eval_*.jsonl.
 5) Early stopping: with patience = N, stop evaluating a dialog after N consecutive
    turns fail to satisfy the instructions.
+
+With --concurrency > 1, dialogs are evaluated concurrently on an asyncio event
+loop while the turns of each dialog remain sequential.
 '''
 
 import argparse
+import asyncio
 import json
 import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Tuple
 
-from openai import OpenAI
-from tqdm import tqdm
-
-from data_utils.utils import LLM_backend
+from data_utils.utils import LLM_backend, LLM_backend_stream, _is_retryable, configure_client_pool
+from data_utils.rate_limit import configure_rate_limits, limiter_stats
 from data_utils.system_prompt import SYSTEM_PROMPT
+from data_utils.judge_cache import JudgeCache
+from data_utils.generation_store import GenerationStore, GENERATION_STORE_MODES
+from data_utils.journal import EvalJournal
+from data_utils.work_queue import LeaseQueue
+from data_utils.scheduling import SurvivalStats, schedule_key, schedule_order
+from data_utils.checker_metrics import CheckerMetrics, checker_key
+
+
+def tqdm(*args, **kwargs):
+    """Progress bar; tqdm is imported on first use, so importers of this module
+    (recheck, sweep, workers) do not pay for it."""
+    from tqdm import tqdm as _tqdm
+    return _tqdm(*args, **kwargs)
 
 # -------------------- Instruction helpers --------------------
 
-from instruction import *
-
-_ID_TO_CLASS = {
-    "startwith": StartWithInstruction,
-    "endwith": EndWithInstruction,
-    # "language": LanguageInstruction,
-    "format": FormatInstruction,
-    "countableItems": CountableItemsInstruction,
-    "length": LengthInstruction,
-    "existence": ExistenceInstruction,
-    "forbidden": ForbiddenInstruction,
-    "case": ChangeCaseInstruction,
-    "punctuation": PunctuationInstruction,
-    "emotion": EmotionInstruction,
-    "reader_age": ReaderAgeInstruction,
-    "style": StyleInstruction,
-}
-
-
-def build_instruction_instance(inst_id: str, args: Any):
-    cls = _ID_TO_CLASS.get(inst_id)
-    if cls is None:
-        return None
-    inst = cls()
-    # Directly assign args for evaluation; ignore descriptions entirely
-    setattr(inst, "args", args)
-    return inst
+from instruction.combined_judge import check_combined
+from instruction.registry import JUDGE_IDS as _JUDGE_IDS, build_instruction_instance
+from instruction.plan import CheckerPlan
+
+
+# Shared pool for judge calls so the judges of one turn run concurrently
+_JUDGE_WORKERS = 16
+_judge_executor = None
+_judge_executor_lock = threading.Lock()
+
+
+def set_judge_workers(num_workers: int):
+    """Set the size of the shared judge thread pool (applies to a fresh pool)."""
+    global _JUDGE_WORKERS, _judge_executor
+    with _judge_executor_lock:
+        _JUDGE_WORKERS = max(1, int(num_workers))
+        if _judge_executor is not None:
+            _judge_executor.shutdown(wait=True)
+            _judge_executor = None
+
+
+def _get_judge_executor() -> ThreadPoolExecutor:
+    global _judge_executor
+    if _judge_executor is None:
+        with _judge_executor_lock:
+            if _judge_executor is None:
+                _judge_executor = ThreadPoolExecutor(
+                    max_workers=_JUDGE_WORKERS, thread_name_prefix="judge")
+    return _judge_executor
+
+
+class JudgeUnavailable(Exception):
+    """The judge endpoint kept failing (429, 5xx, connection) after all retries.
+
+    Unlike a bad judge reply, this says nothing about the generation, so it is
+    not scored: the turn is left unwritten and retried when the dialog resumes.
+    """
+
+
+def _judge_failed(e: Exception, timing=None):
+    if timing is not None:
+        timing["error"] = e
+    if _is_retryable(e):
+        raise JudgeUnavailable(f"judge request failed: {e}") from e
+
+
+def _run_judge(inst, generation: str, api_key: str, base_url: str, judge_cache=None,
+               usage=None, timing=None) -> Tuple[float, str]:
+    # If timing is given, it receives the wall time and the swallowed exception
+    start = time.perf_counter()
+    try:
+        return inst.check_following(generation, LLM_backend, api_key, base_url,
+                                    judge_cache=judge_cache, usage=usage)
+    except Exception as e:
+        _judge_failed(e, timing)
+        return 0, ""
+    finally:
+        if timing is not None:
+            timing["seconds"] = time.perf_counter() - start
+
+
+def _run_combined_judge(instances, generation: str, api_key: str, base_url: str,
+                        judge_cache=None, usage=None, timing=None) -> Dict[str, Tuple[float, str]]:
+    start = time.perf_counter()
+    scores = {}
+    try:
+        scores = check_combined(instances, generation,
+                                LLM_backend, api_key, base_url, judge_cache=judge_cache, usage=usage)
+    except Exception as e:
+        _judge_failed(e, timing)
+    finally:
+        if timing is not None:
+            timing["seconds"] = time.perf_counter() - start
+            timing["missing"] = [inst.id for inst in instances if inst.id not in scores]
+    return {inst.id: scores.get(inst.id, (0, "")) for inst in instances}
+
+
+def _run_rule(inst, generation: str, timing=None) -> bool:
+    start = time.perf_counter()
+    try:
+        return inst.check_following(generation)
+    except Exception as e:
+        if timing is not None:
+            timing["error"] = e
+        return False
+    finally:
+        if timing is not None:
+            timing["seconds"] = time.perf_counter() - start
+
+
+def _run_rule_batch(inst, generations: List[str]) -> List[bool]:
+    try:
+        return [bool(ok) for ok in inst.check_batch(generations)]
+    except Exception:
+        # Fall back to one call per generation so only the ones that raise fail
+        return [bool(_run_rule(inst, g)) for g in generations]
+
+
+def _build_checkers(instructions: List[Dict[str, Any]], checkers=None) -> List[Tuple[str, Any]]:
+    """(instruction id, checker or None) pairs, from a plan's checkers if given."""
+    if checkers is not None:
+        return [(c.inst_id, c.instance) for c in checkers]
+    built = []
+    for it in instructions or []:
+        inst_id = it.get("id")
+        built.append((inst_id, build_instruction_instance(inst_id, it.get("args"))))
+    return built
+
 
+def aggregate_verdicts(verdicts: List[Tuple[str, Any]]) -> Tuple[bool, Dict[str, bool], Dict[str, Tuple[float, str]]]:
+    """Fold per-constraint verdicts, in instruction order, into (all_ok, details, sub_details).
 
-def check_all_instructions(instructions: List[Dict[str, Any]], generation: str, api_key: str, base_url: str) -> Tuple[bool, Dict[str, bool]]:
+    A verdict is a bool for rule-based constraints and (score, rationale) for
+    LLM-judged ones, which pass when the score is above 6.
+    """
     details: Dict[str, bool] = {}
     sub_details: Dict[str, Tuple[float, str]] = {}
     all_ok = True
-    for it in instructions or []:
-        inst_id = it.get("id")
-        inst_args = it.get("args")
-        inst = build_instruction_instance(inst_id, inst_args)
-        if inst is None:
-            ok = False  # unknown instruction, skip
-        else:
-            if inst_id in ["emotion", "reader_age", "style"]:
-                try:
-                    ok, rationale = inst.check_following(
-                        generation, LLM_backend, api_key, base_url)
-                except Exception:
-                    ok = 0
-                    rationale = ""
-            else:
-                try:
-                    ok = inst.check_following(generation)
-                except Exception:
-                    ok = False
-
-        if inst_id not in ["emotion", "reader_age", "style"]:
+    for inst_id, ok in verdicts:
+        if inst_id not in _JUDGE_IDS:
             details[inst_id] = bool(ok)
             if bool(ok) == False:
                 all_ok = False
         else:
-            bool_ok = float(ok) > 6.0
+            score, rationale = ok if isinstance(ok, tuple) else (ok, "")
+            bool_ok = float(score) > 6.0
             details[inst_id] = bool_ok
-            sub_details[inst_id] = (float(ok), rationale)
+            sub_details[inst_id] = (float(score), rationale)
             if not bool_ok:
                 all_ok = False
+    return all_ok, details, sub_details
+
+
+def check_all_instructions(instructions: List[Dict[str, Any]], generation: str, api_key: str, base_url: str,
+                           combined_judge: bool = False, judge_cache=None,
+                           judge_usage: Dict[str, Dict[str, int]] = None, metrics=None,
+                           check_times: Dict[str, Dict[str, Any]] = None,
+                           checkers=None) -> Tuple[bool, Dict[str, bool]]:
+    # Dispatch the judge calls first so they overlap with the rule-based
+    # checkers, then collect every verdict in the original instruction order.
+    # If judge_usage is given, it is filled with the token usage of each judge
+    # call, keyed by constraint id ("id1+id2" for a combined judge call).
+    # With a CheckerMetrics, the wall time and swallowed exception of every
+    # check are recorded; check_times receives them per constraint id.
+    # checkers (the turn's entries of a CheckerPlan) replace building a fresh
+    # checker per instruction.
+    instrument = metrics is not None or check_times is not None
+    built = _build_checkers(instructions, checkers)
+
+    judge_idx = [i for i, (inst_id, inst) in enumerate(built)
+                 if inst is not None and inst_id in _JUDGE_IDS]
+    executor = _get_judge_executor()
+    futures = {}
+    usages: Dict[str, Dict[str, int]] = {}
+    timings: Dict[int, Dict[str, Any]] = {}
+    combined = combined_judge and len(judge_idx) > 1
+    if combined:
+        # One prompt scores every soft constraint, so the generation is sent once
+        usage = usages.setdefault(
+            "+".join(built[i][0] for i in judge_idx), {})
+        timing = {} if instrument else None
+        future = executor.submit(
+            _run_combined_judge, [built[i][1] for i in judge_idx], generation, api_key, base_url,
+            judge_cache, usage, timing)
+        futures = {i: future for i in judge_idx}
+        timings = {i: timing for i in judge_idx}
+    else:
+        for i in judge_idx:
+            usage = usages.setdefault(built[i][0], {})
+            timings[i] = {} if instrument else None
+            futures[i] = executor.submit(
+                _run_judge, built[i][1], generation, api_key, base_url, judge_cache, usage,
+                timings[i])
+
+    verdicts = []
+    for i, (inst_id, inst) in enumerate(built):
+        if inst is None:
+            ok = False  # unknown instruction, skip
+            timings[i] = {"seconds": 0.0,
+                          "error": KeyError(f"unknown instruction id {inst_id!r}")}
+        elif i in futures:
+            result = futures[i].result()
+            ok = result[inst_id] if isinstance(result, dict) else result
+        else:
+            timings[i] = {} if instrument else None
+            ok = _run_rule(inst, generation, timings[i])
+        verdicts.append((inst_id, ok))
+    all_ok, details, sub_details = aggregate_verdicts(verdicts)
+
+    if judge_usage is not None:
+        judge_usage.update(
+            {k: {"prompt_tokens": v.get("prompt_tokens", 0),
+                 "completion_tokens": v.get("completion_tokens", 0)}
+             for k, v in usages.items()})
+
+    if instrument:
+        for i, (inst_id, inst) in enumerate(built):
+            timing = timings[i]
+            error = timing.get("error")
+            if error is None and inst_id in timing.get("missing", ()):
+                error = KeyError(
+                    f"{inst_id!r} missing from the combined judge reply")
+            if metrics is not None:
+                metrics.record(checker_key(inst_id, inst.args if inst is not None else None,
+                                           combined=combined and i in futures),
+                               timing["seconds"], error)
+            if check_times is not None:
+                check_times[inst_id] = {"seconds": round(timing["seconds"], 6),
+                                        "error": type(error).__name__ if error is not None else None}
 
     return all_ok, details, sub_details
 
 
+class CheckMatrix:
+    """Verdicts of many generations against one instruction list.
+
+    Row i is the i-th instruction and column j the j-th generation.
+    passed[i][j] tells whether generation j satisfies instruction i (judged
+    instructions pass with a score above 6); scores[i] and rationales[i]
+    hold the judge output of a judged row and are None for rule-based rows;
+    overall[j] tells whether generation j satisfies every instruction.
+    """
+
+    def __init__(self, ids: List[str], passed: List[List[bool]],
+                 scores: List[List[float]], rationales: List[List[str]], num_generations: int):
+        self.ids = ids
+        self.passed = passed
+        self.scores = scores
+        self.rationales = rationales
+        self.overall = [all(row[j] for row in passed)
+                        for j in range(num_generations)]
+
+    def column(self, j: int) -> Tuple[bool, Dict[str, bool], Dict[str, Tuple[float, str]]]:
+        """(all_ok, details, sub_details) of generation j, as check_all_instructions returns them."""
+        verdicts = []
+        for i, inst_id in enumerate(self.ids):
+            if self.scores[i] is not None:
+                verdicts.append(
+                    (inst_id, (self.scores[i][j], self.rationales[i][j])))
+            else:
+                verdicts.append((inst_id, self.passed[i][j]))
+        return aggregate_verdicts(verdicts)
+
+
+def check_all_instructions_batch(instructions: List[Dict[str, Any]], generations: List[str], api_key: str,
+                                 base_url: str, combined_judge: bool = False, judge_cache=None,
+                                 judge_usage: Dict[str, Dict[str, int]] = None, checkers=None) -> CheckMatrix:
+    """Check many generations against the same instructions, e.g. to rescore several models.
+
+    Every judge request of the batch is submitted to the shared judge pool
+    up front; rule-based checkers run through Instruction.check_batch in the
+    meantime, so their setup is shared across the batch. Verdicts match
+    check_all_instructions on each generation; judge_usage is summed over
+    the batch.
+    """
+    built = _build_checkers(instructions, checkers)
+    judge_idx = [i for i, (inst_id, inst) in enumerate(built)
+                 if inst is not None and inst_id in _JUDGE_IDS]
+    executor = _get_judge_executor()
+    usages: Dict[str, Dict[str, int]] = {}
+    futures = {}
+    if combined_judge and len(judge_idx) > 1:
+        usage = usages.setdefault(
+            "+".join(built[i][0] for i in judge_idx), {})
+        instances = [built[i][1] for i in judge_idx]
+        combined = [executor.submit(_run_combined_judge, instances, g, api_key, base_url,
+                                    judge_cache, usage) for g in generations]
+        futures = {i: combined for i in judge_idx}
+    else:
+        for i in judge_idx:
+            usage = usages.setdefault(built[i][0], {})
+            futures[i] = [executor.submit(_run_judge, built[i][1], g, api_key, base_url,
+                                          judge_cache, usage) for g in generations]
+
+    ids, passed, scores, rationales = [], [], [], []
+    for i, (inst_id, inst) in enumerate(built):
+        ids.append(inst_id)
+        if inst is None:
+            row, row_scores, row_rationales = [False] * len(generations), None, None
+        elif i in futures:
+            row, row_scores, row_rationales = [], [], []
+            for future in futures[i]:
+                result = future.result()
+                ok = result[inst_id] if isinstance(result, dict) else result
+                score, rationale = ok if isinstance(ok, tuple) else (ok, "")
+                row_scores.append(float(score))
+                row_rationales.append(rationale)
+                row.append(float(score) > 6.0)
+        else:
+            row, row_scores, row_rationales = _run_rule_batch(
+                inst, generations), None, None
+        passed.append(row)
+        scores.append(row_scores)
+        rationales.append(row_rationales)
+
+    if judge_usage is not None:
+        judge_usage.update(
+            {k: {"prompt_tokens": v.get("prompt_tokens", 0),
+                 "completion_tokens": v.get("completion_tokens", 0)}
+             for k, v in usages.items()})
+    return CheckMatrix(ids, passed, scores, rationales, len(generations))
+
+
 def load_jsonl(path: str) -> List[Dict[str, Any]]:
 
     contents: List[Dict[str, Any]] = []
@@ -114,108 +370,437 @@ def write_jsonl(path: str, records: List[Dict[str, Any]]):
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
 
 
-def run(args):
-    dialogs_dir = args.dialogs_dir
+def load_resume_state(out_file: str, patience, tail: Dict[str, Any] = None) -> Tuple[int, Any, List[Dict[str, str]]]:
+    """Return (start_from_turn, remaining_patience, history_msgs) for a dialog.
+
+    Without an existing eval_{id}.jsonl the dialog starts from scratch with
+    full patience (None when patience is disabled). start_from_turn is the
+    number of finished turns, i.e. the index of the next turn in the dialog.
+    A committed journal tail (see EvalJournal.lookup) provides the resume
+    point directly; the file is then only read for the conversation history.
+    """
+    # Track remaining patience across turns and resumes
+    current_remaining = int(patience) if (
+        patience is not None and patience > 0) else None
+    # Determine resume point from existing eval output if present
+    start_from_turn = 0
+    history_msgs: List[Dict[str, str]] = []
+    if os.path.exists(out_file):
+        finished_turns = load_jsonl(out_file)
+        if tail is not None:
+            start_from_turn = tail["turns"]
+            current_remaining = tail["remaining_patience"]
+        elif len(finished_turns) > 0:
+            start_from_turn = len(finished_turns)
+            current_remaining = finished_turns[-1].get("remaining_patience")
+        if len(finished_turns) > 0:
+            # Build prior history: user -> assistant pairs from finished turns
+            for r in finished_turns:
+                try:
+                    uq = r.get("user_query_verified")
+                    rp = r.get("response")
+                    history_msgs.append({"role": "user", "content": uq})
+                    history_msgs.append(
+                        {"role": "assistant", "content": rp})
+                except Exception:
+                    continue
+    return start_from_turn, current_remaining, history_msgs
+
+
+def build_messages(history_msgs: List[Dict[str, str]], user_query: str, system_prompt: int) -> List[Dict[str, str]]:
+    if system_prompt == 1:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            *history_msgs,
+            {"role": "user", "content": user_query},
+        ]
+    return [
+        *history_msgs,
+        {"role": "user", "content": user_query},
+    ]
+
+
+def next_patience(current_remaining, overall_ok: bool, patience):
+    """Reset patience after a successful turn, spend one unit after a failed one."""
+    if current_remaining is None:
+        return None
+    if overall_ok:
+        return int(patience)
+    return max(0, current_remaining - 1)
+
+
+def build_record(turn: Dict[str, Any], generation: str, overall_ok: bool, details, sub_details,
+                 remaining_patience, usage: Dict[str, Any], latency, check_times=None) -> Dict[str, Any]:
+    record = {
+        "turn": turn.get("turn"),
+        "active_topic": turn.get("active_topic"),
+        "user_query_verified": turn.get("user_query_verified"),
+        "instructions": turn.get("instructions"),
+        "response": generation,
+        "eval": {
+            "overall_ok": overall_ok,
+            "details": details,
+            "sub_details": sub_details,
+        },
+        "remaining_patience": remaining_patience,
+        "usage": usage,
+        "latency": latency,
+    }
+    if check_times is not None:
+        record["check_times"] = check_times
+    return record
+
+
+def generate(args, messages: List[Dict[str, str]], generation_store=None) -> Tuple[str, int, int, Dict[str, Any]]:
+    """Get the target-model completion for one turn, recording or replaying it if requested.
+
+    Returns (generation, prompt_tokens, completion_tokens, latency metrics);
+    the metrics are None for replayed generations.
+    """
+    key = None
+    if generation_store is not None:
+        # The byte cap only truncates streamed responses
+        key = generation_store.make_key(
+            args.model_name, args.system_prompt, messages, args.temperature,
+            max_tokens=args.max_tokens or None,
+            max_bytes=(args.max_response_bytes or None) if args.stream else None)
+        if generation_store.mode == "replay":
+            cached = generation_store.get(key)
+            if cached is None:
+                raise LookupError(
+                    "No recorded generation for this turn (replay mode)")
+            return (*cached, None)
+
+    if args.stream:
+        generation, ptok, ctok, latency = LLM_backend_stream(
+            args.api_key, messages, args.model_name, args.base_url,
+            temperature=args.temperature, max_tokens=args.max_tokens or None,
+            max_bytes=args.max_response_bytes or None)
+    else:
+        start = time.perf_counter()
+        generation, ptok, ctok = LLM_backend(
+            args.api_key, messages, args.model_name, args.base_url,
+            temperature=args.temperature, use_json_mode=False,
+            max_tokens=args.max_tokens or None)
+        latency = {"ttft": None, "latency": time.perf_counter() - start}
+    if key is not None:
+        generation_store.put(key, args.model_name, generation, ptok, ctok)
+    return generation, ptok, ctok, latency
+
+
+def evaluate_dialog(file_id: int, args, show_progress: bool = True, judge_cache=None, generation_store=None,
+                    journal=None, turns: List[Dict[str, Any]] = None, metrics=None, plan=None):
+    """Evaluate one dialog turn by turn, resuming from eval_{file_id}.jsonl if present.
+
+    Turns are strictly sequential because every turn is conditioned on the
+    full history of previous user queries and model responses. With a
+    journal, completed dialogs are skipped without reading their output,
+    records go through its group commits and no new turn is started once a
+    stop was requested. Pre-loaded dialog turns can be passed to avoid
+    re-reading dialog_{file_id}.jsonl. With a CheckerMetrics, per-checker
+    timings are aggregated there and stored in each record's check_times.
+    With a CheckerPlan, every turn runs the plan's interned checkers.
+
+    Returns True once the dialog is finished (every turn evaluated or
+    patience exhausted), False if it stopped early or does not exist.
+    """
+    dialog_path = os.path.join(args.dialogs_dir, f"dialog_{file_id}.jsonl")
+    if turns is None and not os.path.exists(dialog_path):
+        return False
     out_dir = os.path.join(args.output_dir, args.model_name.split("/")[-1])
-    os.makedirs(out_dir, exist_ok=True)
-
-    for file_id in tqdm(range(args.start_id, args.end_id + 1)):
-
-        dialog_path = os.path.join(dialogs_dir, f"dialog_{file_id}.jsonl")
-        if not os.path.exists(dialog_path):
-            continue
 
+    out_file = os.path.join(out_dir, f"eval_{file_id}.jsonl")
+    if journal is not None and journal.is_done(file_id, out_file):
+        return True
+    if turns is None:
         turns = load_jsonl(dialog_path)
-        # Track remaining patience across turns and resumes
-        current_remaining = int(args.patience) if (
-            args.patience is not None and args.patience > 0) else None
-
-        out_file = os.path.join(out_dir, f"eval_{file_id}.jsonl")
-        # Determine resume point from existing eval output if present
-        start_from_turn = 0
-        history_msgs: List[Dict[str, str]] = []
-        if os.path.exists(out_file):
-            finished_turns = load_jsonl(out_file)
-            if len(finished_turns) > 0:
-                last_turn = finished_turns[-1]
-                start_from_turn = last_turn.get("turn")
-                current_remaining = last_turn.get("remaining_patience")
-                # Build prior history: user -> assistant pairs from finished turns
-                for r in finished_turns:
-                    try:
-                        uq = r.get("user_query_verified")
-                        rp = r.get("response")
-                        history_msgs.append({"role": "user", "content": uq})
-                        history_msgs.append(
-                            {"role": "assistant", "content": rp})
-                    except Exception:
-                        continue
-
-        # Open for append; write each turn immediately
-        output_file = open(out_file, "a+", encoding="utf-8")
-        for turn in tqdm(turns[start_from_turn:]):
+    turn_checkers = plan.dialog_checkers(
+        file_id, turns) if plan is not None else None
+    tail = journal.lookup(file_id, out_file) if journal is not None else None
+    start_from_turn, current_remaining, history_msgs = load_resume_state(
+        out_file, args.patience, tail)
+    if journal is not None:
+        journal.begin(file_id, start_from_turn, current_remaining)
+
+    completed = True
+    # Open for append; write each turn immediately
+    with open(out_file, "a+", encoding="utf-8") as output_file:
+        for turn_idx in tqdm(range(start_from_turn, len(turns)), disable=not show_progress):
+            turn = turns[turn_idx]
 
             # If patience is configured and exhausted, stop immediately
             if current_remaining is not None and current_remaining == 0:
                 break
+            if journal is not None and journal.stopping:
+                completed = False
+                break
 
-            turn_idx = turn.get("turn")
-            active_topic = turn.get("active_topic")
-            user_query_verified = turn.get("user_query_verified")
-            instructions = turn.get("instructions")
-
-            if args.system_prompt == 1:
-                messages = [
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    *history_msgs,
-                    {"role": "user", "content": user_query_verified},
-                ]
-            else:
-                # print("here")
-                # exit(0)
-                messages = [
-                    *history_msgs,
-                    {"role": "user", "content": user_query_verified},
-                ]
+            messages = build_messages(
+                history_msgs, turn.get("user_query_verified"), args.system_prompt)
 
             try:
-                generation, ptok, ctok = LLM_backend(
-                    args.api_key, messages, args.model_name, args.base_url, use_json_mode=False)
+                generation, ptok, ctok, latency = generate(
+                    args, messages, generation_store)
             except Exception as e:
-                print(e)
+                print(f"[dialog {file_id}] {e}")
+                completed = False
                 break
                 # generation, ptok, ctok = f"[GENERATION_ERROR] {e}", 0, 0
 
-            overall_ok, details, sub_details = check_all_instructions(
-                instructions, generation, args.api_key, args.base_url)
+            judge_usage: Dict[str, Dict[str, int]] = {}
+            check_times = {} if metrics is not None else None
+            try:
+                overall_ok, details, sub_details = check_all_instructions(
+                    turn.get("instructions"), generation,
+                    args.judge_api_key or args.api_key, args.judge_base_url or args.base_url,
+                    combined_judge=bool(args.combined_judge), judge_cache=judge_cache,
+                    judge_usage=judge_usage, metrics=metrics, check_times=check_times,
+                    checkers=turn_checkers[turn_idx] if turn_checkers is not None else None)
+            except JudgeUnavailable as e:
+                # Not a verdict: keep patience and retry this turn on resume
+                print(f"[dialog {file_id}] {e}")
+                completed = False
+                break
             # Update remaining patience based on result
-            if current_remaining is not None:
-                if overall_ok:
-                    current_remaining = int(args.patience)
-                else:
-                    current_remaining = max(0, current_remaining - 1)
-
-            record = {
-                "turn": turn_idx,
-                "active_topic": active_topic,
-                "user_query_verified": user_query_verified,
-                "instructions": instructions,
-                "response": generation,
-                "eval": {
-                    "overall_ok": overall_ok,
-                    "details": details,
-                    "sub_details": sub_details,
-                },
-                "remaining_patience": current_remaining,
-            }
-            output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
-            output_file.flush()
+            current_remaining = next_patience(
+                current_remaining, overall_ok, args.patience)
+
+            record = build_record(
+                turn, generation, overall_ok, details, sub_details, current_remaining,
+                {"target": {"prompt_tokens": ptok, "completion_tokens": ctok},
+                 "judge": judge_usage},
+                latency, check_times)
+            if journal is not None:
+                journal.append(file_id, record)
+            else:
+                output_file.write(json.dumps(
+                    record, ensure_ascii=False) + "\n")
+                output_file.flush()
             # Extend in-memory history with this turn
 
             history_msgs.append(
-                {"role": "user", "content": user_query_verified})
+                {"role": "user", "content": turn.get("user_query_verified")})
             history_msgs.append({"role": "assistant", "content": generation})
 
+    if journal is not None and completed:
+        journal.mark_done(file_id)
+    return completed
+
+
+def dialog_progress(file_id: int, out_file: str, journal=None) -> Tuple[int, Any]:
+    """(finished turns, remaining patience) of a dialog, without parsing every record."""
+    entry = journal.committed(file_id, out_file) if journal is not None else None
+    if entry is not None:
+        return entry["turns"], entry["remaining_patience"]
+    if not os.path.exists(out_file):
+        return 0, None
+    done_turns, last_line = 0, None
+    with open(out_file, "rb") as f:
+        for line in f:
+            if line.strip():
+                done_turns += 1
+                last_line = line
+    remaining = None
+    if last_line is not None:
+        try:
+            remaining = json.loads(last_line).get("remaining_patience")
+        except ValueError:
+            pass
+    return done_turns, remaining
+
+
+def schedule_dialogs(args, file_ids, journal=None, stats=None, dialogs=None) -> Dict[int, Tuple[int, float, int]]:
+    """Schedule keys (see data_utils.scheduling) of the existing dialogs among file_ids."""
+    out_dir = os.path.join(args.output_dir, args.model_name.split("/")[-1])
+    keys = {}
+    for file_id in file_ids:
+        if dialogs is not None:
+            if file_id not in dialogs:
+                continue
+            total_turns = len(dialogs[file_id])
+        else:
+            dialog_path = os.path.join(
+                args.dialogs_dir, f"dialog_{file_id}.jsonl")
+            if not os.path.exists(dialog_path):
+                continue
+            with open(dialog_path, "rb") as f:
+                total_turns = sum(1 for line in f if line.strip())
+        done_turns, remaining = dialog_progress(
+            file_id, os.path.join(out_dir, f"eval_{file_id}.jsonl"), journal)
+        keys[file_id] = schedule_key(
+            file_id, total_turns, done_turns, remaining, stats)
+    return keys
+
+
+async def run_async(args, judge_cache=None, generation_store=None, journal=None, file_ids=None,
+                    metrics=None, plan=None):
+    """Evaluate many dialogs at once; turns inside a dialog stay sequential.
+
+    The OpenAI client is blocking, so each dialog runs in a worker thread and
+    the event loop only bounds how many dialogs are in flight. Dialogs are
+    started in the order of file_ids (default: by id).
+    """
+    if file_ids is None:
+        file_ids = list(range(args.start_id, args.end_id + 1))
+    semaphore = asyncio.Semaphore(args.concurrency)
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+
+        async def _evaluate(file_id: int):
+            async with semaphore:
+                try:
+                    await loop.run_in_executor(
+                        executor, evaluate_dialog, file_id, args, False, judge_cache, generation_store,
+                        journal, None, metrics, plan)
+                except Exception as e:
+                    print(f"[dialog {file_id}] {e}")
+
+        tasks = [asyncio.ensure_future(_evaluate(i)) for i in file_ids]
+        for task in tqdm(asyncio.as_completed(tasks), total=len(tasks)):
+            await task
+
+
+def run_worker(args, journal, judge_cache=None, generation_store=None, stats=None, metrics=None,
+               plan=None):
+    """Claim dialogs from the shared --work_queue until it is drained.
+
+    Claimed dialogs are leased to this worker and the leases are renewed in
+    the background. A dialog is marked done in the queue only after its
+    records are committed to disk; it goes back to the queue after an error
+    or an interrupt.
+    """
+    queue = LeaseQueue(args.work_queue, args.model_name,
+                       lease_seconds=args.lease_seconds)
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    # Seeding is idempotent, so every worker can do it; dialogs are handed
+    # out in schedule order (in flight first, then longest expected first)
+    order = schedule_order(schedule_dialogs(
+        args, range(args.start_id, args.end_id + 1), journal, stats))
+    queue.seed({file_id: len(order) - rank for rank,
+               file_id in enumerate(order)})
+
+    held = set()
+    held_lock = threading.Lock()
+    finished = threading.Event()
+
+    def _heartbeat():
+        while not finished.wait(args.lease_seconds / 3.0):
+            with held_lock:
+                file_ids = list(held)
+            if file_ids and queue.renew(file_ids, worker_id) < len(file_ids):
+                print(f"[{worker_id}] lost a lease; the dialog may be re-run elsewhere")
+
+    def _work():
+        while not journal.stopping:
+            file_id = queue.claim(worker_id)
+            if file_id is None:
+                # Leases of other workers may still expire and be re-issued:
+                # sleep until the first one can be reclaimed (at most
+                # --queue_poll, in case a dialog is released earlier)
+                expiry = queue.next_expiry()
+                if expiry is None:
+                    return
+                wait = min(args.queue_poll, max(0.0, expiry[1] - time.time()) + 0.05)
+                journal.wait_for_stop(wait)
+                continue
+            with held_lock:
+                held.add(file_id)
+            try:
+                completed = evaluate_dialog(
+                    file_id, args, False, judge_cache, generation_store, journal,
+                    metrics=metrics, plan=plan)
+            except Exception as e:
+                print(f"[dialog {file_id}] {e}")
+                completed = False
+            if completed:
+                journal.commit()
+                queue.complete(file_id, worker_id)
+            else:
+                queue.release(file_id, worker_id,
+                              failed=not journal.stopping)
+            with held_lock:
+                held.discard(file_id)
+
+    heartbeat = threading.Thread(target=_heartbeat, daemon=True)
+    heartbeat.start()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for future in [executor.submit(_work) for _ in range(args.concurrency)]:
+            future.result()
+    finished.set()
+    print(f"[{worker_id}] work queue: {queue.counts()}")
+
+
+def run(args):
+    out_dir = os.path.join(args.output_dir, args.model_name.split("/")[-1])
+    os.makedirs(out_dir, exist_ok=True)
+    configure_client_pool(
+        max_connections=args.max_connections,
+        max_keepalive_connections=args.max_connections,
+        timeout=args.request_timeout,
+    )
+    set_judge_workers(args.judge_workers)
+    rate_limited = bool(args.rpm or args.tpm or args.max_inflight)
+    if rate_limited:
+        # The limiter owns retries; disable the client's own retry loop
+        configure_client_pool(max_retries=0)
+        configure_rate_limits(
+            rpm=args.rpm or None,
+            tpm=args.tpm or None,
+            max_concurrency=args.max_inflight or 64,
+            max_retries=args.max_retries,
+        )
+    judge_cache = JudgeCache(args.judge_cache, max_entries=args.judge_cache_size) \
+        if args.judge_cache else None
+    generation_store = GenerationStore(args.generation_store, mode=args.generation_mode) \
+        if args.generation_store else None
+
+    journal = EvalJournal(out_dir, commit_interval=args.commit_interval)
+    stats = SurvivalStats.load(
+        args.survival_stats) if args.survival_stats else None
+    metrics = CheckerMetrics() if args.checker_metrics else None
+    plan = (CheckerPlan.load(args.checker_plan) if args.checker_plan else None) \
+        or CheckerPlan()
+
+    # First Ctrl-C: finish the turns in flight and exit cleanly; second: abort
+    def _drain(signum, frame):
+        if journal.stopping:
+            raise KeyboardInterrupt
+        print("\nInterrupted: finishing in-flight turns (Ctrl-C again to abort)")
+        journal.request_stop()
+    previous_handler = signal.signal(signal.SIGINT, _drain)
+
+    try:
+        if args.work_queue:
+            run_worker(args, journal, judge_cache,
+                       generation_store, stats, metrics, plan)
+        elif args.concurrency > 1:
+            file_ids = schedule_order(schedule_dialogs(
+                args, range(args.start_id, args.end_id + 1), journal, stats))
+            asyncio.run(run_async(args, judge_cache,
+                        generation_store, journal, file_ids, metrics, plan))
+        else:
+            for file_id in tqdm(range(args.start_id, args.end_id + 1)):
+                if journal.stopping:
+                    break
+                evaluate_dialog(file_id, args, judge_cache=judge_cache,
+                                generation_store=generation_store, journal=journal,
+                                metrics=metrics, plan=plan)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        journal.close()
+        if metrics is not None:
+            metrics.dump(os.path.join(out_dir, args.checker_metrics))
+        if args.checker_plan and plan.dirty:
+            plan.save(args.checker_plan)
+
+    if judge_cache is not None:
+        print(f"Judge cache: {judge_cache.stats()}")
+    if rate_limited:
+        print(f"Rate limiting: {limiter_stats()}")
+    if metrics is not None:
+        print(f"Checker metrics ({args.checker_metrics}):\n{metrics.summary()}")
+
 
 def build_parser():
     parser = argparse.ArgumentParser(
@@ -236,6 +821,62 @@ def build_parser():
     parser.add_argument("--patience", type=int, default=3,
                         help="Stop after this many consecutive failures")
     parser.add_argument("--system_prompt", type=int, default=0, help="")
+    parser.add_argument("--temperature", type=float, default=1.0,
+                        help="Sampling temperature of the target model")
+    parser.add_argument("--stream", type=int, default=0,
+                        help="1: stream target generations and record time-to-first-token and tokens/sec")
+    parser.add_argument("--max_tokens", type=int, default=0,
+                        help="Hard cap on completion tokens of the target model (0: no cap)")
+    parser.add_argument("--max_response_bytes", type=int, default=0,
+                        help="Truncate streamed responses at this many UTF-8 bytes (0: no cap)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of dialogs evaluated at the same time")
+    parser.add_argument("--max_connections", type=int, default=100,
+                        help="HTTP connection pool size per (base_url, api_key)")
+    parser.add_argument("--request_timeout", type=float, default=600.0,
+                        help="Per-request timeout in seconds")
+    parser.add_argument("--rpm", type=float, default=0,
+                        help="Requests per minute per endpoint (0: unlimited)")
+    parser.add_argument("--tpm", type=float, default=0,
+                        help="Tokens per minute per endpoint (0: unlimited)")
+    parser.add_argument("--max_inflight", type=int, default=0,
+                        help="Upper bound of the adaptive (AIMD) in-flight requests per endpoint")
+    parser.add_argument("--max_retries", type=int, default=6,
+                        help="Retries with jittered exponential backoff when rate limiting is on")
+    parser.add_argument("--commit_interval", type=float, default=1.0,
+                        help="Seconds between group commits (fsync) of the eval_*.jsonl files")
+    parser.add_argument("--survival_stats", type=str, nargs="*", default=[],
+                        help="Survival statistics of earlier runs (score.py --survival_stats) used to order dialogs")
+    parser.add_argument("--work_queue", type=str, default="",
+                        help="Shared SQLite lease queue; workers on several hosts claim dialog ids from it")
+    parser.add_argument("--worker_id", type=str, default="",
+                        help="Name of this worker in the work queue (default: <host>-<pid>)")
+    parser.add_argument("--lease_seconds", type=float, default=600.0,
+                        help="Lease duration; a dialog of a dead worker is re-issued after it expires")
+    parser.add_argument("--queue_poll", type=float, default=30.0,
+                        help="Longest wait between claims while the remaining dialogs are leased to others "
+                             "(a worker wakes earlier when the first of those leases expires)")
+    parser.add_argument("--judge_workers", type=int, default=16,
+                        help="Threads shared by the LLM judge calls of all dialogs")
+    parser.add_argument("--judge_api_key", type=str, default="",
+                        help="API key for the LLM judge (default: --api_key)")
+    parser.add_argument("--judge_base_url", type=str, default="",
+                        help="Base URL of the LLM judge (default: --base_url)")
+    parser.add_argument("--combined_judge", type=int, default=0,
+                        help="1: score emotion/reader_age/style of a turn in one judge call")
+    parser.add_argument("--judge_cache", type=str, default="",
+                        help="SQLite file caching judge verdicts across runs (disabled if empty)")
+    parser.add_argument("--judge_cache_size", type=int, default=200000,
+                        help="Maximum number of cached judge verdicts (LRU eviction)")
+    parser.add_argument("--generation_store", type=str, default="",
+                        help="SQLite file recording/replaying target-model generations (disabled if empty)")
+    parser.add_argument("--generation_mode", type=str, default="record", choices=GENERATION_STORE_MODES,
+                        help="record: store every completion; replay: serve completions from the store only")
+    parser.add_argument("--checker_plan", type=str, default="",
+                        help="JSON checker plan of the dialog set, loaded if present and saved (when extended) at exit")
+    parser.add_argument("--checker_metrics", type=str, default="",
+                        help="Sidecar JSON (relative to the model output dir) with per-checker time histograms "
+                             "and swallowed exceptions; also adds check_times to every record")
     return parser
 
 
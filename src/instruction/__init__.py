@@ -1,19 +1,20 @@
 # encoding = "utf-8"
 
 from .base import Instruction
-from .start_with import StartWithInstruction
-from .end_with import EndWithInstruction
-from .format_instruction import FormatInstruction
-from .countable_items import CountableItemsInstruction
-from .length import LengthInstruction
-from .existence import ExistenceInstruction
-from .forbidden import ForbiddenInstruction
-from .change_case import ChangeCaseInstruction
-from .punctuation import PunctuationInstruction
-# from .language import LanguageInstruction
-from .emotion import EmotionInstruction
-from .reader_age import ReaderAgeInstruction
-from .style import StyleInstruction
+from .registry import ID_TO_MODULE, load_class
+
+# Checker classes are imported on first access, like the registry does
+_CLASS_TO_MODULE = {class_name: module_name for module_name, class_name in ID_TO_MODULE.values()}
+
+
+def __getattr__(name):
+    module_name = _CLASS_TO_MODULE.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    cls = load_class(module_name, name)
+    globals()[name] = cls
+    return cls
+
 
 __all__ = [
     "Instruction",
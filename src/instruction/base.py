@@ -29,6 +29,19 @@ class Instruction:
         '''check whether the generation satisfies the instruction'''
         raise NotImplementedError("`check_following` not implemented.")
 
+    def check_batch(self, generations, *args, executor=None, **kwargs):
+        '''check many generations; returns the check_following results in order
+
+        Rule-based instructions override this to share their setup (compiled
+        patterns, ...) across the batch. With an executor, e.g. for LLM-judged
+        instructions, the generations are checked concurrently.
+        '''
+        if executor is None:
+            return [self.check_following(g, *args, **kwargs) for g in generations]
+        futures = [executor.submit(self.check_following, g, *args, **kwargs)
+                   for g in generations]
+        return [f.result() for f in futures]
+
     @staticmethod
     def check_query_completeness(query, prev_args, cur_args):
         '''check whether the synthesized query is complete'''
@@ -5,6 +5,7 @@ import re
 from typing import Dict
 
 from .base import Instruction
+from .text_profile import text_profile
 
 
 class ChangeCaseInstruction(Instruction):
@@ -80,24 +81,22 @@ class ChangeCaseInstruction(Instruction):
         mode = self.args.get("mode") if isinstance(self.args, dict) else None
         if not mode:
             return True
-        text = generation
+        profile = text_profile(generation)
         if mode == "all_upper":
             # Fail if any ASCII lowercase letter appears
-            return re.search(r"[a-z]", text) is None
+            return not profile.has_ascii_lower
         if mode == "all_lower":
             # Fail if any ASCII uppercase letter appears
-            return re.search(r"[A-Z]", text) is None
+            return not profile.has_ascii_upper
         if mode == "min_upper":
             n = self.args.get("min")
             if not isinstance(n, int) or n < 0:
                 return True
             tol = 3  # tolerance ±3%
             # Compute percentage of uppercase letters among all ASCII letters
-            letters = re.findall(r"[A-Za-z]", text)
-            total_letters = len(letters)
+            uppercase_letters, total_letters = profile.ascii_letter_counts
             if total_letters == 0:
                 return True
-            uppercase_letters = sum(1 for ch in letters if ch.isupper())
             percent_upper = (uppercase_letters * 100) / total_letters
             return abs(percent_upper - n) <= tol
         return True
@@ -0,0 +1,85 @@
+# encoding = "utf-8"
+
+import json
+from typing import Dict, List, Tuple
+
+from .instruction_utils import record_usage
+
+COMBINED_EVAL_PROMPT = """You are an impartial judge. Evaluate how well the text matches each target aspect below. Judge every aspect independently of the others.
+
+# Input
+## Target Aspects
+{aspects}
+
+## Text
+{generation}
+
+# Scoring Requirements
+For each aspect, use an integer score from 1 to 10 with these definitions:
+1-2: No alignment or opposite to the target.
+3-4: Weak alignment to the target; sporadic cues, mostly inconsistent.
+5-6: Partial alignment to the target; noticeable but frequent departures.
+7-8: Strong alignment to the target; occasional minor slips.
+9-10: Near-perfect alignment to the target; consistent throughout.
+
+# Output JSON Format
+{output_format}
+"""
+
+
+def build_combined_messages(instances, generation: str) -> List[Dict[str, str]]:
+    """Build one judge prompt that scores every soft constraint in `instances`.
+
+    Each instance must expose `id` and `judge_target()` (label, target text).
+    """
+    aspects = []
+    output_fields = []
+    for inst in instances:
+        label, target = inst.judge_target()
+        aspects.append(f"### {inst.id} ({label})\n{target}")
+        output_fields.append(
+            f'  "{inst.id}": {{"rationale": "1 sentence", "score": integer 1-10}}')
+    output_format = "{\n" + ",\n".join(output_fields) + "\n}"
+    return [
+        {"role": "user", "content": COMBINED_EVAL_PROMPT.format(
+            aspects="\n\n".join(aspects), generation=generation, output_format=output_format)}
+    ]
+
+
+def parse_combined_response(instances, response: str) -> Dict[str, Tuple[int, str]]:
+    """Parse a combined judge reply; aspects missing from it are omitted."""
+    response = json.loads(response)
+
+    results: Dict[str, Tuple[int, str]] = {}
+    for inst in instances:
+        aspect = response.get(inst.id)
+        if not isinstance(aspect, dict) or aspect.get("score") is None:
+            continue
+        results[inst.id] = (int(aspect["score"]), aspect.get("rationale", ""))
+    return results
+
+
+def check_combined(instances, generation, llm_backend, api_key, base_url, model_name="gpt-4.1",
+                   judge_cache=None, usage=None) -> Dict[str, Tuple[int, str]]:
+    """Score all soft constraints of a turn with a single judge call.
+
+    Returns {instruction id: (score, rationale)}, the same shape the individual
+    `check_following` calls produce. Aspects missing from the reply are omitted.
+    """
+    cache_key = None
+    if judge_cache is not None:
+        cache_key = judge_cache.make_key(
+            model_name, COMBINED_EVAL_PROMPT, [[inst.id, inst.args] for inst in instances], generation)
+        cached = judge_cache.get(cache_key)
+        if cached is not None:
+            return {k: (int(v[0]), v[1]) for k, v in cached.items()}
+
+    messages = build_combined_messages(instances, generation)
+    response, prompt_tokens, completion_tokens = llm_backend(
+        api_key, messages, model_name, base_url)
+    record_usage(usage, prompt_tokens, completion_tokens)
+    results = parse_combined_response(instances, response)
+    # Only complete verdicts are worth replaying
+    if cache_key is not None and len(results) == len(instances):
+        judge_cache.put(cache_key, {k: list(v) for k, v in results.items()})
+    return results
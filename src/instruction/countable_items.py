@@ -5,6 +5,7 @@ import re
 from typing import Dict
 
 from .base import Instruction
+from .text_profile import text_profile
 
 
 class CountableItemsInstruction(Instruction):
@@ -61,10 +62,7 @@ class CountableItemsInstruction(Instruction):
         if num_required is None:
             return True
         # Count markdown bullet lists beginning with '*' or '-'
-        bullets_star = re.findall(
-            r"^\s*\*[^\*].*$", generation, flags=re.MULTILINE)
-        bullets_dash = re.findall(r"^\s*-.*$", generation, flags=re.MULTILINE)
-        num_actual = len(bullets_star) + len(bullets_dash)
+        num_actual = text_profile(generation).bullet_count
         return num_actual == num_required
 
     @staticmethod
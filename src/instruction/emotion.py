@@ -3,9 +3,9 @@
 import random
 import re
 from typing import Dict, List
-import json
 
 from .base import Instruction
+from .instruction_utils import parse_judge_score, record_usage
 
 EMOTION_EVAL_PROMPT = """You are an impartial judge. Evaluate how well the text expresses the target emotion.
 
@@ -75,20 +75,35 @@ class EmotionInstruction(Instruction):
         self._description = self.build_description()
         return original_description, self._description
 
-    def check_following(self, generation, llm_backend, api_key, base_url, model_name="gpt-4.1"):
-        """With reward model
-        """
-        messages = [
+    def judge_target(self):
+        """The target aspect shown to the judge, e.g. in the combined judge prompt."""
+        return "Target Emotion", self.args.get("emotion")
+
+    def build_judge_messages(self, generation):
+        return [
             {"role": "user", "content": EMOTION_EVAL_PROMPT.format(
-                generation=generation, emotion=self.args.get("emotion"))}
+                generation=generation, emotion=self.judge_target()[1])}
         ]
+
+    def check_following(self, generation, llm_backend, api_key, base_url, model_name="gpt-4.1", judge_cache=None, usage=None):
+        """With reward model
+        """
+        cache_key = None
+        if judge_cache is not None:
+            cache_key = judge_cache.make_key(
+                model_name, EMOTION_EVAL_PROMPT, self.args, generation)
+            cached = judge_cache.get(cache_key)
+            if cached is not None:
+                return int(cached[0]), cached[1]
+
+        messages = self.build_judge_messages(generation)
         response, prompt_tokens, completion_tokens = llm_backend(
             api_key, messages, model_name, base_url)
-        response = json.loads(response)
-
-        assert response.get("score") is not None
-
-        return int(response["score"]), response.get("rationale", "")
+        record_usage(usage, prompt_tokens, completion_tokens)
+        score, rationale = parse_judge_score(response)
+        if cache_key is not None:
+            judge_cache.put(cache_key, [score, rationale])
+        return score, rationale
 
     @staticmethod
     def check_query_completeness(query, prev_args, cur_args):
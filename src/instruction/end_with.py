@@ -4,12 +4,12 @@ import random
 from typing import Dict, List, Tuple
 
 from .base import Instruction
+from .seed_data import get_candidate_keywords, get_keyword_set
+from .text_profile import text_profile
 from .instruction_utils import (
     get_letters,
     get_emojis,
-    get_keywords,
     get_quotation_pairs,
-    get_all_punctuations,
 )
 
 
@@ -50,7 +50,7 @@ class EndWithInstruction(Instruction):
                 elif mode == "emoji":
                     valid = isinstance(v, str) and v in get_emojis()
                 elif mode == "keyword":
-                    valid = isinstance(v, str) and v in get_keywords(
+                    valid = isinstance(v, str) and v in get_keyword_set(
                         topic_name) and (v not in forbidden_keywords)
                 if valid:
                     self.args = {"mode": mode, "value": v}
@@ -67,8 +67,7 @@ class EndWithInstruction(Instruction):
                 value = random.choice(get_emojis())
                 self.args = {"mode": mode, "value": value}
             elif mode == "keyword":
-                candidates = [k for k in get_keywords(
-                    topic_name) if k not in forbidden_keywords]
+                candidates = get_candidate_keywords(topic_name, forbidden_keywords)
                 if len(candidates) > 0:
                     value = random.choice(candidates)
                     self.args = {"mode": mode, "value": value}
@@ -123,12 +122,13 @@ class EndWithInstruction(Instruction):
         """
         if not isinstance(generation, str):
             return False
-        text = generation.rstrip("\ufeff\n\r\t ")
+        profile = text_profile(generation)
 
         mode = self.args.get("mode") if isinstance(self.args, dict) else None
 
         if mode == "quotation":
             # quotation: ensure it ends with the right symbol and the left appears somewhere before it
+            text = profile.rstripped
             left = self.args.get("left")
             right = self.args.get("right")
             if not left or not right:
@@ -139,30 +139,24 @@ class EndWithInstruction(Instruction):
             end_index = len(text) - len(right)
             return left in text[:end_index]
 
-        # strip structured wrappers like json/xml/csv/table/html/markdown (conservative)
-        try:
-            from instruction_utils import strip_structured_wrappers
-            text = strip_structured_wrappers(text)
-        except Exception:
-            pass
-        # print(text)
+        # Structured wrappers are deliberately not stripped, as in StartWithInstruction
         if mode != "quotation":
             expected = self.args.get("value")
             if expected == "":
                 return True
             # Normalize: strip trailing punctuation and compare case-insensitively
-            all_tail = "".join(get_all_punctuations())
-            text = text.rstrip(all_tail)
+            text = profile.tail
             # For letter mode: find the last alphabetic character and compare ignoring case
             if mode == "letter":
-                import re
-                matches = list(re.finditer(r"[A-Za-z]", text))
-                if not matches:
+                last_char = profile.last_ascii_letter
+                if last_char is None:
                     return False
-                last_char = matches[-1].group(0)
                 return last_char.casefold() == str(expected).casefold()
+            # Case folding never shortens a character, so folding a suffix as
+            # long as the expected value is enough
             try:
-                return text.casefold().endswith(str(expected).casefold())
+                folded = str(expected).casefold()
+                return text[max(0, len(text) - len(folded)):].casefold().endswith(folded)
             except Exception:
                 return text.endswith(str(expected))
 
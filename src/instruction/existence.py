@@ -1,12 +1,12 @@
 # encoding = "utf-8"
 
 import random
-import re
 from typing import Dict, List, Tuple
 
 from .base import Instruction
+from .keyword_matcher import keyword_matcher
+from .seed_data import get_candidate_keywords, get_keywords
 from .instruction_utils import (
-    get_keywords,
     normalize_list_of_strings,
 )
 
@@ -38,9 +38,7 @@ class ExistenceInstruction(Instruction):
                 self.args = {}
         else:
             # Random initialization for required keywords only (excluding forbidden)
-            candidates = list(get_keywords(topic_name))
-            if len(forbidden_mask) > 0:
-                candidates = [c for c in candidates if c not in forbidden_mask]
+            candidates = list(get_candidate_keywords(topic_name, forbidden_mask))
             random.shuffle(candidates)
             if len(candidates) == 0:
                 self.args = {}
@@ -87,8 +85,7 @@ class ExistenceInstruction(Instruction):
 
         def add_op(base: Dict[str, int]) -> Dict[str, int]:
             current = dict(base)
-            candidates_all = [k for k in get_keywords(
-                topic_name) if k not in forbidden_mask]
+            candidates_all = get_candidate_keywords(topic_name, forbidden_mask)
             add_candidates = [k for k in candidates_all if k not in current]
             random.shuffle(add_candidates)
             if len(add_candidates) == 0:
@@ -175,33 +172,27 @@ class ExistenceInstruction(Instruction):
         keywords: Dict[str, int] = self.args or {}
         if not keywords:
             return True
-        text = generation
         # Ensure required counts (ignore case)
-        for kw, min_count in keywords.items():
-            if not isinstance(min_count, int) or min_count < 1:
-                continue
-            count = self._count(text, kw)
-            if count != min_count:
-                return False
-        return True
+        required = self._required(keywords)
+        counts = keyword_matcher(kw for kw, _ in required).counts(generation)
+        return all(count == min_count for count, (_, min_count) in zip(counts, required))
+
+    def check_batch(self, generations, executor=None):
+        if not isinstance(self.args, dict) or not self.args:
+            return [self.check_following(g) for g in generations]
+        # One matcher for the whole batch
+        required = self._required(self.args)
+        matcher = keyword_matcher(kw for kw, _ in required)
+        return [isinstance(g, str) and all(
+                    count == min_count for count, (_, min_count) in zip(matcher.counts(g), required))
+                for g in generations]
 
     # -------------------- helpers --------------------
-    def _count(self, text: str, keyword: str) -> int:
-        if not isinstance(text, str) or not isinstance(keyword, str) or keyword == "":
-            return 0
-        flags = re.IGNORECASE
-        # Use word boundary when keyword is purely word-chars; otherwise fallback to substring
-        use_word_mode = re.match(r"^\w+$", keyword, flags=0) is not None
-        if use_word_mode:
-            pattern = r"\b" + re.escape(keyword) + r"\b"
-        else:
-            pattern = re.escape(keyword)
-        try:
-            return len(re.findall(pattern, text, flags=flags))
-        except re.error:
-            haystack = text.lower()
-            needle = keyword.lower()
-            return haystack.count(needle)
+    @staticmethod
+    def _required(keywords: Dict[str, int]) -> List[Tuple[str, int]]:
+        """(keyword, count) pairs the response must match; non-positive counts are ignored."""
+        return [(kw, min_count) for kw, min_count in keywords.items()
+                if isinstance(min_count, int) and min_count >= 1]
 
     @staticmethod
     def check_query_completeness(query, prev_args, cur_args):
@@ -1,12 +1,12 @@
 # encoding = "utf-8"
 
 import random
-import re
 from typing import List
 
 from .base import Instruction
+from .keyword_matcher import keyword_matcher
+from .seed_data import get_candidate_keywords, get_keywords
 from .instruction_utils import (
-    get_keywords,
     normalize_list_of_strings,
 )
 
@@ -48,7 +48,7 @@ class ForbiddenInstruction(Instruction):
                 self.args = []
         else:
             # Random initialization: choose 1-3 keywords as forbidden, excluding mask
-            candidates = [k for k in get_keywords(topic_name) if k not in mask]
+            candidates = list(get_candidate_keywords(topic_name, mask))
             random.shuffle(candidates)
             if len(candidates) == 0:
                 self.args = []
@@ -85,8 +85,8 @@ class ForbiddenInstruction(Instruction):
 
         def add_op(base: List[str]) -> List[str]:
             current = list(base)
-            candidates = [k for k in get_keywords(
-                topic_name) if k not in mask and k not in current]
+            candidates = [k for k in get_candidate_keywords(
+                topic_name, mask) if k not in current]
             random.shuffle(candidates)
             if len(candidates) == 0:
                 return current
@@ -135,32 +135,16 @@ class ForbiddenInstruction(Instruction):
         kws: List[str] = self.args or []
         if not kws:
             return True
-        text = generation
         # If any forbidden keyword appears (case-insensitive; word-boundary when possible)
-        for kw in kws:
-            if self._contains(text, kw):
-                return False
-        return True
-
-    # -------------------- helpers --------------------
-    def _contains(self, text: str, keyword: str) -> bool:
-        return self._count(text, keyword) > 0
-
-    def _count(self, text: str, keyword: str) -> int:
-        if not isinstance(text, str) or not isinstance(keyword, str) or keyword == "":
-            return 0
-        flags = re.IGNORECASE
-        use_word_mode = re.match(r"^\w+$", keyword, flags=0) is not None
-        if use_word_mode:
-            pattern = r"\b" + re.escape(keyword) + r"\b"
-        else:
-            pattern = re.escape(keyword)
-        try:
-            return len(re.findall(pattern, text, flags=flags))
-        except re.error:
-            haystack = text.lower()
-            needle = keyword.lower()
-            return haystack.count(needle)
+        return not any(count > 0 for count in keyword_matcher(kws).counts(generation))
+
+    def check_batch(self, generations, executor=None):
+        if not isinstance(self.args, list) or not self.args:
+            return [self.check_following(g) for g in generations]
+        # One matcher for the whole batch
+        matcher = keyword_matcher(self.args)
+        return [isinstance(g, str) and not any(count > 0 for count in matcher.counts(g))
+                for g in generations]
 
     @staticmethod
     def check_query_completeness(query, prev_args, cur_args):
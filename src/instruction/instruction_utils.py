@@ -1,11 +1,12 @@
 # encoding = "utf-8"
 
-from typing import List, Tuple, Dict
+from typing import Callable, List, Tuple, Dict
 import string
 import re
-import nltk
-import functools
 import json
+import threading
+
+from .sentence_segmenter import get_segmenter
 
 
 # Predefined pools
@@ -25,16 +26,55 @@ EMOJIS: List[str] = [
 ]
 
 
-@functools.lru_cache(maxsize=None)
-def _get_sentence_tokenizer():
-    return nltk.data.load("nltk:tokenizers/punkt/english.pickle")
+def count_sentences(text: str) -> int:
+    """Count the number of sentences in text using NLTK Punkt tokenizer (memoized, see sentence_segmenter.py)."""
+    return get_segmenter().count(text)
 
 
-def count_sentences(text: str) -> int:
-    """Count the number of sentences in text using NLTK Punkt tokenizer."""
-    tokenizer = _get_sentence_tokenizer()
-    tokenized_sentences = tokenizer.tokenize(text)
-    return len(tokenized_sentences)
+# Concurrent judge calls of a batch may accumulate into the same usage dict
+_usage_lock = threading.Lock()
+
+
+def record_usage(usage, prompt_tokens, completion_tokens):
+    """Accumulate token usage of a judge call into `usage` (no-op if usage is None)."""
+    if usage is None:
+        return
+    with _usage_lock:
+        usage["prompt_tokens"] = usage.get(
+            "prompt_tokens", 0) + (prompt_tokens or 0)
+        usage["completion_tokens"] = usage.get(
+            "completion_tokens", 0) + (completion_tokens or 0)
+
+
+def parse_judge_score(response: str) -> Tuple[int, str]:
+    """Parse a judge JSON reply {"rationale": ..., "score": ...} into (score, rationale)."""
+    response = json.loads(response)
+
+    assert response.get("score") is not None
+
+    return int(response["score"]), response.get("rationale", "")
+
+
+def keyword_counter(keyword) -> Callable[[str], int]:
+    """Return a function counting case-insensitive occurrences of keyword in a text.
+
+    Keywords made of word characters only are matched on word boundaries,
+    anything else as a substring. Building the counter once lets a checker
+    reuse the compiled pattern across many generations.
+    """
+    if not isinstance(keyword, str) or keyword == "":
+        return lambda text: 0
+    use_word_mode = re.match(r"^\w+$", keyword, flags=0) is not None
+    if use_word_mode:
+        pattern = r"\b" + re.escape(keyword) + r"\b"
+    else:
+        pattern = re.escape(keyword)
+    try:
+        compiled = re.compile(pattern, flags=re.IGNORECASE)
+    except re.error:
+        needle = keyword.lower()
+        return lambda text: text.lower().count(needle)
+    return lambda text: len(compiled.findall(text))
 
 
 def normalize_list_of_strings(value) -> List[str]:
@@ -46,42 +86,21 @@ def normalize_list_of_strings(value) -> List[str]:
     return []
 
 
-# Each data item processed by IFEval is treated as a topic with corresponding keywords
-def load_topic_keywords(file_path="./data/input_data_modified_keywords_v2.jsonl"):
-
-    keywords_dict = {}
-    query_dict = {}
-    with open(file_path, "r") as f:
-        for line in f:
-            data = json.loads(line.strip())
-            topic = data["key"]
-            keywords = data["keywords"]
-            keywords_dict[topic] = normalize_list_of_strings(keywords)
-            query_dict[topic] = data["prompt"]
-    return keywords_dict, query_dict
+# Seed data (topics, keywords, personas) lives in seed_data.py and is loaded on
+# first use; these names stay importable from here for existing callers
+_SEED_DATA_NAMES = ("load_topic_keywords", "get_topic_list", "get_keywords")
+_SEED_DATA_TABLES = ("TOPIC_KEYWORDS_DICT", "TOPIC_QUERY_DICT", "TOPIC_LIST")
 
 
-TOPIC_KEYWORDS_DICT, TOPIC_QUERY_DICT = load_topic_keywords()
-TOPIC_LIST = list(TOPIC_KEYWORDS_DICT.keys())
-# print(TOPIC_KEYWORDS_DICT)
-# print(TOPIC_QUERY_DICT)
-# print(TOPIC_LIST)
-# exit(0)
-
-
-def get_topic_list() -> List[str]:
-    return TOPIC_LIST.copy()
-
-
-def get_keywords(topic: str = None) -> List[str]:
-    """Return the list of keywords for the specified topic; if topic is empty, return the deduplicated union of all topics' keywords."""
-    try:
-        assert topic in TOPIC_KEYWORDS_DICT
-        return TOPIC_KEYWORDS_DICT[topic].copy()
-    except Exception as e:
-        print("Warning: Topic does not exist.")
-        print(topic)
-        exit(0)
+def __getattr__(name):
+    if name in _SEED_DATA_NAMES:
+        from . import seed_data
+        return getattr(seed_data, name)
+    if name in _SEED_DATA_TABLES:
+        # Built once per seed data store, then the same objects are returned
+        from . import seed_data
+        return seed_data.get_seed_data().tables()[_SEED_DATA_TABLES.index(name)]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Supported quotation/bracket pairs (left, right)
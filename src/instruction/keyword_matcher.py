@@ -0,0 +1,202 @@
+# encoding = "utf-8"
+'''
+Counting a fixed set of keywords in many responses.
+
+keyword_counter() gives each keyword its own case-insensitive regex, which
+for word keywords (\\bkw\\b) is a full scan of the response per keyword. A
+KeywordMatcher is built once per keyword set and returns the same counts:
+
+- For ASCII responses and keywords, occurrences are found in the lowercased
+  response with str.find/str.count (C speed); a word keyword only counts an
+  occurrence with a non-word character (or the text edge) on both sides,
+  which is exactly where \\b holds around an all-\\w keyword.
+- Large keyword sets (AUTOMATON_MIN_KEYWORDS or more ASCII keywords) are
+  counted in a single pass of an Aho-Corasick automaton instead, which costs
+  the same whatever the number of keywords.
+  When another checker already tokenized the response, word keywords are
+  looked up in the profile's token index instead.
+- Everything else (non-ASCII response or keyword, keywords such as "kw\\n"
+  that re.match(r"^\\w+$") accepts but that are not all \\w) uses the
+  keyword's regex.
+
+Counts are non-overlapping per keyword, as re.findall counts them.
+'''
+
+import functools
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .instruction_utils import keyword_counter
+from .text_profile import text_profile
+
+_WORD_KEYWORD = re.compile(r"\w+")
+# ASCII bytes matched by \w
+_WORD_BYTES = frozenset(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
+_WORD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
+
+# Below this many ASCII keywords, one str.find/str.count scan per keyword is
+# faster than a pure-Python automaton pass (see bench_checkers.py --keywords)
+AUTOMATON_MIN_KEYWORDS = 96
+
+_MATCHER_CACHE_SIZE = 256
+
+
+def count_word(lowered: str, needle: str) -> int:
+    """Occurrences of an all-\\w ASCII needle in lowercased ASCII text, on \\b boundaries.
+
+    Valid occurrences of such a needle never overlap, so the search resumes
+    after each hit.
+    """
+    count = 0
+    size = len(needle)
+    end = len(lowered)
+    i = lowered.find(needle)
+    while i != -1:
+        j = i + size
+        if (i == 0 or lowered[i - 1] not in _WORD_CHARS) and (j == end or lowered[j] not in _WORD_CHARS):
+            count += 1
+        i = lowered.find(needle, j)
+    return count
+
+
+class AhoCorasick:
+    """Byte-level automaton over lowercase ASCII needles; counts all of them in one pass."""
+
+    def __init__(self, needles: Sequence[str], word: Sequence[bool]):
+        self.needles = [n.encode("ascii") for n in needles]
+        self.word = list(word)
+        goto: List[Dict[int, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for idx, needle in enumerate(self.needles):
+            state = 0
+            for byte in needle:
+                nxt = goto[state].get(byte)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][byte] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(idx)
+
+        # Breadth-first failure links, folded into a full transition table
+        fail = [0] * len(goto)
+        delta: List[Optional[List[int]]] = [None] * len(goto)
+        delta[0] = [goto[0].get(b, 0) for b in range(128)]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            row = list(delta[fail[state]])
+            for byte, nxt in goto[state].items():
+                row[byte] = nxt
+                if state != 0:
+                    fail[nxt] = delta[fail[state]][byte]
+                out[nxt] = out[nxt] + out[fail[nxt]]
+                queue.append(nxt)
+            delta[state] = row
+        self._delta = delta
+        self._out = [tuple(o) for o in out]
+
+    def counts(self, lowered: bytes) -> List[int]:
+        counts = [0] * len(self.needles)
+        # End of the last counted occurrence of each needle (non-overlapping counts)
+        free = [0] * len(self.needles)
+        sizes = [len(n) for n in self.needles]
+        word = self.word
+        delta = self._delta
+        out = self._out
+        end = len(lowered)
+        state = 0
+        for i, byte in enumerate(lowered):
+            state = delta[state][byte]
+            hits = out[state]
+            if hits:
+                for idx in hits:
+                    start = i + 1 - sizes[idx]
+                    if start < free[idx]:
+                        continue
+                    if word[idx] and ((start > 0 and lowered[start - 1] in _WORD_BYTES)
+                                      or (i + 1 < end and lowered[i + 1] in _WORD_BYTES)):
+                        continue
+                    counts[idx] += 1
+                    free[idx] = i + 1
+        return counts
+
+
+class KeywordMatcher:
+    """Counts of a fixed keyword set, equal to keyword_counter(kw)(text) for every kw."""
+
+    def __init__(self, keywords: Iterable):
+        self.keywords: Tuple = tuple(keywords)
+        self._counters = [keyword_counter(kw) for kw in self.keywords]
+        # index -> (lowercase needle, word mode) for keywords the fast paths handle
+        self._ascii: Dict[int, Tuple[str, bool]] = {}
+        for idx, kw in enumerate(self.keywords):
+            if not isinstance(kw, str) or kw == "" or not kw.isascii():
+                continue
+            if re.match(r"^\w+$", kw) is None:
+                self._ascii[idx] = (kw.lower(), False)
+            elif _WORD_KEYWORD.fullmatch(kw):
+                self._ascii[idx] = (kw.lower(), True)
+        self._automaton: Optional[AhoCorasick] = None
+        self._automaton_order: List[int] = []
+        if len(self._ascii) >= AUTOMATON_MIN_KEYWORDS:
+            self._automaton_order = list(self._ascii)
+            self._automaton = AhoCorasick([self._ascii[i][0] for i in self._automaton_order],
+                                          [self._ascii[i][1] for i in self._automaton_order])
+
+    def counts(self, text: str) -> List[int]:
+        """Count of every keyword in text, in keyword order."""
+        if not isinstance(text, str):
+            return [0] * len(self.keywords)
+        profile = text_profile(text)
+        if not profile.is_ascii:
+            return [count(text) for count in self._counters]
+        lowered = profile.lowered
+        result = [None] * len(self.keywords)
+        if self._automaton is not None:
+            found = self._automaton.counts(lowered.encode("ascii"))
+            for idx, n in zip(self._automaton_order, found):
+                result[idx] = n
+        else:
+            # Reuse the token index if a word count already built the tokens
+            tokens = profile.token_counts if profile.computed("word_count") else None
+            for idx, (needle, word) in self._ascii.items():
+                if not word:
+                    result[idx] = lowered.count(needle)
+                elif tokens is not None:
+                    result[idx] = tokens[needle]
+                else:
+                    result[idx] = count_word(lowered, needle)
+        for idx, n in enumerate(result):
+            if n is None:
+                result[idx] = self._counters[idx](text)
+        return result
+
+    def count(self, text: str, index: int = 0) -> int:
+        """Count of one keyword, without counting the others."""
+        if not isinstance(text, str):
+            return 0
+        entry = self._ascii.get(index)
+        if entry is not None:
+            profile = text_profile(text)
+            if profile.is_ascii:
+                needle, word = entry
+                return count_word(profile.lowered, needle) if word else profile.lowered.count(needle)
+        return self._counters[index](text)
+
+
+@functools.lru_cache(maxsize=_MATCHER_CACHE_SIZE)
+def _cached_matcher(keywords: Tuple) -> KeywordMatcher:
+    return KeywordMatcher(keywords)
+
+
+def keyword_matcher(keywords: Iterable) -> KeywordMatcher:
+    """Shared matcher of a keyword set (built once per distinct keyword tuple)."""
+    keywords = tuple(keywords)
+    try:
+        return _cached_matcher(keywords)
+    except TypeError:
+        # Unhashable (non-string) entries in malformed args; they count 0
+        return KeywordMatcher(keywords)
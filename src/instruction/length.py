@@ -1,11 +1,11 @@
 # encoding = "utf-8"
 
 import random
-import re
 from typing import Dict
 
 from .base import Instruction
-from .instruction_utils import count_sentences
+from .sentence_segmenter import get_segmenter
+from .text_profile import text_profile
 
 
 class LengthInstruction(Instruction):
@@ -95,30 +95,17 @@ class LengthInstruction(Instruction):
         number = self.args.get("number")
         if mode is None or relation is None or not isinstance(number, int):
             return True
-        text = generation
+        profile = text_profile(generation)
         if mode == "word":
-            count = len(re.findall(r"\w+", text, flags=re.UNICODE))
+            count = profile.word_count
         elif mode == "paragraph":
-            # split by blank lines into paragraphs, counting non-empty blocks
-            stripped = text.strip()
-            if stripped == "":
-                count = 0
-            else:
-                parts = re.split(r"(?:\r?\n\s*){2,}", stripped)
-                parts = [p for p in (s.strip() for s in parts) if p != ""]
-                count = len(parts)
+            # non-empty blocks separated by blank lines
+            count = profile.paragraph_count
         elif mode == "sentence":
-            stripped = text.strip()
-            if stripped == "":
-                count = 0
-            else:
-                try:
-                    count = count_sentences(stripped)
-                except Exception:
-                    # Fallback to 1 if non-empty
-                    count = 1
+            # NLTK Punkt; 1 for non-empty text if that fails
+            count = profile.sentence_count
         else:  # characters
-            count = len(text)
+            count = len(generation)
 
         if relation == "less_than":
             return count < number
@@ -128,6 +115,17 @@ class LengthInstruction(Instruction):
             return count == number
         return True
 
+    def check_batch(self, generations, executor=None):
+        if isinstance(self.args, dict) and self.args.get("mode") == "sentence":
+            # Segment the distinct texts that need Punkt in one pass; the
+            # per-generation checks below then hit the segmenter's memo
+            try:
+                get_segmenter().count_batch(
+                    [text_profile(g).stripped for g in generations if isinstance(g, str) and g.strip()])
+            except Exception:
+                pass  # check_following falls back to 1 sentence
+        return [self.check_following(g) for g in generations]
+
     @staticmethod
     def check_query_completeness(query, prev_args, cur_args):
         mode = cur_args.get("mode") if isinstance(cur_args, dict) else None
@@ -0,0 +1,165 @@
+# encoding = "utf-8"
+'''
+Compiled checker plans.
+
+Most constraints of a dialog stay unchanged for many turns of a topic, so
+instead of building a checker per instruction per turn, a plan walks each
+dialog once and interns one checker per (instruction id, canonical args);
+every turn then maps to a prebuilt tuple of PlannedChecker entries. The
+canonical args (sorted-key JSON, the form the judge cache hashes) are
+hashable, and an interned entry is unique per (id, args), so either can key
+a cache of checker results.
+
+A plan serializes to JSON: the interned (id, args) table plus, per dialog,
+the checker indices of every turn and a fingerprint of the dialog's
+instructions. A plan saved once for a dialog/ set can be reused by every
+model run over it; dialogs whose instructions changed are recompiled.
+'''
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .registry import build_instruction_instance
+
+
+class PlannedChecker:
+    """An interned checker; equal and hashed by (instruction id, canonical args)."""
+
+    __slots__ = ("index", "inst_id", "args", "args_key", "instance")
+
+    def __init__(self, index: int, inst_id: str, args: Any, key: str, instance: Any):
+        self.index = index
+        self.inst_id = inst_id
+        self.args = args
+        self.args_key = key
+        self.instance = instance  # None for unknown instruction ids
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.inst_id, self.args_key
+
+    def __eq__(self, other):
+        return isinstance(other, PlannedChecker) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"PlannedChecker({self.index}, {self.inst_id!r}, {self.args_key})"
+
+
+def args_key(args: Any) -> str:
+    """Canonical, hashable form of instruction args."""
+    return json.dumps(args, sort_keys=True, ensure_ascii=False)
+
+
+def dialog_fingerprint(turns: List[Dict[str, Any]]) -> str:
+    instructions = [turn.get("instructions") for turn in turns]
+    return hashlib.sha256(args_key(instructions).encode("utf-8")).hexdigest()
+
+
+class CheckerPlan:
+    """Interned checkers of a dialog set and the checker tuple of every turn."""
+
+    VERSION = 1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkers: List[PlannedChecker] = []
+        self._index: Dict[Tuple[str, str], int] = {}
+        # file_id -> (fingerprint, checker indices per turn)
+        self.dialogs: Dict[int, Tuple[str, List[Tuple[int, ...]]]] = {}
+        self._turns: Dict[int, List[Tuple[PlannedChecker, ...]]] = {}
+        self.dirty = False
+
+    def intern(self, inst_id: str, args: Any) -> PlannedChecker:
+        key = (inst_id, args_key(args))
+        with self._lock:
+            index = self._index.get(key)
+            if index is None:
+                index = len(self.checkers)
+                self.checkers.append(PlannedChecker(
+                    index, inst_id, args, key[1], build_instruction_instance(inst_id, args)))
+                self._index[key] = index
+                self.dirty = True
+            return self.checkers[index]
+
+    def dialog_checkers(self, file_id: int, turns: List[Dict[str, Any]]) -> List[Tuple[PlannedChecker, ...]]:
+        """Checker tuple of every turn of a dialog, compiling it if it is new or changed."""
+        fingerprint = dialog_fingerprint(turns)
+        with self._lock:
+            entry = self.dialogs.get(file_id)
+            compiled = self._turns.get(file_id)
+        if entry is not None and entry[0] == fingerprint and len(entry[1]) == len(turns):
+            if compiled is None:
+                compiled = [tuple(self.checkers[i] for i in indices)
+                            for indices in entry[1]]
+                with self._lock:
+                    self._turns[file_id] = compiled
+            return compiled
+
+        compiled = [tuple(self.intern(it.get("id"), it.get("args"))
+                          for it in turn.get("instructions") or [])
+                    for turn in turns]
+        with self._lock:
+            self.dialogs[file_id] = (
+                fingerprint, [tuple(c.index for c in checkers) for checkers in compiled])
+            self._turns[file_id] = compiled
+            self.dirty = True
+        return compiled
+
+    @classmethod
+    def compile(cls, dialogs: Dict[int, List[Dict[str, Any]]]) -> "CheckerPlan":
+        plan = cls()
+        for file_id, turns in dialogs.items():
+            plan.dialog_checkers(file_id, turns)
+        return plan
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            uses = sum(len(indices) for _, turns in self.dialogs.values()
+                       for indices in turns)
+            return {"dialogs": len(self.dialogs), "checkers": len(self.checkers), "checks": uses}
+
+    # -------------------- Serialization --------------------
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "version": self.VERSION,
+                "checkers": [[c.inst_id, c.args] for c in self.checkers],
+                "dialogs": {str(file_id): {"fingerprint": fingerprint, "turns": [list(t) for t in turns]}
+                            for file_id, (fingerprint, turns) in sorted(self.dialogs.items())},
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CheckerPlan":
+        if data.get("version") != cls.VERSION:
+            raise ValueError(
+                f"Unsupported checker plan version {data.get('version')}")
+        plan = cls()
+        for inst_id, args in data["checkers"]:
+            plan.intern(inst_id, args)
+        for file_id, entry in data["dialogs"].items():
+            plan.dialogs[int(file_id)] = (
+                entry["fingerprint"], [tuple(t) for t in entry["turns"]])
+        plan.dirty = False
+        return plan
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str) -> Optional["CheckerPlan"]:
+        """Read a saved plan; None if the file does not exist."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,70 @@
+# encoding = "utf-8"
+'''
+Instruction id -> checker class, shared by evaluation, re-scoring and the
+checker plans.
+
+A checker module is imported the first time its id is looked up, so a
+process that only checks a few constraint types (a recheck worker, a
+reward scorer) does not import the others.
+'''
+
+import importlib
+from collections.abc import Mapping
+from typing import Any
+
+# id -> (module in this package, class name); register new constraints here
+ID_TO_MODULE = {
+    "startwith": ("start_with", "StartWithInstruction"),
+    "endwith": ("end_with", "EndWithInstruction"),
+    # "language": ("language", "LanguageInstruction"),
+    "format": ("format_instruction", "FormatInstruction"),
+    "countableItems": ("countable_items", "CountableItemsInstruction"),
+    "length": ("length", "LengthInstruction"),
+    "existence": ("existence", "ExistenceInstruction"),
+    "forbidden": ("forbidden", "ForbiddenInstruction"),
+    "case": ("change_case", "ChangeCaseInstruction"),
+    "punctuation": ("punctuation", "PunctuationInstruction"),
+    "emotion": ("emotion", "EmotionInstruction"),
+    "reader_age": ("reader_age", "ReaderAgeInstruction"),
+    "style": ("style", "StyleInstruction"),
+}
+
+
+def load_class(module_name: str, class_name: str):
+    return getattr(importlib.import_module(f".{module_name}", __package__), class_name)
+
+
+class _LazyClassMap(Mapping):
+    """Read-only id -> class mapping that imports a checker module on first lookup."""
+
+    def __init__(self, spec):
+        self._spec = spec
+        self._classes = {}
+
+    def __getitem__(self, inst_id):
+        cls = self._classes.get(inst_id)
+        if cls is None:
+            cls = self._classes[inst_id] = load_class(*self._spec[inst_id])
+        return cls
+
+    def __iter__(self):
+        return iter(self._spec)
+
+    def __len__(self):
+        return len(self._spec)
+
+
+ID_TO_CLASS = _LazyClassMap(ID_TO_MODULE)
+
+# LLM-judged constraints; each check is a blocking judge round-trip
+JUDGE_IDS = ("emotion", "reader_age", "style")
+
+
+def build_instruction_instance(inst_id: str, args: Any):
+    cls = ID_TO_CLASS.get(inst_id)
+    if cls is None:
+        return None
+    inst = cls()
+    # Directly assign args for evaluation; ignore descriptions entirely
+    setattr(inst, "args", args)
+    return inst
@@ -0,0 +1,228 @@
+# encoding = "utf-8"
+'''
+Seed data: topics with their keywords and prompts, personas with their
+language styles.
+
+Nothing is read at import time. The files are parsed on first use, once per
+process, from the data directory: $EVOLIF_DATA_DIR if set, else data/ at the
+repository root (independent of the working directory); configure() points
+the default store elsewhere. Call warm() before forking workers so that the
+children share the parsed data instead of each parsing the files.
+
+Per topic, the keywords are kept as a tuple in file order (seeded random
+choices depend on it) and as a frozenset for membership tests; candidate
+keywords excluding a set of keywords (e.g. the forbidden ones) are memoized.
+'''
+
+import json
+import os
+import threading
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .instruction_utils import normalize_list_of_strings
+
+DATA_DIR = os.environ.get("EVOLIF_DATA_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+TOPICS_FILE = "input_data_modified_keywords_v2.jsonl"
+PERSONAS_FILE = "persona_language_styles_500.jsonl"
+
+# Memoized (topic, excluded keywords) candidate tuples
+_CANDIDATE_CACHE_SIZE = 4096
+
+
+def load_topic_keywords(file_path: Optional[str] = None) -> Tuple[Dict[Any, List[str]], Dict[Any, str]]:
+    """Parse the topic file into ({topic: keywords}, {topic: prompt}).
+
+    Without a path, the default store's topic file is read.
+    """
+    if file_path is None:
+        file_path = _default.topics_path
+    keywords_dict = {}
+    query_dict = {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            topic = data["key"]
+            keywords_dict[topic] = normalize_list_of_strings(data["keywords"])
+            query_dict[topic] = data["prompt"]
+    return keywords_dict, query_dict
+
+
+def load_personas(file_path: str) -> List[Dict[str, Any]]:
+    """Parse the persona file into a list of {uuid, persona, styles} records."""
+    personas = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                personas.append(json.loads(line))
+    return personas
+
+
+class SeedData:
+    """Lazily loaded, indexed seed data; safe to share between threads."""
+
+    def __init__(self, data_dir: str = DATA_DIR, topics_path: Optional[str] = None,
+                 personas_path: Optional[str] = None):
+        self.topics_path = topics_path or os.path.join(data_dir, TOPICS_FILE)
+        self.personas_path = personas_path or os.path.join(data_dir, PERSONAS_FILE)
+        self._lock = threading.Lock()
+        self._keywords: Optional[Dict[Any, Tuple[str, ...]]] = None
+        self._keyword_sets: Dict[Any, FrozenSet[str]] = {}
+        self._queries: Dict[Any, str] = {}
+        self._all_keywords: Tuple[str, ...] = ()
+        self._all_keyword_set: FrozenSet[str] = frozenset()
+        self._personas: Optional[Tuple[Dict[str, Any], ...]] = None
+        self._persona_index: Dict[str, Dict[str, Any]] = {}
+        self._candidates: Dict[Tuple[Any, FrozenSet[str]], Tuple[str, ...]] = {}
+        self._tables: Optional[Tuple[Dict[Any, List[str]], Dict[Any, str], List[Any]]] = None
+
+    # -------------------- Loading --------------------
+    def _topics(self) -> Dict[Any, Tuple[str, ...]]:
+        keywords = self._keywords
+        if keywords is None:
+            with self._lock:
+                if self._keywords is None:
+                    raw, queries = load_topic_keywords(self.topics_path)
+                    self._keyword_sets = {t: frozenset(kws) for t, kws in raw.items()}
+                    self._queries = queries
+                    self._all_keywords = tuple(dict.fromkeys(
+                        kw for kws in raw.values() for kw in kws))
+                    self._all_keyword_set = frozenset(self._all_keywords)
+                    self._keywords = {t: tuple(kws) for t, kws in raw.items()}
+                keywords = self._keywords
+        return keywords
+
+    def _load_personas(self) -> Tuple[Dict[str, Any], ...]:
+        personas = self._personas
+        if personas is None:
+            with self._lock:
+                if self._personas is None:
+                    records = tuple(load_personas(self.personas_path))
+                    self._persona_index = {p["uuid"]: p for p in records if "uuid" in p}
+                    self._personas = records
+                personas = self._personas
+        return personas
+
+    def warm(self, personas: bool = True):
+        """Load everything now (e.g. in the parent before forking workers)."""
+        self._topics()
+        if personas:
+            self._load_personas()
+
+    # -------------------- Topics --------------------
+    def topics(self) -> Tuple[Any, ...]:
+        return tuple(self._topics())
+
+    def keywords(self, topic=None) -> Tuple[str, ...]:
+        """Keywords of a topic in file order; with no topic, the deduplicated union.
+
+        Raises KeyError for an unknown topic.
+        """
+        topics = self._topics()
+        if topic is None or topic == "":
+            return self._all_keywords
+        try:
+            return topics[topic]
+        except (KeyError, TypeError):
+            raise KeyError(f"Unknown topic: {topic!r}") from None
+
+    def keyword_set(self, topic=None) -> FrozenSet[str]:
+        self.keywords(topic)
+        if topic is None or topic == "":
+            return self._all_keyword_set
+        return self._keyword_sets[topic]
+
+    def candidates(self, topic, exclude: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+        """Keywords of a topic not in exclude, in file order."""
+        keywords = self.keywords(topic)
+        excluded = frozenset(exclude) if exclude else frozenset()
+        if not excluded:
+            return keywords
+        key = (topic, excluded)
+        cached = self._candidates.get(key)
+        if cached is None:
+            cached = tuple(k for k in keywords if k not in excluded)
+            with self._lock:
+                if len(self._candidates) >= _CANDIDATE_CACHE_SIZE:
+                    self._candidates.clear()
+                self._candidates[key] = cached
+        return cached
+
+    def query(self, topic) -> str:
+        self.keywords(topic)
+        return self._queries[topic]
+
+    def tables(self) -> Tuple[Dict[Any, List[str]], Dict[Any, str], List[Any]]:
+        """({topic: keywords}, {topic: prompt}, [topics]) as the old module tables, built once."""
+        tables = self._tables
+        if tables is None:
+            topics = self._topics()
+            with self._lock:
+                if self._tables is None:
+                    self._tables = ({t: list(kws) for t, kws in topics.items()},
+                                    dict(self._queries), list(topics))
+                tables = self._tables
+        return tables
+
+    # -------------------- Personas --------------------
+    def personas(self) -> Tuple[Dict[str, Any], ...]:
+        return self._load_personas()
+
+    def persona(self, uuid: str) -> Dict[str, Any]:
+        """Persona record by uuid; raises KeyError if there is none."""
+        self._load_personas()
+        try:
+            return self._persona_index[uuid]
+        except KeyError:
+            raise KeyError(f"Unknown persona: {uuid!r}") from None
+
+
+_default = SeedData()
+
+
+def configure(data_dir: str = DATA_DIR, topics_path: Optional[str] = None,
+              personas_path: Optional[str] = None) -> SeedData:
+    """Point the default store at other files (takes effect on the next access)."""
+    global _default
+    _default = SeedData(data_dir, topics_path, personas_path)
+    return _default
+
+
+def get_seed_data() -> SeedData:
+    return _default
+
+
+def warm(personas: bool = True):
+    _default.warm(personas)
+
+
+def get_topic_list() -> Tuple[Any, ...]:
+    return _default.topics()
+
+
+def get_keywords(topic=None) -> Tuple[str, ...]:
+    """Keywords of a topic (tuple, file order); KeyError for an unknown topic."""
+    return _default.keywords(topic)
+
+
+def get_keyword_set(topic=None) -> FrozenSet[str]:
+    return _default.keyword_set(topic)
+
+
+def get_candidate_keywords(topic, exclude: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+    """Keywords of a topic not in exclude (e.g. the forbidden keywords), in file order."""
+    return _default.candidates(topic, exclude)
+
+
+def get_topic_query(topic) -> str:
+    return _default.query(topic)
+
+
+def get_personas() -> Tuple[Dict[str, Any], ...]:
+    return _default.personas()
+
+
+def get_persona(uuid: str) -> Dict[str, Any]:
+    return _default.persona(uuid)
@@ -0,0 +1,173 @@
+# encoding = "utf-8"
+'''
+Sentence counting for the length checker.
+
+NLTK Punkt is the reference segmenter and the most expensive rule check.
+SentenceSegmenter puts it behind:
+- a fast path: Punkt only considers a break at '.', '?' or '!' followed by
+  more text, so a text with none of them before its last non-whitespace
+  character is one sentence (zero if blank) for any Punkt model;
+- a bounded memo of counts keyed by a hash of the text, shared by every
+  check of the process (several constraints, recheck, sweeps over one
+  dialog set);
+- count_batch(), which segments each distinct text of a batch once;
+- warm(), which imports nltk and loads the Punkt model, so worker processes
+  forked afterwards inherit it instead of loading it again.
+
+When the model cannot be loaded, counts that need Punkt raise as before
+(LengthInstruction then falls back to 1); the failure is remembered so
+later calls do not search the nltk data path again.
+'''
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+_TERMINATORS = re.compile(r"[.?!]")
+
+_MEMO_SIZE = 4096
+
+
+def load_punkt():
+    # nltk takes a few hundred ms to import; only sentence counting needs it
+    import nltk
+    return nltk.data.load("nltk:tokenizers/punkt/english.pickle")
+
+
+def fast_count(text: str) -> Optional[int]:
+    """The Punkt sentence count if it does not depend on the model, else None."""
+    text = text.rstrip()
+    if not text:
+        return 0
+    if _TERMINATORS.search(text, 0, len(text) - 1) is None:
+        return 1
+    return None
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+
+
+class SentenceSegmenter:
+    """Memoized Punkt sentence counts with a model-independent fast path."""
+
+    def __init__(self, loader: Callable[[], object] = load_punkt, fast_path: bool = True,
+                 memo_size: int = _MEMO_SIZE):
+        self._loader = loader
+        self.fast_path = fast_path
+        self.memo_size = memo_size
+        self._lock = threading.Lock()
+        self._tokenizer = None
+        self._load_error: Optional[BaseException] = None
+        self._memo: "OrderedDict[bytes, int]" = OrderedDict()
+        self.stats = {"fast": 0, "memo": 0, "punkt": 0}
+
+    def tokenizer(self):
+        """The Punkt model, loaded once; re-raises the load failure on later calls."""
+        if self._tokenizer is None:
+            with self._lock:
+                if self._tokenizer is None:
+                    if self._load_error is not None:
+                        # Drop the traceback of earlier raises so it does not grow
+                        raise self._load_error.with_traceback(None)
+                    try:
+                        self._tokenizer = self._loader()
+                    except Exception as e:
+                        self._load_error = e
+                        raise
+        return self._tokenizer
+
+    def warm(self) -> bool:
+        """Load the model now (before forking workers); False if it is unavailable."""
+        try:
+            self.tokenizer()
+            return True
+        except Exception:
+            return False
+
+    def _lookup(self, key: bytes) -> Optional[int]:
+        with self._lock:
+            count = self._memo.get(key)
+            if count is not None:
+                self._memo.move_to_end(key)
+                self.stats["memo"] += 1
+            return count
+
+    def _store(self, key: bytes, count: int):
+        with self._lock:
+            self._memo[key] = count
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+            self.stats["punkt"] += 1
+
+    def _fast(self, text: str) -> Optional[int]:
+        if not self.fast_path:
+            return None
+        count = fast_count(text)
+        if count is not None:
+            with self._lock:
+                self.stats["fast"] += 1
+        return count
+
+    def count(self, text: str) -> int:
+        """Number of sentences Punkt finds in text."""
+        count = self._fast(text)
+        if count is not None:
+            return count
+        # Fail before hashing the text when the model cannot be loaded
+        tokenizer = self.tokenizer()
+        key = text_key(text)
+        count = self._lookup(key)
+        if count is None:
+            count = len(tokenizer.tokenize(text))
+            self._store(key, count)
+        return count
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        """Sentence counts of many texts; each distinct text is segmented once."""
+        counts: List[Optional[int]] = [self._fast(t) for t in texts]
+        if any(c is None for c in counts):
+            self.tokenizer()
+        pending: Dict[bytes, List[int]] = {}
+        for i, text in enumerate(texts):
+            if counts[i] is None:
+                key = text_key(text)
+                cached = self._lookup(key)
+                if cached is None:
+                    pending.setdefault(key, []).append(i)
+                else:
+                    counts[i] = cached
+        if pending:
+            tokenizer = self.tokenizer()
+            for key, indices in pending.items():
+                count = len(tokenizer.tokenize(texts[indices[0]]))
+                self._store(key, count)
+                for i in indices:
+                    counts[i] = count
+        return counts
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+
+
+_default = SentenceSegmenter()
+
+
+def get_segmenter() -> SentenceSegmenter:
+    return _default
+
+
+def configure(fast_path: bool = True, memo_size: int = _MEMO_SIZE,
+              loader: Callable[[], object] = load_punkt) -> SentenceSegmenter:
+    """Replace the process-wide segmenter (e.g. to disable the fast path)."""
+    global _default
+    _default = SentenceSegmenter(loader, fast_path, memo_size)
+    return _default
+
+
+def warm() -> bool:
+    return _default.warm()
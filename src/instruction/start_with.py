@@ -4,12 +4,12 @@ import random
 from typing import Dict, List, Tuple
 
 from .base import Instruction
+from .seed_data import get_candidate_keywords, get_keyword_set
+from .text_profile import text_profile
 from .instruction_utils import (
     get_letters,
     get_emojis,
-    get_keywords,
     get_quotation_pairs,
-    get_all_punctuations,
 )
 
 
@@ -54,7 +54,7 @@ class StartWithInstruction(Instruction):
                 elif mode == "emoji":
                     valid = isinstance(v, str) and v in get_emojis()
                 elif mode == "keyword":
-                    valid = isinstance(v, str) and v in get_keywords(
+                    valid = isinstance(v, str) and v in get_keyword_set(
                         topic_name) and (v not in forbidden_keywords)
                 if valid:
                     self.args = {"mode": mode, "value": v}
@@ -72,8 +72,7 @@ class StartWithInstruction(Instruction):
                 value = random.choice(get_emojis())
                 self.args = {"mode": mode, "value": value}
             elif mode == "keyword":
-                candidates = [k for k in get_keywords(
-                    topic_name) if k not in forbidden_keywords]
+                candidates = get_candidate_keywords(topic_name, forbidden_keywords)
                 if len(candidates) > 0:
                     value = random.choice(candidates)
                     self.args = {"mode": mode, "value": value}
@@ -133,12 +132,13 @@ class StartWithInstruction(Instruction):
         """
         if not isinstance(generation, str):
             return False
-        text = generation.lstrip("\ufeff\n\r\t ")
+        profile = text_profile(generation)
 
         mode = self.args.get("mode") if isinstance(self.args, dict) else None
 
         if mode == "quotation":
             # quotation: only check the starting left symbol, and ensure some right symbol exists later (optional but safer)
+            text = profile.lstripped
             left = self.args.get("left")
             right = self.args.get("right")
             if not left or not right:
@@ -149,29 +149,11 @@ class StartWithInstruction(Instruction):
             # Right symbol can appear anywhere after the first position
             return right in text[len(left):]
 
-        # strip structured wrappers like json/xml/csv/table/html/markdown (conservative)
-        try:
-            from instruction_utils import strip_structured_wrappers
-            text = strip_structured_wrappers(text)
-            # print(text)
-        except Exception:
-            pass
-        # print(text)
-
-        # Remove leading unicode invisible/whitespace characters beyond basic lstrip
-        try:
-            import re
-            text = re.sub(
-                r'^[\s\ufeff\u00A0\u1680\u180E\u2000-\u200F\u2028\u2029\u202F\u205F\u2060\u3000\uFEFF]+', '', text)
-        except Exception:
-            pass
-
-        # Remove leading punctuation before checking
-        try:
-            all_head = "".join(get_all_punctuations())
-            text = text.lstrip(all_head)
-        except Exception:
-            pass
+        # Structured wrappers (json/xml/html/markdown shells) are deliberately
+        # not stripped: scores have always been computed without it. The text
+        # is checked after leading whitespace, invisible characters and
+        # punctuation (see TextProfile.head).
+        text = profile.head
 
         if mode != "quotation":
             expected = self.args.get("value")
@@ -180,17 +162,16 @@ class StartWithInstruction(Instruction):
 
             # For letter mode: find the first alphabetic character and compare ignoring case
             if mode == "letter":
-                import re
-                m = re.search(r"[A-Za-z]", text)
-                # print(text)
-                # print(m)
-                if not m:
+                first = profile.first_ascii_letter
+                if first is None:
                     return False
-                return m.group(0).casefold() == str(expected).casefold()
-            # Other modes: case-insensitive prefix check
-
+                return first.casefold() == str(expected).casefold()
+            # Other modes: case-insensitive prefix check. Case folding works
+            # character by character and never shortens, so folding a prefix
+            # as long as the expected value is enough.
             try:
-                return text.casefold().startswith(str(expected).casefold())
+                folded = str(expected).casefold()
+                return text[:len(folded)].casefold().startswith(folded)
             except Exception:
                 return text.startswith(str(expected))
 
@@ -3,9 +3,9 @@
 import random
 import re
 from typing import Dict, List
-import json
 
 from .base import Instruction
+from .instruction_utils import parse_judge_score, record_usage
 
 STYLE_DEFINITIONS: Dict[str, str] = {
     "formal": "A formal style, which is usually characterized by detachment, precision, objectivity, rigidity, and higher cognitive load.",
@@ -97,20 +97,35 @@ class StyleInstruction(Instruction):
         self._description = self.build_description()
         return original_description, self._description
 
-    def check_following(self, generation, llm_backend, api_key, base_url, model_name="gpt-4.1"):
-        """With GPT-4.1"""
+    def judge_target(self):
+        """The target aspect shown to the judge, e.g. in the combined judge prompt."""
+        return "Target Style", STYLE_DEFINITIONS[self.args.get("style")]
 
-        messages = [
+    def build_judge_messages(self, generation):
+        return [
             {"role": "user", "content": STYLE_EVAL_PROMPT.format(
-                generation=generation, style=STYLE_DEFINITIONS[self.args.get("style")])}
+                generation=generation, style=self.judge_target()[1])}
         ]
-        response, prompt_tokens, completion_tokens = llm_backend(
-            api_key, messages, model_name)
-        response = json.loads(response)
 
-        assert response.get("score") is not None
+    def check_following(self, generation, llm_backend, api_key, base_url, model_name="gpt-4.1", judge_cache=None, usage=None):
+        """With GPT-4.1"""
 
-        return int(response["score"]), response.get("rationale", "")
+        cache_key = None
+        if judge_cache is not None:
+            cache_key = judge_cache.make_key(
+                model_name, STYLE_EVAL_PROMPT, self.args, generation)
+            cached = judge_cache.get(cache_key)
+            if cached is not None:
+                return int(cached[0]), cached[1]
+
+        messages = self.build_judge_messages(generation)
+        response, prompt_tokens, completion_tokens = llm_backend(
+            api_key, messages, model_name, base_url)
+        record_usage(usage, prompt_tokens, completion_tokens)
+        score, rationale = parse_judge_score(response)
+        if cache_key is not None:
+            judge_cache.put(cache_key, [score, rationale])
+        return score, rationale
 
     @staticmethod
     def check_query_completeness(query, prev_args, cur_args):
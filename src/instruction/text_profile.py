@@ -0,0 +1,173 @@
+# encoding = "utf-8"
+'''
+Shared, lazily computed analysis of one generation.
+
+The rule-based checkers of a turn all look at the same response. Instead of
+each one rescanning it, they read from a TextProfile: every view (word
+count, sentence/paragraph count, ASCII letter case counts, bullet lines, the
+normalized head and tail used by start-with/end-with, the lowercased
+text, ...) is computed on first use and kept. text_profile() memoizes the
+profiles of recent generations, so the checkers of one turn share one
+profile without any change to the check_following(generation) interface.
+
+Every view reproduces the exact semantics the checker had when it scanned
+the text itself; ASCII-only fast paths fall back to the original regexes
+for other input.
+'''
+
+import functools
+import re
+import string
+from collections import Counter
+from functools import cached_property
+from typing import Optional, Tuple
+
+from .instruction_utils import count_sentences, get_all_punctuations
+
+_WORD = re.compile(r"\w+", flags=re.UNICODE)
+_PARAGRAPH_BREAK = re.compile(r"(?:\r?\n\s*){2,}")
+_BULLET_STAR = re.compile(r"^\s*\*[^\*].*$", flags=re.MULTILINE)
+_BULLET_DASH = re.compile(r"^\s*-.*$", flags=re.MULTILINE)
+_ASCII_LOWER = re.compile(r"[a-z]")
+_ASCII_UPPER = re.compile(r"[A-Z]")
+_ASCII_LETTER = re.compile(r"[A-Za-z]")
+_LEADING_INVISIBLE = re.compile(
+    r'^[\s\ufeff\u00A0\u1680\u180E\u2000-\u200F\u2028\u2029\u202F\u205F\u2060\u3000\uFEFF]+')
+
+_EDGE_WHITESPACE = "\ufeff\n\r\t "
+_ALL_PUNCTUATIONS = "".join(get_all_punctuations())
+_UPPER_BYTES = string.ascii_uppercase.encode("ascii")
+_LOWER_BYTES = string.ascii_lowercase.encode("ascii")
+
+# Profiles of the generations checked most recently
+_PROFILE_CACHE_SIZE = 64
+
+
+class TextProfile:
+    """Lazily computed, memoized views of one generation."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def computed(self, view: str) -> bool:
+        """Whether a view was already computed, i.e. reading it costs nothing."""
+        return view in self.__dict__
+
+    @cached_property
+    def is_ascii(self) -> bool:
+        return self.text.isascii()
+
+    @cached_property
+    def stripped(self) -> str:
+        return self.text.strip()
+
+    @cached_property
+    def lowered(self) -> str:
+        return self.text.lower()
+
+    # -------------------- length --------------------
+    @cached_property
+    def _ascii_tokens(self):
+        # Lowercasing ASCII text does not move \w boundaries
+        return _WORD.findall(self.lowered)
+
+    @cached_property
+    def token_counts(self) -> Counter:
+        """Lowercased maximal \\w runs of an ASCII text and their counts."""
+        return Counter(self._ascii_tokens)
+
+    @cached_property
+    def word_count(self) -> int:
+        if self.is_ascii:
+            return len(self._ascii_tokens)
+        return len(_WORD.findall(self.text))
+
+    @cached_property
+    def paragraph_count(self) -> int:
+        if self.stripped == "":
+            return 0
+        parts = _PARAGRAPH_BREAK.split(self.stripped)
+        return len([p for p in (s.strip() for s in parts) if p != ""])
+
+    @cached_property
+    def sentence_count(self) -> int:
+        if self.stripped == "":
+            return 0
+        try:
+            return count_sentences(self.stripped)
+        except Exception:
+            # Fallback to 1 if non-empty
+            return 1
+
+    # -------------------- case --------------------
+    @cached_property
+    def ascii_letter_counts(self) -> Tuple[int, int]:
+        """(uppercase, all) ASCII letters; UTF-8 never uses ASCII bytes inside multi-byte characters."""
+        data = self.text.encode("utf-8", errors="surrogatepass")
+        upper = len(data) - len(data.translate(None, _UPPER_BYTES))
+        lower = len(data) - len(data.translate(None, _LOWER_BYTES))
+        return upper, upper + lower
+
+    @cached_property
+    def has_ascii_lower(self) -> bool:
+        if "ascii_letter_counts" in self.__dict__:
+            upper, total = self.ascii_letter_counts
+            return total > upper
+        return _ASCII_LOWER.search(self.text) is not None
+
+    @cached_property
+    def has_ascii_upper(self) -> bool:
+        if "ascii_letter_counts" in self.__dict__:
+            return self.ascii_letter_counts[0] > 0
+        return _ASCII_UPPER.search(self.text) is not None
+
+    # -------------------- countable items --------------------
+    @cached_property
+    def bullet_count(self) -> int:
+        """Markdown bullet lines beginning with '*' or '-'."""
+        return len(_BULLET_STAR.findall(self.text)) + len(_BULLET_DASH.findall(self.text))
+
+    # -------------------- start-with / end-with --------------------
+    @cached_property
+    def lstripped(self) -> str:
+        return self.text.lstrip(_EDGE_WHITESPACE)
+
+    @cached_property
+    def rstripped(self) -> str:
+        return self.text.rstrip(_EDGE_WHITESPACE)
+
+    @cached_property
+    def head(self) -> str:
+        """Text a start-with rule looks at: no leading whitespace, invisible characters or punctuation."""
+        return _LEADING_INVISIBLE.sub("", self.lstripped).lstrip(_ALL_PUNCTUATIONS)
+
+    @cached_property
+    def tail(self) -> str:
+        """Text an end-with rule looks at: no trailing whitespace or punctuation."""
+        return self.rstripped.rstrip(_ALL_PUNCTUATIONS)
+
+    @cached_property
+    def first_ascii_letter(self) -> Optional[str]:
+        m = _ASCII_LETTER.search(self.head)
+        return m.group(0) if m else None
+
+    @cached_property
+    def last_ascii_letter(self) -> Optional[str]:
+        # Search backwards in growing windows; the last letter is usually near the end
+        tail = self.tail
+        window = 64
+        start = len(tail)
+        while start > 0:
+            lo = max(0, start - window)
+            m = _ASCII_LETTER.search(tail[lo:start][::-1])
+            if m:
+                return m.group(0)
+            start = lo
+            window *= 4
+        return None
+
+
+@functools.lru_cache(maxsize=_PROFILE_CACHE_SIZE)
+def text_profile(text: str) -> TextProfile:
+    """Shared profile of a generation (checkers of the same turn get the same object)."""
+    return TextProfile(text)
@@ -0,0 +1,145 @@
+# encoding = "utf-8"
+
+'''
+Merge the outputs of several evaluation workers into one output directory.
+
+Workers of a --work_queue run (or manually split --start_id/--end_id shards)
+each write <their output_dir>/<model>/eval_{id}.jsonl. This script
+1) validates every copy of eval_{id}.jsonl against dialog_{id}.jsonl: every
+   line parses, turns follow the dialog in order, the user queries match and
+   remaining_patience replays consistently,
+2) keeps the best valid copy of each dialog (finished before unfinished, then
+   the most turns; a dialog re-issued after an expired lease can exist twice),
+3) writes the merged files and reports missing, unfinished and invalid
+   dialogs (non-zero exit status if there are any).
+'''
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from typing import Any, Dict, List, Optional
+
+from eval import load_jsonl, next_patience
+
+
+def validate_eval_file(path: str, turns: List[Dict[str, Any]], patience) -> Dict[str, Any]:
+    """Check one eval_{id}.jsonl against its dialog; returns {valid, finished, turns, error}."""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                return {"valid": False, "finished": False, "turns": len(records),
+                        "error": f"line {line_no} is not valid JSON"}
+
+    remaining = int(patience) if (
+        patience is not None and patience > 0) else None
+    for i, record in enumerate(records):
+        if i >= len(turns):
+            return {"valid": False, "finished": False, "turns": len(records),
+                    "error": f"{len(records)} records for a {len(turns)}-turn dialog"}
+        if record.get("turn") != turns[i].get("turn") or \
+                record.get("user_query_verified") != turns[i].get("user_query_verified"):
+            return {"valid": False, "finished": False, "turns": len(records),
+                    "error": f"record {i} does not match turn {turns[i].get('turn')}"}
+        if remaining is not None and remaining == 0:
+            return {"valid": False, "finished": False, "turns": len(records),
+                    "error": f"record {i} follows an exhausted patience"}
+        overall_ok = bool((record.get("eval") or {}).get("overall_ok"))
+        remaining = next_patience(remaining, overall_ok, patience)
+        if remaining is not None and record.get("remaining_patience") != remaining:
+            return {"valid": False, "finished": False, "turns": len(records),
+                    "error": f"record {i} has remaining_patience {record.get('remaining_patience')}, expected {remaining}"}
+
+    finished = len(records) == len(turns) or (
+        remaining is not None and remaining == 0)
+    return {"valid": True, "finished": finished, "turns": len(records), "error": None}
+
+
+def pick_best(candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    valid = [c for c in candidates if c["valid"]]
+    if not valid:
+        return None
+    return max(valid, key=lambda c: (c["finished"], c["turns"]))
+
+
+def main(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    report = {"merged": [], "missing": [], "unfinished": [],
+              "invalid": [], "duplicates": []}
+    for file_id in range(args.start_id, args.end_id + 1):
+        dialog_path = os.path.join(
+            args.dialogs_dir, f"dialog_{file_id}.jsonl")
+        if not os.path.exists(dialog_path):
+            continue
+        turns = load_jsonl(dialog_path)
+
+        candidates = []
+        for input_dir in args.input_dirs:
+            path = os.path.join(input_dir, f"eval_{file_id}.jsonl")
+            if os.path.exists(path):
+                result = validate_eval_file(path, turns, args.patience)
+                result["path"] = path
+                candidates.append(result)
+                if not result["valid"]:
+                    report["invalid"].append(
+                        {"id": file_id, "path": path, "error": result["error"]})
+        if len(candidates) > 1:
+            report["duplicates"].append(
+                {"id": file_id, "paths": [c["path"] for c in candidates]})
+
+        best = pick_best(candidates)
+        if best is None:
+            report["missing"].append(file_id)
+            continue
+        if not best["finished"]:
+            report["unfinished"].append(file_id)
+        report["merged"].append(file_id)
+        out_path = os.path.join(args.output_dir, f"eval_{file_id}.jsonl")
+        if not args.dry_run and os.path.abspath(best["path"]) != os.path.abspath(out_path):
+            shutil.copyfile(best["path"], out_path + ".tmp")
+            os.replace(out_path + ".tmp", out_path)
+
+    print(f"Merged dialogs: {len(report['merged'])}")
+    print(f"Dialogs present in several shards: {len(report['duplicates'])}")
+    print(f"Unfinished dialogs: {report['unfinished']}")
+    print(f"Missing dialogs: {report['missing']}")
+    for item in report["invalid"]:
+        print(f"  invalid {item['path']}: {item['error']}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report["missing"] or report["unfinished"] or report["invalid"] else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Merge and validate eval_*.jsonl files written by several workers.")
+    parser.add_argument("--input_dirs", type=str, nargs="+", required=True,
+                        help="Per-worker model output directories containing eval_*.jsonl")
+    parser.add_argument("--output_dir", type=str, required=True,
+                        help="Merged model output directory")
+    parser.add_argument("--dialogs_dir", type=str, default="./dialog",
+                        help="Directory containing dialog_*.jsonl files")
+    parser.add_argument("--start_id", type=int,
+                        default=0, help="Start dialog ID")
+    parser.add_argument("--end_id", type=int, default=205,
+                        help="End dialog ID (inclusive)")
+    parser.add_argument("--patience", type=int, default=3,
+                        help="Patience used for the evaluation")
+    parser.add_argument("--dry_run", type=int, default=0,
+                        help="1: only validate and report, do not write files")
+    parser.add_argument("--report", type=str, default="",
+                        help="Optional JSON file with the merge report")
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+    sys.exit(main(args))
@@ -0,0 +1,177 @@
+# encoding = "utf-8"
+
+'''
+Re-check rule-based constraints over existing evaluation outputs.
+
+When a checker in src/instruction/ changes, the stored eval_*.jsonl files
+already contain everything needed to re-score them: every turn keeps its
+'response' and 'instructions'. This script streams those files through a
+process pool and
+1) re-runs check_following for every non-LLM constraint (LLM-judge verdicts
+   in 'details'/'sub_details' are kept as they are),
+2) rewrites eval.details / eval.overall_ok,
+3) replays remaining_patience; if the dialog now runs out of patience earlier,
+   the turns after that point are dropped, and if it no longer runs out the
+   file is left resumable so eval.py continues it,
+4) reports which verdicts flipped.
+'''
+
+import argparse
+import json
+import os
+from collections import Counter
+from multiprocessing import Pool
+from typing import Any, Dict, List, Tuple
+
+from eval import _JUDGE_IDS, _run_rule, build_instruction_instance, next_patience
+from instruction import sentence_segmenter
+
+
+def recheck_turn(record: Dict[str, Any]) -> Tuple[bool, Dict[str, bool]]:
+    """Re-evaluate the rule-based constraints of one stored turn."""
+    generation = record.get("response")
+    old_details = (record.get("eval") or {}).get("details") or {}
+    details: Dict[str, bool] = {}
+    all_ok = True
+    for it in record.get("instructions") or []:
+        inst_id = it.get("id")
+        if inst_id in _JUDGE_IDS:
+            # LLM-judge verdicts are reused as stored
+            ok = bool(old_details.get(inst_id, False))
+        else:
+            inst = build_instruction_instance(inst_id, it.get("args"))
+            ok = False if inst is None else bool(_run_rule(inst, generation))
+        details[inst_id] = ok
+        if not ok:
+            all_ok = False
+    return all_ok, details
+
+
+def recheck_file(task) -> Dict[str, Any]:
+    in_path, out_path, patience, dry_run = task
+    current_remaining = int(patience) if (
+        patience is not None and patience > 0) else None
+
+    records: List[Dict[str, Any]] = []
+    flips: List[Dict[str, Any]] = []
+    overall_flips = 0
+    originally_exhausted = False
+    dropped = 0
+    with open(in_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            originally_exhausted = record.get("remaining_patience") == 0
+            if current_remaining is not None and current_remaining == 0:
+                dropped += 1
+                continue
+
+            old_eval = record.get("eval") or {}
+            old_details = old_eval.get("details") or {}
+            overall_ok, details = recheck_turn(record)
+            for inst_id, ok in details.items():
+                if inst_id in old_details and bool(old_details[inst_id]) != ok:
+                    flips.append({"turn": record.get("turn"), "id": inst_id,
+                                  "old": bool(old_details[inst_id]), "new": ok})
+            if bool(old_eval.get("overall_ok")) != overall_ok:
+                overall_flips += 1
+
+            current_remaining = next_patience(current_remaining, overall_ok, patience)
+
+            record["eval"] = {
+                "overall_ok": overall_ok,
+                "details": details,
+                "sub_details": old_eval.get("sub_details", {}),
+            }
+            record["remaining_patience"] = current_remaining
+            records.append(record)
+
+    if not dry_run:
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        tmp_path = out_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for r in records:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, out_path)
+
+    return {
+        "file": in_path,
+        "turns": len(records),
+        "flips": flips,
+        "overall_flips": overall_flips,
+        "dropped_turns": dropped,
+        # Ran out of patience before but not anymore: eval.py can resume it
+        "resumable": originally_exhausted and current_remaining != 0,
+    }
+
+
+def main(args):
+    tasks = []
+    for input_dir in args.input_dirs:
+        model_dir = os.path.basename(os.path.normpath(input_dir))
+        out_dir = os.path.join(
+            args.output_dir, model_dir) if args.output_dir else input_dir
+        for idx in range(args.start_id, args.end_id + 1):
+            in_path = os.path.join(input_dir, f"eval_{idx}.jsonl")
+            if os.path.exists(in_path):
+                tasks.append((in_path, os.path.join(out_dir, f"eval_{idx}.jsonl"),
+                              args.patience, bool(args.dry_run)))
+
+    # Load Punkt once here; the forked workers inherit it
+    sentence_segmenter.warm()
+    results = []
+    with Pool(processes=args.workers or None) as pool:
+        for result in pool.imap_unordered(recheck_file, tasks):
+            results.append(result)
+    results.sort(key=lambda r: r["file"])
+
+    flip_counter = Counter()
+    for r in results:
+        for flip in r["flips"]:
+            direction = "pass->fail" if flip["old"] else "fail->pass"
+            flip_counter[(flip["id"], direction)] += 1
+
+    print(f"Rechecked files: {len(results)}")
+    print(f"Rechecked turns: {sum(r['turns'] for r in results)}")
+    print(
+        f"Turns with flipped overall_ok: {sum(r['overall_flips'] for r in results)}")
+    print(
+        f"Turns dropped after patience ran out earlier: {sum(r['dropped_turns'] for r in results)}")
+    print(
+        f"Dialogs that no longer run out of patience (resume with eval.py): {sum(r['resumable'] for r in results)}")
+    for (inst_id, direction), n in sorted(flip_counter.items()):
+        print(f"  {inst_id} {direction}: {n}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Re-check rule-based constraints over existing eval_*.jsonl files.")
+    parser.add_argument("--input_dirs", type=str, nargs="+", required=True,
+                        help="Model output directories containing eval_*.jsonl")
+    parser.add_argument("--output_dir", type=str, default="",
+                        help="Write rechecked files to <output_dir>/<model>/ (default: rewrite in place)")
+    parser.add_argument("--start_id", type=int,
+                        default=0, help="Start dialog ID")
+    parser.add_argument("--end_id", type=int, default=205,
+                        help="End dialog ID (inclusive)")
+    parser.add_argument("--patience", type=int, default=3,
+                        help="Patience used for the original evaluation")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Worker processes (default: all cores)")
+    parser.add_argument("--dry_run", type=int, default=0,
+                        help="1: only report flips, do not write files")
+    parser.add_argument("--report", type=str, default="",
+                        help="Optional JSON file listing every flipped verdict")
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+    main(args)
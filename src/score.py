@@ -7,6 +7,23 @@ import numpy as np
 import random
 
 
+def load_price_table(path):
+    """Load {model_name: {"prompt": usd_per_1M_tokens, "completion": usd_per_1M_tokens}}."""
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def usage_cost(price_table, model_name, prompt_tokens, completion_tokens):
+    """Cost in USD, or None when the model has no entry in the price table."""
+    price = price_table.get(model_name)
+    if price is None:
+        return None
+    return (prompt_tokens * price.get("prompt", 0.0) +
+            completion_tokens * price.get("completion", 0.0)) / 1e6
+
+
 def main(args):
 
     input_dir = args.input_dir
@@ -33,6 +50,10 @@ def main(args):
     micro_constraint_pass_rate = []
     micro_turn_pass_rate = 0.0  # (# successful turns) / (total turns)
 
+    # Token usage per dialog: [target prompt, target completion, judge prompt, judge completion]
+    dialog_usage = []
+    judge_usage_per_constraint = {}  # constraint id -> [prompt, completion]
+
     idx_list = []
     for idx in range(args.start_id, args.end_id + 1):
         input_path = os.path.join(input_dir, f"eval_{idx}.jsonl")
@@ -62,6 +83,7 @@ def main(args):
         maximum_consecutive_successful_length.append(0.0)
         # Total number of recoveries in a dialog
         total_recovery_count.append(0.0)
+        dialog_usage.append([0, 0, 0, 0])
 
         prev_success_state = True
         current_streak = 0
@@ -106,6 +128,24 @@ def main(args):
 
                 prev_success_state = eval_result["overall_ok"]
 
+                usage = line.get("usage") or {}
+                target_usage = usage.get("target") or {}
+                dialog_usage[dialog_idx][0] += target_usage.get(
+                    "prompt_tokens") or 0
+                dialog_usage[dialog_idx][1] += target_usage.get(
+                    "completion_tokens") or 0
+                for key, judge_usage in (usage.get("judge") or {}).items():
+                    if key not in judge_usage_per_constraint:
+                        judge_usage_per_constraint[key] = [0, 0]
+                    judge_usage_per_constraint[key][0] += judge_usage.get(
+                        "prompt_tokens") or 0
+                    judge_usage_per_constraint[key][1] += judge_usage.get(
+                        "completion_tokens") or 0
+                    dialog_usage[dialog_idx][2] += judge_usage.get(
+                        "prompt_tokens") or 0
+                    dialog_usage[dialog_idx][3] += judge_usage.get(
+                        "completion_tokens") or 0
+
                 if line["remaining_patience"] == (3 - args.patience):
                     break
 
@@ -138,6 +178,56 @@ def main(args):
     print(f"Turn number survival ratio: {turn_number_survival_ratio}")
     print(f"Constraint pass rate: {constraint_pass_rate}")
 
+    # -------------------- Token usage and cost --------------------
+    model_name = args.model_name or os.path.basename(
+        os.path.normpath(args.input_dir))
+    price_table = load_price_table(args.price_table)
+    usage_total = np.sum(np.array(dialog_usage).reshape(-1, 4), axis=0)
+    print(
+        f"Target tokens ({model_name}): prompt={int(usage_total[0])}, completion={int(usage_total[1])}")
+    print(
+        f"Judge tokens ({args.judge_model}): prompt={int(usage_total[2])}, completion={int(usage_total[3])}")
+    print(f"Judge tokens per constraint: {judge_usage_per_constraint}")
+    print(
+        f"Tokens per dialog (mean): target={np.mean([u[0] + u[1] for u in dialog_usage])}, judge={np.mean([u[2] + u[3] for u in dialog_usage])}")
+
+    dialog_costs = []
+    for u in dialog_usage:
+        target_cost = usage_cost(price_table, model_name, u[0], u[1])
+        judge_cost = usage_cost(price_table, args.judge_model, u[2], u[3])
+        dialog_costs.append((target_cost, judge_cost))
+    if price_table:
+        target_costs = [c[0] for c in dialog_costs if c[0] is not None]
+        judge_costs = [c[1] for c in dialog_costs if c[1] is not None]
+        print(
+            f"Cost (USD): target={sum(target_costs) if target_costs else None}, judge={sum(judge_costs) if judge_costs else None}")
+        print(
+            f"Cost per dialog (USD, mean): {np.mean([(c[0] or 0.0) + (c[1] or 0.0) for c in dialog_costs])}")
+
+    if args.usage_report:
+        report = []
+        for idx, u, c in zip(chosen_idx_list, dialog_usage, dialog_costs):
+            report.append({
+                "dialog_id": idx,
+                "target": {"prompt_tokens": u[0], "completion_tokens": u[1], "cost": c[0]},
+                "judge": {"prompt_tokens": u[2], "completion_tokens": u[3], "cost": c[1]},
+            })
+        with open(args.usage_report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    # Survival statistics used by eval.py --survival_stats to order dialogs
+    if args.survival_stats:
+        last_turn = max((t for t, count in enumerate(
+            turn_number_survival_ratio) if count > 0), default=-1)
+        with open(args.survival_stats, "w", encoding="utf-8") as f:
+            json.dump({
+                "input_dir": args.input_dir,
+                "patience": args.patience,
+                "num_dialogs": dialog_idx + 1,
+                "alive_counts": turn_number_survival_ratio[:last_turn + 1],
+                "per_dialog": {str(idx): survived for idx, survived in zip(chosen_idx_list, total_survival_turns)},
+            }, f, ensure_ascii=False, indent=2)
+
 
 if __name__ == "__main__":
     parser = ArgumentParser()
@@ -148,6 +238,16 @@ if __name__ == "__main__":
     parser.add_argument("--patience", type=int, default=3)
     parser.add_argument("--random_num", type=int, default=None, help="")
     parser.add_argument("--random_seed", type=int, default=42)
+    parser.add_argument("--model_name", type=str, default="",
+                        help="Target model name in the price table (default: input_dir name)")
+    parser.add_argument("--judge_model", type=str, default="gpt-4.1",
+                        help="Judge model name in the price table")
+    parser.add_argument("--price_table", type=str, default="",
+                        help='JSON file: {"model": {"prompt": usd_per_1M, "completion": usd_per_1M}}')
+    parser.add_argument("--usage_report", type=str, default="",
+                        help="Optional JSON file with per-dialog token usage and cost")
+    parser.add_argument("--survival_stats", type=str, default="",
+                        help="Optional JSON file with per-turn and per-dialog survival counts (for eval.py scheduling)")
     args = parser.parse_args()
     random.seed(args.random_seed)
     main(args)
@@ -0,0 +1,250 @@
+# encoding = "utf-8"
+
+'''
+Evaluate several models on the same dialogs in one process.
+
+--configs points to a JSON list of model configs, e.g.
+[
+  {"model_name": "gpt-4o", "base_url": "https://api.openai.com/v1", "api_key": "sk-..."},
+  {"model_name": "llama-4-maverick", "base_url": "http://localhost:8000/v1", "system_prompt": 1,
+   "output_dir": "./evaluation_w_system", "max_dialogs": 32}
+]
+Any eval.py option can be set per model (everything else comes from the
+command line). "max_dialogs" caps the dialogs in flight on that config's
+endpoint and "rpm"/"tpm"/"max_inflight" set its request-level limits.
+
+Judge calls go to --judge_base_url, or to the model's own base_url if it is
+not set. The judge cache is shared by all models and keyed by the judge
+model name only, so every config must resolve to the same judge endpoint:
+with the configs above (two different base_urls), pass --judge_base_url
+(and --judge_api_key), e.g.
+python3 src/sweep.py --configs models.json --judge_base_url https://api.openai.com/v1 --judge_api_key sk-...
+
+All (model, dialog) pairs are scheduled through one event loop: at most
+--concurrency dialogs run at once overall and at most --endpoint_dialogs per
+endpoint, so a slow endpoint cannot starve the others. The dialogs are loaded
+once, and the HTTP client pool, the judge thread pool, the judge cache and the
+generation store are shared by every model. Outputs use the usual
+<output_dir>/<model>/eval_{id}.jsonl layout and resume exactly like eval.py.
+'''
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from data_utils.utils import configure_client_pool
+from data_utils.rate_limit import configure_rate_limits, limiter_stats
+from data_utils.judge_cache import JudgeCache
+from data_utils.generation_store import GenerationStore
+from data_utils.journal import EvalJournal
+from data_utils.checker_metrics import CheckerMetrics
+from instruction.plan import CheckerPlan
+from data_utils.scheduling import SurvivalStats, schedule_order
+from eval import build_parser, evaluate_dialog, load_jsonl, schedule_dialogs, set_judge_workers, tqdm
+
+# Per-config keys that are not eval.py options
+_ENDPOINT_KEYS = ("max_dialogs", "rpm", "tpm", "max_inflight")
+
+
+def load_configs(path: str, args) -> List[argparse.Namespace]:
+    """Read the model configs and turn each one into a full eval.py namespace."""
+    with open(path, "r", encoding="utf-8") as f:
+        configs = json.load(f)
+    if not isinstance(configs, list) or not configs:
+        raise ValueError(f"{path} must contain a non-empty JSON list")
+
+    model_args = []
+    out_dirs = set()
+    for config in configs:
+        if "model_name" not in config:
+            raise ValueError(f"Model config without model_name: {config}")
+        unknown = set(config) - set(vars(args)) - set(_ENDPOINT_KEYS)
+        if unknown:
+            raise ValueError(
+                f"Unknown option(s) {sorted(unknown)} for {config['model_name']}")
+        margs = argparse.Namespace(**vars(args))
+        for key, value in config.items():
+            if key not in _ENDPOINT_KEYS:
+                setattr(margs, key, value)
+        margs.endpoint = {k: config[k] for k in _ENDPOINT_KEYS if k in config}
+
+        out_dir = os.path.abspath(os.path.join(
+            margs.output_dir, margs.model_name.split("/")[-1]))
+        if out_dir in out_dirs:
+            raise ValueError(
+                f"Two configs write to {out_dir}; give one of them its own output_dir")
+        out_dirs.add(out_dir)
+        margs.model_out_dir = out_dir
+        model_args.append(margs)
+
+    # A shared judge cache would mix verdicts of different judge endpoints
+    judge_endpoints = {m.judge_base_url or m.base_url for m in model_args}
+    if len(judge_endpoints) > 1:
+        raise ValueError(
+            f"Judge calls would go to several endpoints {sorted(judge_endpoints)}; "
+            "set --judge_base_url (and --judge_api_key) so every model is judged by the same endpoint")
+    return model_args
+
+
+def load_dialogs(dialogs_dir: str, start_id: int, end_id: int) -> Dict[int, List[Dict[str, Any]]]:
+    dialogs = {}
+    for file_id in range(start_id, end_id + 1):
+        path = os.path.join(dialogs_dir, f"dialog_{file_id}.jsonl")
+        if os.path.exists(path):
+            dialogs[file_id] = load_jsonl(path)
+    return dialogs
+
+
+def endpoint_caps(model_args: List[argparse.Namespace], default_cap: int) -> Dict[str, int]:
+    """Dialogs in flight per endpoint; the smallest cap wins for a shared endpoint."""
+    caps: Dict[str, int] = {}
+    for margs in model_args:
+        cap = int(margs.endpoint.get("max_dialogs") or default_cap)
+        caps[margs.base_url] = min(caps.get(margs.base_url, cap), cap)
+    return caps
+
+
+async def sweep_async(pairs, dialogs, caps, concurrency, judge_cache, generation_store, journals,
+                      metrics=None, plan=None):
+    global_semaphore = asyncio.Semaphore(concurrency)
+    endpoint_semaphores = {url: asyncio.Semaphore(
+        cap) for url, cap in caps.items()}
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        async def _evaluate(margs, file_id: int):
+            journal = journals[margs.model_out_dir]
+            async with endpoint_semaphores[margs.base_url]:
+                async with global_semaphore:
+                    if journal.stopping:
+                        return
+                    try:
+                        await loop.run_in_executor(executor, functools.partial(
+                            evaluate_dialog, file_id, margs, False, judge_cache, generation_store,
+                            journal, dialogs[file_id],
+                            metrics=(metrics or {}).get(margs.model_out_dir), plan=plan))
+                    except Exception as e:
+                        print(f"[{margs.model_name} dialog {file_id}] {e}")
+
+        tasks = [asyncio.ensure_future(_evaluate(margs, file_id))
+                 for margs, file_id in pairs]
+        for task in tqdm(asyncio.as_completed(tasks), total=len(tasks)):
+            await task
+
+
+def run(args):
+    model_args = load_configs(args.configs, args)
+    dialogs = load_dialogs(args.dialogs_dir, args.start_id, args.end_id)
+    caps = endpoint_caps(model_args, args.endpoint_dialogs)
+    # One set of checkers for every model; dialogs missing from a saved plan
+    # (or changed since) are compiled here
+    plan = (CheckerPlan.load(args.checker_plan) if args.checker_plan else None) \
+        or CheckerPlan()
+    for file_id, turns in dialogs.items():
+        plan.dialog_checkers(file_id, turns)
+    if args.checker_plan and plan.dirty:
+        plan.save(args.checker_plan)
+
+    configure_client_pool(
+        max_connections=args.max_connections,
+        max_keepalive_connections=args.max_connections,
+        timeout=args.request_timeout,
+    )
+    set_judge_workers(args.judge_workers)
+    rate_limited = bool(args.rpm or args.tpm or args.max_inflight) or any(
+        set(margs.endpoint) - {"max_dialogs"} for margs in model_args)
+    if rate_limited:
+        # The limiter owns retries; disable the client's own retry loop
+        configure_client_pool(max_retries=0)
+        if args.rpm or args.tpm or args.max_inflight:
+            configure_rate_limits(
+                rpm=args.rpm or None,
+                tpm=args.tpm or None,
+                max_concurrency=args.max_inflight or 64,
+                max_retries=args.max_retries,
+            )
+        for margs in model_args:
+            limits = margs.endpoint
+            if set(limits) - {"max_dialogs"}:
+                configure_rate_limits(
+                    base_url=margs.base_url,
+                    rpm=limits.get("rpm") or args.rpm or None,
+                    tpm=limits.get("tpm") or args.tpm or None,
+                    max_concurrency=limits.get(
+                        "max_inflight") or args.max_inflight or 64,
+                    max_retries=args.max_retries,
+                )
+    judge_cache = JudgeCache(args.judge_cache, max_entries=args.judge_cache_size) \
+        if args.judge_cache else None
+    generation_store = GenerationStore(args.generation_store, mode=args.generation_mode) \
+        if args.generation_store else None
+
+    journals, metrics = {}, {}
+    for margs in model_args:
+        os.makedirs(margs.model_out_dir, exist_ok=True)
+        journals[margs.model_out_dir] = EvalJournal(
+            margs.model_out_dir, commit_interval=args.commit_interval)
+        if margs.checker_metrics:
+            metrics[margs.model_out_dir] = CheckerMetrics()
+    # In-flight dialogs first, then longest expected first; models are
+    # interleaved on ties so every model makes progress from the start
+    stats = SurvivalStats.load(
+        args.survival_stats) if args.survival_stats else None
+    keys = {}
+    for model_idx, margs in enumerate(model_args):
+        for file_id, key in schedule_dialogs(margs, dialogs, journals[margs.model_out_dir],
+                                             stats, dialogs).items():
+            keys[(model_idx, file_id)] = (*key, model_idx)
+    pairs = [(model_args[model_idx], file_id)
+             for model_idx, file_id in schedule_order(keys)]
+    print(f"Sweep: {len(model_args)} models x {len(dialogs)} dialogs, "
+          f"endpoint caps {caps}")
+
+    # First Ctrl-C: finish the turns in flight and exit cleanly; second: abort
+    def _drain(signum, frame):
+        if any(j.stopping for j in journals.values()):
+            raise KeyboardInterrupt
+        print("\nInterrupted: finishing in-flight turns (Ctrl-C again to abort)")
+        for journal in journals.values():
+            journal.request_stop()
+    previous_handler = signal.signal(signal.SIGINT, _drain)
+
+    try:
+        asyncio.run(sweep_async(pairs, dialogs, caps, args.concurrency,
+                                judge_cache, generation_store, journals, metrics, plan))
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        for journal in journals.values():
+            journal.close()
+        for margs in model_args:
+            if margs.model_out_dir in metrics:
+                metrics[margs.model_out_dir].dump(
+                    os.path.join(margs.model_out_dir, margs.checker_metrics))
+
+    if judge_cache is not None:
+        print(f"Judge cache: {judge_cache.stats()}")
+    if rate_limited:
+        print(f"Rate limiting: {limiter_stats()}")
+
+
+def build_sweep_parser():
+    parser = build_parser()
+    parser.description = "Evaluate several models on the same dialogs with one shared scheduler."
+    parser.add_argument("--configs", type=str, required=True,
+                        help="JSON list of per-model configs (model_name, base_url, api_key, system_prompt, ...)")
+    parser.add_argument("--endpoint_dialogs", type=int, default=16,
+                        help="Default cap on dialogs in flight per endpoint")
+    parser.set_defaults(concurrency=64)
+    return parser
+
+
+if __name__ == "__main__":
+    parser = build_sweep_parser()
+    args = parser.parse_args()
+    run(args)
@@ -0,0 +1,117 @@
+# encoding = "utf-8"
+'''
+Sentence counts of SentenceSegmenter (fast path, memo, count_batch) against
+plain Punkt on every string of the dialog corpus, stripped as
+LengthInstruction strips responses.
+
+The English Punkt model is the reference the checkers use; those tests are
+skipped when it is not installed. The untrained tokenizer test applies the
+same break rules and always runs.
+'''
+
+import glob
+import json
+import os
+import sys
+
+import pytest
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_ROOT, "src"))
+
+from instruction.sentence_segmenter import SentenceSegmenter, fast_count  # noqa: E402
+
+nltk = pytest.importorskip("nltk")
+
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _strings(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _strings(v)
+
+
+def _dialog_texts():
+    texts = []
+    for path in sorted(glob.glob(os.path.join(_ROOT, "dialog", "*.jsonl"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    texts.extend(s.strip() for s in _strings(json.loads(line)) if s.strip())
+    return texts
+
+
+TEXTS = _dialog_texts()
+
+
+def _has_punkt() -> bool:
+    try:
+        nltk.sent_tokenize("One. Two.")
+        return True
+    except LookupError:
+        return False
+
+
+needs_punkt = pytest.mark.skipif(not _has_punkt(), reason="NLTK punkt English model not installed")
+
+
+def _assert_same_counts(segmenter, expected):
+    assert [segmenter.count(t) for t in TEXTS] == expected
+    # Second pass is served by the memo (and the fast path)
+    assert [segmenter.count(t) for t in TEXTS] == expected
+    assert segmenter.stats["memo"] > 0 or segmenter.stats["punkt"] == 0
+
+
+def test_corpus_is_not_empty():
+    assert len(TEXTS) > 100
+
+
+@needs_punkt
+def test_fast_path_matches_sent_tokenize():
+    for text in TEXTS:
+        count = fast_count(text)
+        if count is not None:
+            assert count == len(nltk.sent_tokenize(text)), text
+
+
+@needs_punkt
+def test_segmenter_matches_sent_tokenize():
+    expected = [len(nltk.sent_tokenize(t)) for t in TEXTS]
+    _assert_same_counts(SentenceSegmenter(), expected)
+    assert SentenceSegmenter().count_batch(TEXTS) == expected
+    assert SentenceSegmenter(fast_path=False).count_batch(TEXTS) == expected
+
+
+@needs_punkt
+def test_count_sentences_matches_sent_tokenize():
+    from instruction.instruction_utils import count_sentences
+    for text in TEXTS:
+        assert count_sentences(text) == len(nltk.sent_tokenize(text)), text
+
+
+def test_segmenter_matches_untrained_punkt():
+    from nltk.tokenize.punkt import PunktSentenceTokenizer
+    tokenizer = PunktSentenceTokenizer()
+    expected = [len(tokenizer.tokenize(t)) for t in TEXTS]
+    _assert_same_counts(SentenceSegmenter(loader=lambda: tokenizer), expected)
+    assert SentenceSegmenter(loader=lambda: tokenizer).count_batch(TEXTS) == expected
+
+
+def test_load_failure_is_cached():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        raise LookupError("no model")
+
+    segmenter = SentenceSegmenter(loader=loader)
+    assert segmenter.count("No terminator here") == 1
+    for _ in range(3):
+        with pytest.raises(LookupError):
+            segmenter.count("One. Two.")
+    assert len(calls) == 1
+    assert segmenter.warm() is False